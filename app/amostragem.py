@@ -0,0 +1,44 @@
+# app/amostragem.py
+"""
+Redução de séries para gráficos com LTTB (Largest-Triangle-Three-Buckets,
+Steinarsson 2013): divide a série em baldes e, de cada um, fica o ponto que
+forma o maior triângulo com o ponto escolhido antes e a média do balde
+seguinte. Picos e vales sobrevivem, ao contrário da média por intervalo.
+"""
+from typing import List, Sequence
+
+
+def lttb(xs: Sequence[float], ys: Sequence[float], n: int) -> List[int]:
+    """
+    Índices dos `n` pontos escolhidos, em ordem (o primeiro e o último sempre
+    entram). `xs` crescente; valores NaN em `ys` nunca são escolhidos no meio.
+    """
+    total = len(xs)
+    if n >= total:
+        return list(range(total))
+    if n <= 2:
+        return [0, total - 1][-n:] if n > 0 else []
+
+    escolhidos = [0]
+    largura = (total - 2) / (n - 2)
+    a = 0
+    for i in range(n - 2):
+        inicio = int(i * largura) + 1
+        fim = int((i + 1) * largura) + 1
+        # Média do balde seguinte (no último balde, o ponto final)
+        prox_inicio, prox_fim = fim, min(int((i + 2) * largura) + 1, total)
+        quantidade = prox_fim - prox_inicio
+        mx = sum(xs[prox_inicio:prox_fim]) / quantidade
+        my = sum(ys[prox_inicio:prox_fim]) / quantidade
+
+        ax, ay = xs[a], ys[a]
+        melhor, maior_area = inicio, -1.0
+        for j in range(inicio, fim):
+            # Dobro da área do triângulo (a, j, média): a escala não muda a escolha
+            area = abs((ax - mx) * (ys[j] - ay) - (ax - xs[j]) * (my - ay))
+            if area > maior_area:
+                melhor, maior_area = j, area
+        escolhidos.append(melhor)
+        a = melhor
+    escolhidos.append(total - 1)
+    return escolhidos
@@ -0,0 +1,335 @@
+# app/arquivo.py
+"""
+Arquivo colunar (Parquet ou Arrow IPC) das leituras frias.
+
+Leituras mais antigas que a fronteira do arquivo saem do banco e vão para
+arquivos particionados por mês e por campo/sensor (layout hive):
+
+    ARQUIVO_DIR/leituras_sensores/mes=2025-01/campo_id=3/desde_2025-01-01_0.parquet
+    ARQUIVO_DIR/sensor_readings/mes=2025-01/sensor_id=S1/desde_2025-01-01_0.parquet
+
+A fronteira (primeiro dia ainda no banco) fica em `_manifesto.json`, gravado
+depois dos arquivos: a leitura pega do arquivo o que é anterior à fronteira
+e do banco o resto, então as duas cópias podem coexistir até o job de
+retenção (app.retencao) apagar as linhas brutas. A fronteira só avança.
+Leituras retroativas, gravadas no banco depois que o seu dia foi arquivado,
+entram no arquivo na execução seguinte (arquivos retroativas_*), antes de a
+retenção apagá-las.
+
+`ler()` devolve um DataFrame com a união das duas camadas, lendo do arquivo
+só as colunas e partições pedidas (arquivos mapeados em memória).
+
+Com ARQUIVO_ATIVO=1 o job de retenção arquiva antes de apagar. Requer pyarrow.
+
+Uso: python -m app.arquivo                   (fronteira e formato de cada série)
+     python -m app.arquivo --ate 2025-01-01  (só copia; quem apaga é a retenção)
+     python -m app.arquivo --restaurar 2024-06-01 2024-07-01
+"""
+import json
+import os
+import sys
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from app import particoes, rollups, tempo
+from app.database import adaptar_sql, carregar, conexao
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+except ImportError:
+    pa = None
+
+ATIVO = os.getenv("ARQUIVO_ATIVO", "0") == "1"
+PASTA = os.getenv("ARQUIVO_DIR", "arquivo")
+FORMATO = os.getenv("ARQUIVO_FORMATO", "parquet")  # parquet | arrow
+MANIFESTO = "_manifesto.json"
+
+_EXTENSAO = {"parquet": "parquet", "arrow": "arrow"}
+_FORMATO_DS = {"parquet": "parquet", "arrow": "ipc"}
+
+
+def _exigir_pyarrow():
+    if pa is None:
+        raise RuntimeError("Arquivo colunar requer pyarrow (pip install pyarrow)")
+
+
+def _pasta(serie: rollups.Serie) -> str:
+    return os.path.join(PASTA, serie.origem)
+
+
+def manifesto(serie: rollups.Serie) -> dict:
+    try:
+        with open(os.path.join(_pasta(serie), MANIFESTO)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def fronteira(serie: rollups.Serie) -> Optional[datetime]:
+    """Primeiro dia que ainda está no banco (None = nada arquivado)."""
+    ate = manifesto(serie).get("ate")
+    return datetime.fromisoformat(ate) if ate else None
+
+
+def _gravar_manifesto(serie: rollups.Serie, ate: datetime, formato: str):
+    # Recuar esconderia do arquivo dias que a retenção já apagou do banco
+    atual = fronteira(serie)
+    if atual is not None and atual > ate:
+        ate = atual
+    caminho = os.path.join(_pasta(serie), MANIFESTO)
+    temporario = caminho + ".tmp"
+    with open(temporario, "w") as f:
+        json.dump({"ate": ate.date().isoformat(), "formato": formato}, f)
+    os.replace(temporario, caminho)
+
+
+def _schema(serie: rollups.Serie):
+    tipo_chave = pa.int64() if serie.chave == "campo_id" else pa.string()
+    campos = [("id", pa.int64()), (serie.chave, tipo_chave), (serie.tempo_origem, pa.timestamp("ms"))]
+    campos += [(c, pa.float64()) for c in serie.valores_origem]
+    return pa.schema(campos)
+
+
+def _particionamento(serie: rollups.Serie):
+    schema = _schema(serie)
+    return ds.partitioning(
+        pa.schema([("mes", pa.string()), schema.field(serie.chave)]), flavor="hive"
+    )
+
+
+# ==============================
+#    BANCO (camada quente)
+# ==============================
+
+def _linhas_banco(conn, serie: rollups.Serie, colunas: List[str], desde: Optional[datetime],
+                  ate: Optional[datetime], chaves: Optional[Iterable] = None) -> Iterable[tuple]:
+    """Linhas da origem no intervalo de dias [desde, ate), com o timestamp já em datetime."""
+    cur = conn.cursor()
+    coluna = serie.tempo_origem
+    filtros, params = [f"{coluna} IS NOT NULL"], []
+    if desde is not None:
+        filtros.append(f"{coluna} >= ?")
+        params.append(rollups.limite_origem(conn, serie, desde))
+    if ate is not None:
+        filtros.append(f"{coluna} < ?")
+        params.append(rollups.limite_origem(conn, serie, ate))
+    if chaves is not None:
+        chaves = list(chaves)
+        filtros.append(f"{serie.chave} IN ({', '.join('?' for _ in chaves)})")
+        params += chaves
+    indice_tempo = colunas.index(coluna) if coluna in colunas else None
+    for origem in rollups.origens(conn, serie, desde, ate):
+        cur.execute(
+            adaptar_sql(conn, f"SELECT {', '.join(colunas)} FROM {origem} WHERE {' AND '.join(filtros)}"),
+            tuple(params)
+        )
+        for r in cur.fetchall():
+            linha = [r[c] for c in colunas] if isinstance(r, dict) else list(r)
+            if indice_tempo is not None:
+                linha[indice_tempo] = tempo.do_banco(linha[indice_tempo])
+            yield tuple(linha)
+
+
+def _tabela(serie: rollups.Serie, colunas: List[str], linhas: List[tuple]):
+    schema = _schema(serie)
+    return pa.table(
+        [pa.array([l[i] for l in linhas], type=schema.field(c).type) for i, c in enumerate(colunas)],
+        schema=pa.schema([schema.field(c) for c in colunas]),
+    )
+
+
+# ==============================
+#    ARQUIVAMENTO
+# ==============================
+
+def _gravar(serie: rollups.Serie, tabela, meses: List[str], formato: str, basename: str):
+    ds.write_dataset(
+        tabela.append_column("mes", pa.array(meses, type=pa.string())), _pasta(serie),
+        format=_FORMATO_DS[formato], partitioning=_particionamento(serie),
+        basename_template=f"{basename}_{{i}}.{_EXTENSAO[formato]}",
+        # Reexecução depois de uma falha regrava os mesmos nomes
+        existing_data_behavior="overwrite_or_ignore",
+    )
+
+
+def _arquivar_retroativas(conn, serie: rollups.Serie, ate: datetime, formato: str, colunas: List[str]) -> int:
+    """Leituras do banco anteriores à fronteira que ainda não estão no arquivo."""
+    linhas = list(_linhas_banco(conn, serie, colunas, None, ate))
+    if not linhas:
+        return 0
+    indice = colunas.index(serie.tempo_origem)
+    meses = [l[indice].strftime("%Y-%m") for l in linhas]
+    # Linhas já arquivadas que a retenção ainda não apagou ficam de fora
+    dataset = _dataset(serie)
+    arquivados = set()
+    if dataset is not None:
+        filtro = ds.field("mes").isin(sorted(set(meses)))
+        arquivados = set(dataset.to_table(columns=["id"], filter=filtro).column("id").to_pylist())
+    novas = [(l, m) for l, m in zip(linhas, meses) if l[0] not in arquivados]
+    if not novas:
+        return 0
+    # Nome pelo maior id: reexecutar com as mesmas linhas regrava o mesmo arquivo
+    _gravar(serie, _tabela(serie, colunas, [l for l, _ in novas]), [m for _, m in novas], formato,
+            f"retroativas_{max(l[0] for l, _ in novas)}")
+    return len(novas)
+
+
+def arquivar(conn, serie: rollups.Serie, ate: datetime, formato: str = FORMATO) -> int:
+    """
+    Copia para o arquivo as leituras da fronteira atual até `ate` (dia) e avança
+    a fronteira; leituras anteriores à fronteira que ainda não estão no arquivo
+    (retroativas) também são copiadas. Não apaga nada do banco. Retorna o
+    número de linhas arquivadas.
+    """
+    _exigir_pyarrow()
+    ate = rollups.truncar(ate, "dia")
+    desde = fronteira(serie)
+    formato = manifesto(serie).get("formato", formato)
+    colunas = list(_schema(serie).names)
+
+    total = 0
+    if desde is None:
+        mais_antiga = rollups.mais_antiga(conn, serie, ate)
+        desde = rollups.truncar(mais_antiga, "dia") if mais_antiga is not None else ate
+    else:
+        total += _arquivar_retroativas(conn, serie, min(desde, ate), formato, colunas)
+    inicio = desde
+    while inicio < ate:
+        # Um mês por vez: limita a memória e casa com o particionamento
+        fim = min(particoes.proximo_mes(particoes.inicio_mes(inicio)), ate)
+        linhas = list(_linhas_banco(conn, serie, colunas, inicio, fim))
+        if linhas:
+            _gravar(serie, _tabela(serie, colunas, linhas), [inicio.strftime("%Y-%m")] * len(linhas),
+                    formato, f"desde_{inicio.date().isoformat()}")
+            total += len(linhas)
+        inicio = fim
+
+    os.makedirs(_pasta(serie), exist_ok=True)
+    _gravar_manifesto(serie, ate, formato)
+    return total
+
+
+def restaurar(conn, serie: rollups.Serie, desde: datetime, ate: datetime) -> int:
+    """
+    Devolve ao banco (carga em massa, sem commit) as leituras arquivadas em
+    [desde, ate) que não estão mais nele, com os ids originais. Os rollups já
+    as contêm. Retorna o número de linhas.
+    """
+    _exigir_pyarrow()
+    dataset, limite = _dataset(serie), fronteira(serie)
+    if dataset is None:
+        return 0
+    desde, ate = rollups.truncar(desde, "dia"), min(rollups.truncar(ate, "dia"), limite)
+    colunas = list(_schema(serie).names)
+    coluna = ds.field(serie.tempo_origem)
+    filtro = (coluna >= pa.scalar(desde, pa.timestamp("ms"))) & (coluna < pa.scalar(ate, pa.timestamp("ms"))) \
+        & (ds.field("mes") >= desde.strftime("%Y-%m"))
+    converter, indice = tempo.conversor(tempo.formato(conn)), colunas.index(serie.tempo_origem)
+    # Dias arquivados que a retenção ainda não apagou continuam no banco
+    presentes = {l[0] for l in _linhas_banco(conn, serie, ["id", serie.tempo_origem], desde, ate)}
+
+    def linhas():
+        for lote in dataset.to_batches(columns=colunas, filter=filtro):
+            for linha in zip(*(c.to_pylist() for c in lote.columns)):
+                if linha[0] in presentes:
+                    continue
+                yield linha[:indice] + (converter(linha[indice]),) + linha[indice + 1:]
+
+    return carregar(conn, serie.origem, tuple(colunas), linhas())
+
+
+# ==============================
+#    LEITURA (arquivo + banco)
+# ==============================
+
+def _dataset(serie: rollups.Serie):
+    info = manifesto(serie)
+    if not info:
+        return None
+    return ds.dataset(
+        _pasta(serie), format=_FORMATO_DS[info["formato"]], partitioning=_particionamento(serie),
+        filesystem=fs.LocalFileSystem(use_mmap=True),
+    )
+
+
+def tabela(serie: rollups.Serie, colunas: Optional[List[str]] = None, desde: Optional[datetime] = None,
+           ate: Optional[datetime] = None, chaves: Optional[Iterable] = None, conn=None):
+    """
+    pyarrow.Table com as leituras da série em [desde, ate) (dias), unindo o
+    arquivo (antes da fronteira) e o banco (a partir dela).
+    """
+    _exigir_pyarrow()
+    if conn is None:
+        with conexao() as conn:
+            return tabela(serie, colunas, desde, ate, chaves, conn)
+
+    colunas = list(colunas or _schema(serie).names)
+    desde = rollups.truncar(desde, "dia") if desde is not None else None
+    ate = rollups.truncar(ate, "dia") if ate is not None else None
+    chaves = list(chaves) if chaves is not None else None
+    limite = fronteira(serie)
+    partes = []
+
+    dataset = _dataset(serie)
+    if dataset is not None and (desde is None or desde < limite):
+        coluna = ds.field(serie.tempo_origem)
+        filtro = coluna < pa.scalar(min(limite, ate) if ate is not None else limite, pa.timestamp("ms"))
+        if desde is not None:
+            filtro &= coluna >= pa.scalar(desde, pa.timestamp("ms"))
+            # Poda de diretórios pelo mês
+            filtro &= ds.field("mes") >= desde.strftime("%Y-%m")
+        if chaves is not None:
+            filtro &= ds.field(serie.chave).isin(chaves)
+        partes.append(dataset.to_table(columns=colunas, filter=filtro))
+
+    if ate is None or limite is None or ate > limite:
+        inicio = max(desde, limite) if desde is not None and limite is not None else (desde or limite)
+        partes.append(_tabela(serie, colunas, list(_linhas_banco(conn, serie, colunas, inicio, ate, chaves))))
+
+    if not partes:
+        return _tabela(serie, colunas, [])
+    return pa.concat_tables(partes) if len(partes) > 1 else partes[0]
+
+
+def ler(serie: rollups.Serie, colunas: Optional[List[str]] = None, desde: Optional[datetime] = None,
+        ate: Optional[datetime] = None, chaves: Optional[Iterable] = None, conn=None):
+    """Como tabela(), em pandas.DataFrame; sem pyarrow (nada arquivado) lê só o banco."""
+    import pandas as pd
+
+    if pa is not None or manifesto(serie):
+        return tabela(serie, colunas, desde, ate, chaves, conn).to_pandas()
+    if conn is None:
+        with conexao() as conn:
+            return ler(serie, colunas, desde, ate, chaves, conn)
+    colunas = list(colunas or ("id", serie.chave, serie.tempo_origem) + serie.valores_origem)
+    return pd.DataFrame(list(_linhas_banco(conn, serie, colunas, desde, ate, chaves)), columns=colunas)
+
+
+def main():
+    if "--restaurar" in sys.argv:
+        i = sys.argv.index("--restaurar")
+        desde, ate = (datetime.fromisoformat(a) for a in sys.argv[i + 1:i + 3])
+        with conexao() as conn:
+            for serie in rollups.SERIES:
+                total = restaurar(conn, serie, desde, ate)
+                print(f"[arquivo] {serie.origem}: {total} leituras restauradas")
+            conn.commit()
+        return
+    if "--ate" in sys.argv:
+        ate = datetime.fromisoformat(sys.argv[sys.argv.index("--ate") + 1])
+        with conexao() as conn:
+            for serie in rollups.SERIES:
+                total = arquivar(conn, serie, ate)
+                print(f"[arquivo] {serie.origem}: {total} leituras arquivadas até {ate.date()}")
+        return
+    for serie in rollups.SERIES:
+        info = manifesto(serie)
+        print(f"[arquivo] {serie.origem}: " + (
+            f"{info['formato']}, fronteira {info['ate']}" if info else "nada arquivado"
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+# app/cache_http.py
+"""
+Cache HTTP das consultas que os dashboards repetem (série de um campo, lista
+de campos): versões de mudança por chave viram ETag / Last-Modified, um
+If-None-Match igual é respondido com 304 antes de ir ao banco, e o corpo JSON
+já serializado fica em memória, indexado pelos parâmetros e pela versão.
+
+As versões são deste processo: contam as gravações feitas por ele e as que a
+sincronização do cache de últimas leituras traz de outros processos. O que
+nenhum dos dois vê (retenção, campos criados por scripts) aparece quando as
+versões se renovam, a cada CACHE_HTTP_VALIDADE_S segundos. A ETag leva um
+identificador do processo: outra instância ou um reinício nunca confirma a
+ETag emitida por outro.
+"""
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from fastapi import Request, Response
+
+from app import json_rapido
+
+ATIVO = os.getenv("CACHE_HTTP", "1") == "1"
+
+# Chaves de versão: a lista de campos e cada campo (leituras e rollups)
+CAMPOS = "campos"
+
+def chave_campo(campo_id: int) -> tuple:
+    return ("campo", campo_id)
+
+_PROCESSO = uuid.uuid4().hex[:8]
+_UM_SEGUNDO = timedelta(seconds=1)
+
+
+def _agora() -> datetime:
+    # Last-Modified tem resolução de segundos
+    return datetime.now(timezone.utc).replace(microsecond=0)
+
+
+class Versoes:
+    """Contador de mudanças e instante da última mudança por chave."""
+
+    def __init__(self, validade_s: float = 60.0):
+        self.validade_s = validade_s
+        self._lock = threading.Lock()
+        self._versoes: Dict[Hashable, Tuple[int, datetime]] = {}
+        self._geracao = 0
+        self._inicio_geracao = _agora()
+        self._proxima_renovacao = time.monotonic() + validade_s
+
+    def incrementar(self, *chaves: Hashable):
+        agora = _agora()
+        with self._lock:
+            for chave in chaves:
+                n, anterior = self._versoes.get(chave, (0, self._inicio_geracao))
+                # Duas mudanças no mesmo segundo: If-Modified-Since não as
+                # distingue, então cada versão avança pelo menos 1 s
+                self._versoes[chave] = (n + 1, max(agora, anterior + _UM_SEGUNDO))
+
+    def invalidar(self):
+        """Muda todas as ETags (carga grande por fora, renovação periódica)."""
+        with self._lock:
+            self._renovar()
+
+    def _renovar(self):
+        # Nunca volta para antes de um Last-Modified já emitido
+        ultimo = max([m for _, m in self._versoes.values()] + [self._inicio_geracao])
+        self._versoes.clear()
+        self._geracao += 1
+        self._inicio_geracao = max(_agora(), ultimo + _UM_SEGUNDO)
+        self._proxima_renovacao = time.monotonic() + self.validade_s
+
+    def estado(self, chave: Hashable) -> Tuple[str, datetime]:
+        """ETag e Last-Modified atuais da chave."""
+        with self._lock:
+            if time.monotonic() >= self._proxima_renovacao:
+                self._renovar()
+            n, modificado = self._versoes.get(chave, (0, self._inicio_geracao))
+            return f'W/"{_PROCESSO}-{self._geracao}-{n}"', modificado
+
+
+class CacheRespostas:
+    """Corpos JSON prontos em LRU; a ETag faz parte da chave, então entradas velhas só esperam a vez de sair."""
+
+    def __init__(self, capacidade: int = 256):
+        self.capacidade = capacidade
+        self._entradas: "OrderedDict[Hashable, Tuple[bytes, dict]]" = OrderedDict()
+        self._acertos = 0
+        self._faltas = 0
+
+    def obter(self, chave: Hashable) -> Optional[Tuple[bytes, dict]]:
+        valor = self._entradas.get(chave)
+        if valor is None:
+            self._faltas += 1
+            return None
+        self._entradas.move_to_end(chave)
+        self._acertos += 1
+        return valor
+
+    def guardar(self, chave: Hashable, corpo: bytes, cabecalhos: dict):
+        self._entradas[chave] = (corpo, cabecalhos)
+        self._entradas.move_to_end(chave)
+        while len(self._entradas) > self.capacidade:
+            self._entradas.popitem(last=False)
+
+    def metricas(self) -> dict:
+        total = self._acertos + self._faltas
+        return {
+            "capacidade": self.capacidade,
+            "entradas": len(self._entradas),
+            "acertos": self._acertos,
+            "faltas": self._faltas,
+            "taxa_acerto": round(self._acertos / total, 4) if total else 0.0,
+        }
+
+
+versoes = Versoes(float(os.getenv("CACHE_HTTP_VALIDADE_S", 60)))
+
+# Desative só o cache de corpos com CACHE_RESPOSTAS=0 (as ETags continuam)
+_capacidade = int(os.getenv("CACHE_RESPOSTAS", 256))
+_respostas: Optional[CacheRespostas] = CacheRespostas(_capacidade) if _capacidade > 0 else None
+_nao_modificadas = 0
+
+
+def registrar_mudanca(*chaves: Hashable):
+    """Chamado após o commit de gravações que afetam as chaves."""
+    if ATIVO and chaves:
+        versoes.incrementar(*chaves)
+
+
+def _confere(request: Request, etag: str, modificado: datetime) -> bool:
+    """True se a cópia do cliente ainda vale (If-None-Match tem precedência)."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Comparação fraca: W/"x" e "x" são a mesma versão
+        pedidas = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+        return "*" in pedidas or etag.removeprefix("W/") in pedidas
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            return modificado <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+Produtor = Callable[[], Awaitable[Tuple[object, dict]]]
+
+async def responder(request: Request, chave: Hashable, parametros: tuple, produzir: Produtor) -> Response:
+    """
+    Resposta JSON de uma consulta cacheável. `produzir` devolve (dados já em
+    tipos JSON/datetime, cabeçalhos extras) e só roda quando o cliente e o
+    cache estão desatualizados.
+    """
+    global _nao_modificadas
+    if not ATIVO:
+        dados, extras = await produzir()
+        return json_rapido.RespostaJSON(dados, headers=extras)
+
+    # Versão lida antes da consulta: os dados são no mínimo tão novos quanto ela
+    etag, modificado = versoes.estado(chave)
+    cabecalhos = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(modificado, usegmt=True),
+        "Cache-Control": "no-cache",
+    }
+    if _confere(request, etag, modificado):
+        _nao_modificadas += 1
+        return Response(status_code=304, headers=cabecalhos)
+
+    entrada = _respostas.obter((parametros, etag)) if _respostas is not None else None
+    if entrada is None:
+        dados, extras = await produzir()
+        corpo = json_rapido.dumps(dados)
+        entrada = (corpo, extras)
+        if _respostas is not None:
+            _respostas.guardar((parametros, etag), corpo, extras)
+    corpo, extras = entrada
+    return Response(content=corpo, media_type="application/json", headers={**cabecalhos, **extras})
+
+
+def metricas() -> dict:
+    if not ATIVO:
+        return {"ativo": False}
+    return {
+        "ativo": True,
+        "validade_s": versoes.validade_s,
+        "nao_modificadas": _nao_modificadas,
+        "respostas": _respostas.metricas() if _respostas is not None else {"ativo": False},
+    }
@@ -0,0 +1,158 @@
+# app/consultas.py
+"""
+Camada de consultas: cada SQL é escrito uma vez, com placeholders `?`, e
+renderizado para o backend da conexão na primeira execução.
+
+- SQLite: o sqlite3 guarda os statements compilados por conexão (cache LRU
+  pelo texto do SQL, ampliado em conectar_sqlite); o texto renderizado é
+  sempre o mesmo, então consultas quentes não são recompiladas.
+- Postgres: PREPARE no servidor na primeira execução em cada conexão do
+  pool; as seguintes são só EXECUTE, sem parse nem planejamento.
+- asyncpg prepara e guarda os statements sozinho (ver app.database_async).
+
+As linhas voltam como tuplas, ou no tipo `linha` da consulta (NamedTuple ou
+dataclass, montado posicionalmente na ordem do SELECT).
+"""
+import itertools
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Iterator, List, Optional, Sequence, Tuple
+
+import psycopg2
+import psycopg2.extensions
+
+from app import database_async
+
+
+@dataclass(frozen=True)
+class Consulta:
+    nome: str
+    sql: str                          # placeholders `?`; {nome} para partes variáveis
+    linha: Optional[Callable] = None  # tipo de cada linha; None = tupla
+
+    def para(self, **partes: str) -> "Consulta":
+        """Preenche as partes variáveis do SQL (ex.: tabela da partição)."""
+        return _formatar(self, tuple(sorted(partes.items())))
+
+
+@lru_cache(maxsize=None)
+def _formatar(consulta: Consulta, partes: Tuple[Tuple[str, str], ...]) -> Consulta:
+    sufixo = "_".join(valor for _, valor in partes)
+    return Consulta(f"{consulta.nome}_{sufixo}", consulta.sql.format(**dict(partes)), consulta.linha)
+
+
+@lru_cache(maxsize=None)
+def _postgres(consulta: Consulta) -> Tuple[str, str, str]:
+    """(PREPARE, EXECUTE, SQL com %s) da consulta."""
+    contador = iter(range(1, consulta.sql.count("?") + 1))
+    corpo = re.sub(r"\?", lambda _: f"${next(contador)}", consulta.sql)
+    n = consulta.sql.count("?")
+    argumentos = f" ({', '.join(['%s'] * n)})" if n else ""
+    return (
+        f"PREPARE {consulta.nome} AS {corpo}",
+        f"EXECUTE {consulta.nome}{argumentos}",
+        consulta.sql.replace("?", "%s"),
+    )
+
+
+# Statement sumiu, já existe ou o plano ficou inválido após DDL (ex.: migração)
+_ERROS_PREPARADOS = {"26000", "42P05", "0A000"}
+
+
+def _executar_postgres(conn, cur, consulta: Consulta, params: Sequence):
+    preparar, executar_sql, direto = _postgres(consulta)
+    preparadas = getattr(conn, "preparadas", None)
+    if preparadas is None:
+        # Conexão fora do pool (sem registro dos statements): execução simples
+        cur.execute(direto, params)
+        return
+    ocioso = conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+    try:
+        if consulta.nome not in preparadas:
+            cur.execute(preparar)
+            preparadas.add(consulta.nome)
+        cur.execute(executar_sql, params)
+    except psycopg2.Error as e:
+        if e.pgcode not in _ERROS_PREPARADOS or not ocioso:
+            raise
+        # Nada do chamador se perde: a transação começou neste comando
+        conn.rollback()
+        cur.execute("DEALLOCATE ALL")
+        preparadas.clear()
+        cur.execute(preparar)
+        preparadas.add(consulta.nome)
+        cur.execute(executar_sql, params)
+
+
+def cursor(conn):
+    """Cursor que devolve tuplas, nos dois backends."""
+    if getattr(conn, "backend", "sqlite") == "postgres":
+        return conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+    cur = conn.cursor()
+    cur.row_factory = None
+    return cur
+
+
+def executar(conn, consulta: Consulta, params: Sequence = ()):
+    """Executa a consulta (preparada no Postgres) e devolve o cursor."""
+    cur = cursor(conn)
+    if getattr(conn, "backend", "sqlite") == "postgres":
+        _executar_postgres(conn, cur, consulta, tuple(params))
+    else:
+        cur.execute(consulta.sql, tuple(params))
+    return cur
+
+
+def converter(consulta: Consulta, row) -> Any:
+    """Linha do driver (tupla, sqlite3.Row, asyncpg.Record) -> tipo da consulta."""
+    return consulta.linha(*row) if consulta.linha is not None else tuple(row)
+
+
+def todas(conn, consulta: Consulta, params: Sequence = ()) -> List[Any]:
+    rows = executar(conn, consulta, params).fetchall()
+    if consulta.linha is None:
+        return rows
+    return [consulta.linha(*r) for r in rows]
+
+
+def uma(conn, consulta: Consulta, params: Sequence = ()) -> Optional[Any]:
+    row = executar(conn, consulta, params).fetchone()
+    return converter(consulta, row) if row is not None else None
+
+
+_cursores_nomeados = itertools.count(1)
+
+
+def em_blocos(conn, consulta: Consulta, params: Sequence = (), tamanho: int = 1000) -> Iterator[List[Any]]:
+    """
+    Linhas da consulta em blocos de até `tamanho`, sem trazer o resultado
+    inteiro para a memória. No Postgres é um cursor nomeado (server-side, sem
+    PREPARE: DECLARE não aceita EXECUTE) dentro da transação da conexão; no
+    SQLite o próprio cursor avança sob demanda.
+    """
+    if getattr(conn, "backend", "sqlite") == "postgres":
+        cur = conn.cursor(name=f"{consulta.nome}_{next(_cursores_nomeados)}",
+                          cursor_factory=psycopg2.extensions.cursor)
+        cur.itersize = tamanho
+        cur.execute(_postgres(consulta)[2], tuple(params))
+    else:
+        cur = executar(conn, consulta, params)
+    try:
+        while True:
+            rows = cur.fetchmany(tamanho)
+            if not rows:
+                return
+            yield [converter(consulta, r) for r in rows]
+    finally:
+        cur.close()
+
+
+# Caminho assíncrono nativo: o SQL segue com `?` e o driver adapta/prepara
+async def todas_async(consulta: Consulta, params: Sequence = ()) -> List[Any]:
+    return [converter(consulta, r) for r in await database_async.consultar(consulta.sql, tuple(params))]
+
+
+async def escrever_async(consulta: Consulta, params: Sequence = (), complementos=()) -> Optional[Any]:
+    row = await database_async.escrever(consulta.sql, tuple(params), complementos)
+    return converter(consulta, row) if row is not None else None
@@ -1,32 +1,448 @@
+import io
 import os
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Iterable, List, Optional
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.pool import ThreadedConnectionPool
 from dotenv import load_dotenv
 
 load_dotenv()
 
+SQLITE_DB = "farm.db"
+
+# Perfil das conexões SQLite (todas passam por conectar_sqlite):
+# "wal" = leitores não bloqueiam o escritor; "padrao" = configuração de fábrica
+SQLITE_PERFIL = os.getenv("SQLITE_PERFIL", "wal")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")  # NORMAL é seguro em WAL
+SQLITE_CACHE_MB = int(os.getenv("SQLITE_CACHE_MB", 64))
+SQLITE_MMAP_MB = int(os.getenv("SQLITE_MMAP_MB", 256))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+# Statements compilados guardados por conexão (cache do sqlite3, ver app.consultas)
+SQLITE_STATEMENTS = int(os.getenv("SQLITE_STATEMENTS", 256))
+
+# Configuração do pool (variáveis de ambiente)
+# Linhas por COPY/executemany na carga em massa (carregar)
+LOTE_CARGA = int(os.getenv("DB_LOTE_CARGA", 50000))
+
+POOL_MIN = int(os.getenv("DB_POOL_MIN", 1))
+POOL_MAX = int(os.getenv("DB_POOL_MAX", 10))
+POOL_TIMEOUT_S = float(os.getenv("DB_POOL_TIMEOUT_S", 10))
+# Conexões ociosas há mais tempo que isso passam por um "SELECT 1" antes do uso
+POOL_HEALTHCHECK_S = float(os.getenv("DB_POOL_HEALTHCHECK_S", 30))
+# Failover: timeout de conexão e janela em que o Postgres fica fora de rota após uma falha
+CONNECT_TIMEOUT_S = int(os.getenv("DB_CONNECT_TIMEOUT_S", 5))
+FAILOVER_COOLDOWN_S = float(os.getenv("DB_FAILOVER_COOLDOWN_S", 30))
+
+
+class PoolEsgotadoError(Exception):
+    """Nenhuma conexão foi liberada dentro de DB_POOL_TIMEOUT_S."""
+
+
+class ConexaoPostgres(psycopg2.extensions.connection):
+    """Conexão psycopg2 que lembra os statements preparados nela (ver app.consultas)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.preparadas = set()
+
+
+class PoolPostgres:
+    """
+    Pool thread-safe de conexões psycopg2.
+    Evita o handshake TCP+TLS+auth a cada requisição e valida conexões
+    ociosas antes de entregá-las.
+    """
+
+    def __init__(self, dsn: str, minimo: int = POOL_MIN, maximo: int = POOL_MAX,
+                 timeout_s: float = POOL_TIMEOUT_S, healthcheck_s: float = POOL_HEALTHCHECK_S):
+        self._pool = ThreadedConnectionPool(
+            minimo, maximo, dsn,
+            cursor_factory=RealDictCursor,
+            connection_factory=ConexaoPostgres,
+            sslmode=os.getenv("SUPABASE_DB_SSLMODE", "require"),
+            connect_timeout=CONNECT_TIMEOUT_S
+        )
+        # ThreadedConnectionPool falha na hora quando esgotado; o semáforo faz o chamador esperar
+        self._vagas = threading.BoundedSemaphore(maximo)
+        self._ultimo_uso = {}
+        self.minimo = minimo
+        self.maximo = maximo
+        self.timeout_s = timeout_s
+        self.healthcheck_s = healthcheck_s
+
+    def obter(self):
+        if not self._vagas.acquire(timeout=self.timeout_s):
+            raise PoolEsgotadoError(f"Pool Postgres esgotado ({self.maximo} conexões em uso)")
+        try:
+            conn = self._pool.getconn()
+            if not self._saudavel(conn):
+                self._pool.putconn(conn, close=True)
+                conn = self._pool.getconn()
+            return conn
+        except Exception:
+            self._vagas.release()
+            raise
+
+    def devolver(self, conn):
+        try:
+            if conn.closed:
+                self._ultimo_uso.pop(id(conn), None)
+                self._pool.putconn(conn, close=True)
+                return
+            # Não devolve transação aberta para o próximo usuário
+            if conn.status != psycopg2.extensions.STATUS_READY:
+                conn.rollback()
+            self._ultimo_uso[id(conn)] = time.monotonic()
+            self._pool.putconn(conn)
+        except Exception:
+            self._ultimo_uso.pop(id(conn), None)
+            self._pool.putconn(conn, close=True)
+        finally:
+            self._vagas.release()
+
+    def _saudavel(self, conn) -> bool:
+        if conn.closed:
+            return False
+        ocioso = time.monotonic() - self._ultimo_uso.get(id(conn), 0)
+        if ocioso < self.healthcheck_s:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def fechar(self):
+        self._pool.closeall()
+
+
+def pragmas_sqlite(perfil: str = SQLITE_PERFIL) -> List[str]:
+    """PRAGMAs aplicados a cada conexão SQLite do perfil."""
+    pragmas = [f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}"]
+    if perfil == "wal":
+        pragmas += [
+            # journal_mode fica gravado no arquivo; os demais valem por conexão
+            "PRAGMA journal_mode = WAL",
+            f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}",
+            f"PRAGMA cache_size = -{SQLITE_CACHE_MB * 1024}",
+            f"PRAGMA mmap_size = {SQLITE_MMAP_MB * 1024 * 1024}",
+            "PRAGMA temp_store = MEMORY",
+        ]
+    return pragmas
+
+
+def configurar_sqlite(conn, perfil: str = SQLITE_PERFIL):
+    """Aplica o perfil numa conexão sqlite3 já aberta."""
+    for pragma in pragmas_sqlite(perfil):
+        conn.execute(pragma).fetchall()
+
+
+def conectar_sqlite(caminho: str = SQLITE_DB, perfil: str = SQLITE_PERFIL, **kwargs) -> sqlite3.Connection:
+    """sqlite3.connect com o perfil de desempenho; use no lugar de sqlite3.connect."""
+    kwargs.setdefault("cached_statements", SQLITE_STATEMENTS)
+    conn = sqlite3.connect(caminho, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000, **kwargs)
+    configurar_sqlite(conn, perfil)
+    return conn
+
+
+class PoolSQLite:
+    """
+    Uma conexão SQLite reutilizável por thread.
+    Empréstimos aninhados na mesma thread compartilham a conexão; a transação
+    pendente só é descartada quando o último empréstimo é devolvido.
+    """
+
+    def __init__(self, caminho: str = SQLITE_DB):
+        self.caminho = caminho
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._conexoes = []
+
+    def obter(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or not self._saudavel(conn):
+            conn = conectar_sqlite(self.caminho, check_same_thread=False)
+            conn.row_factory = sqlite3.Row  # Permite acesso por nome das colunas
+            self._local.conn = conn
+            self._local.emprestimos = 0
+            with self._lock:
+                self._conexoes.append(conn)
+        self._local.emprestimos += 1
+        return conn
+
+    def devolver(self, conn):
+        self._local.emprestimos = max(self._local.emprestimos - 1, 0)
+        if self._local.emprestimos == 0 and conn.in_transaction:
+            conn.rollback()
+
+    @staticmethod
+    def _saudavel(conn) -> bool:
+        try:
+            conn.total_changes  # levanta ProgrammingError se a conexão foi fechada
+            return True
+        except sqlite3.ProgrammingError:
+            return False
+
+    def fechar(self):
+        with self._lock:
+            for conn in self._conexoes:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._conexoes.clear()
+        self._local = threading.local()
+
+
+class ConexaoPool:
+    """
+    Conexão emprestada do pool. Delega tudo para a conexão real, mas
+    close() devolve a conexão ao pool em vez de encerrá-la.
+    """
+
+    def __init__(self, conn, pool, backend: str):
+        self._conn = conn
+        self._pool = pool
+        self.backend = backend
+
+    def __getattr__(self, nome):
+        return getattr(self._conn, nome)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.devolver(self._conn)
+            self._pool = None
+
+
+class SeletorBackend:
+    """
+    Circuit breaker entre o Postgres (primário) e o SQLite (fallback).
+    Depois de uma falha de conexão as requisições vão direto para o fallback,
+    sem pagar o timeout, enquanto uma thread sonda o primário a cada
+    `cooldown_s` e reabre a rota assim que ele responde.
+    """
+
+    def __init__(self, cooldown_s: float = FAILOVER_COOLDOWN_S):
+        self.cooldown_s = cooldown_s
+        self._lock = threading.Lock()
+        self._aberto = False
+        self.failovers = 0
+        self.recuperacoes = 0
+        self.falhas_primario = 0
+        self.ultimo_erro: Optional[str] = None
+        self.desde: Optional[str] = None
+
+    def usar_primario(self) -> bool:
+        return not self._aberto
+
+    def registrar_falha(self, database_url: str, erro: Exception):
+        with self._lock:
+            self.falhas_primario += 1
+            self.ultimo_erro = str(erro).strip()
+            if self._aberto:
+                return
+            self._aberto = True
+            self.failovers += 1
+            self.desde = datetime.utcnow().isoformat()
+            threading.Thread(
+                target=self._sondar, args=(database_url,), name="sonda-postgres", daemon=True
+            ).start()
+        print(f"Postgres indisponível, usando SQLite por pelo menos {self.cooldown_s:.0f}s")
+
+    def _sondar(self, database_url: str):
+        while True:
+            time.sleep(self.cooldown_s)
+            try:
+                conn = psycopg2.connect(
+                    database_url,
+                    sslmode=os.getenv("SUPABASE_DB_SSLMODE", "require"),
+                    connect_timeout=CONNECT_TIMEOUT_S
+                )
+                conn.close()
+            except Exception as e:
+                with self._lock:
+                    self.falhas_primario += 1
+                    self.ultimo_erro = str(e).strip()
+                continue
+
+            with self._lock:
+                self._aberto = False
+                self.recuperacoes += 1
+                self.desde = datetime.utcnow().isoformat()
+            print("Postgres recuperado, voltando ao banco primário.")
+            return
+
+    def estado(self) -> dict:
+        configurado = bool(os.getenv("DATABASE_URL"))
+        with self._lock:
+            return {
+                "backend_atual": "postgres" if configurado and not self._aberto else "sqlite",
+                "primario_configurado": configurado,
+                "circuito": "aberto" if self._aberto else "fechado",
+                "failovers": self.failovers,
+                "recuperacoes": self.recuperacoes,
+                "falhas_primario": self.falhas_primario,
+                "ultimo_erro": self.ultimo_erro,
+                "desde": self.desde,
+            }
+
+
+_lock_pools = threading.Lock()
+_pool_postgres = None
+_pool_sqlite = PoolSQLite()
+_seletor = SeletorBackend()
+
+
+def _get_pool_postgres(database_url: str) -> PoolPostgres:
+    global _pool_postgres
+    with _lock_pools:
+        if _pool_postgres is None:
+            _pool_postgres = PoolPostgres(database_url)
+        return _pool_postgres
+
+
+def _descartar_pool_postgres():
+    """Fecha o pool após uma falha; a recuperação recomeça com conexões novas."""
+    global _pool_postgres
+    with _lock_pools:
+        pool, _pool_postgres = _pool_postgres, None
+    if pool is not None:
+        try:
+            pool.fechar()
+        except Exception:
+            pass
+
+
 def get_connection():
     """
-    Retorna uma conexão com o banco de dados.
+    Retorna uma conexão emprestada do pool.
     Prioridade: DATABASE_URL (.env) -> Postgres
-    Fallback: SQLite (farm.db)
+    Fallback: SQLite (farm.db), usado direto enquanto o circuito estiver aberto.
+    Chame close() (ou use `conexao()`) para devolvê-la.
     """
     database_url = os.getenv("DATABASE_URL")
-    
-    if database_url:
+
+    if database_url and _seletor.usar_primario():
         try:
-            conn = psycopg2.connect(
-                database_url,
-                cursor_factory=RealDictCursor,
-                sslmode=os.getenv("SUPABASE_DB_SSLMODE", "require")
-            )
-            return conn
+            pool = _get_pool_postgres(database_url)
+            return ConexaoPool(pool.obter(), pool, "postgres")
+        except PoolEsgotadoError:
+            raise
         except Exception as e:
             print(f"Erro ao conectar no Postgres: {e}")
             print("Usando SQLite como fallback...")
-    
+            _descartar_pool_postgres()
+            _seletor.registrar_falha(database_url, e)
+
     # Fallback para SQLite
-    conn = sqlite3.connect("farm.db")
-    conn.row_factory = sqlite3.Row  # Permite acesso por nome das colunas
-    return conn
+    return ConexaoPool(_pool_sqlite.obter(), _pool_sqlite, "sqlite")
+
+
+@contextmanager
+def conexao():
+    """
+    Uso: `with conexao() as conn:`
+    Faz rollback em caso de erro e sempre devolve a conexão ao pool.
+    """
+    conn = get_connection()
+    try:
+        yield conn
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def estado_backend() -> dict:
+    """Backend em uso e contadores de failover (exposto no /health)."""
+    return _seletor.estado()
+
+
+def adaptar_sql(conn, sql: str) -> str:
+    """Troca os placeholders `?` por `%s` quando a conexão é Postgres (psycopg2)."""
+    if getattr(conn, "backend", "sqlite") == "postgres":
+        return sql.replace("?", "%s")
+    return sql
+
+
+def inserir_varios(conn, tabela: str, colunas: tuple, linhas: list) -> list:
+    """
+    Insere várias linhas numa única ida ao banco (sem commit) e retorna os ids.
+    Postgres: um INSERT multi-VALUES com RETURNING id.
+    SQLite: executemany; o lock de escrita vale até o commit, então os ids
+    são sequenciais e terminam em last_insert_rowid().
+    """
+    if not linhas:
+        return []
+    cur = conn.cursor()
+    nomes = ", ".join(colunas)
+
+    if getattr(conn, "backend", "sqlite") == "postgres":
+        rows = execute_values(
+            cur, f"INSERT INTO {tabela} ({nomes}) VALUES %s RETURNING id",
+            linhas, page_size=len(linhas), fetch=True
+        )
+        return [r["id"] for r in rows]
+
+    marcadores = ", ".join("?" for _ in colunas)
+    cur.executemany(f"INSERT INTO {tabela} ({nomes}) VALUES ({marcadores})", linhas)
+    cur.execute("SELECT last_insert_rowid()")
+    ultimo_id = cur.fetchone()[0]
+    return list(range(ultimo_id - len(linhas) + 1, ultimo_id + 1))
+
+
+def _campo_copy(valor) -> str:
+    """Valor no formato texto do COPY (\\N = NULL)."""
+    if valor is None:
+        return "\\N"
+    texto = valor.isoformat() if isinstance(valor, datetime) else str(valor)
+    return texto.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def carregar(conn, tabela: str, colunas: tuple, linhas: Iterable[tuple], lote: int = LOTE_CARGA,
+             ao_gravar: Optional[Callable[[List[tuple]], None]] = None) -> int:
+    """
+    Carga em massa para seeds e restaurações (sem commit: tudo na transação do chamador).
+    Postgres: COPY FROM STDIN; SQLite: executemany. As linhas são consumidas em
+    blocos de `lote`, então um gerador nunca fica inteiro em memória.
+    `ao_gravar` recebe cada bloco gravado (ex.: atualizar rollups). Retorna o total.
+    """
+    cur = conn.cursor()
+    nomes = ", ".join(colunas)
+    postgres = getattr(conn, "backend", "sqlite") == "postgres"
+    sql = f"COPY {tabela} ({nomes}) FROM STDIN" if postgres else \
+        f"INSERT INTO {tabela} ({nomes}) VALUES ({', '.join('?' for _ in colunas)})"
+
+    total = 0
+    linhas = iter(linhas)
+    while True:
+        bloco = list(islice(linhas, lote))
+        if not bloco:
+            return total
+        if postgres:
+            dados = "".join("\t".join(_campo_copy(v) for v in linha) + "\n" for linha in bloco)
+            cur.copy_expert(sql, io.StringIO(dados))
+        else:
+            cur.executemany(sql, bloco)
+        if ao_gravar is not None:
+            ao_gravar(bloco)
+        total += len(bloco)
+
+
+def fechar_pools():
+    """Encerra todas as conexões mantidas pelos pools (shutdown)."""
+    global _pool_postgres
+    with _lock_pools:
+        if _pool_postgres is not None:
+            _pool_postgres.fechar()
+            _pool_postgres = None
+    _pool_sqlite.fechar()
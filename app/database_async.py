@@ -0,0 +1,255 @@
+# app/database_async.py
+"""
+Acesso assíncrono ao banco para as rotas FastAPI.
+
+DB_ASYNC=executor (padrão): as funções síncronas dos services rodam num
+ThreadPoolExecutor dedicado (DB_ASYNC_WORKERS), separado do threadpool do
+Starlette, e o event loop fica livre para segurar as conexões HTTP.
+DB_ASYNC=nativo: usa asyncpg (Postgres) ou aiosqlite (SQLite) quando
+instalados; sem o driver do backend ativo, cai para o executor.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import AsyncIterator, Callable, Iterator, List, Optional
+
+from app import particoes, tempo
+from app.database import SQLITE_DB, conexao, estado_backend, pragmas_sqlite
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+try:
+    import aiosqlite
+except ImportError:
+    aiosqlite = None
+
+MODO = os.getenv("DB_ASYNC", "executor")
+WORKERS = int(os.getenv("DB_ASYNC_WORKERS", 32))
+POOL_MIN = int(os.getenv("DB_POOL_MIN", 1))
+POOL_MAX = int(os.getenv("DB_POOL_MAX", 10))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_lock_executor = threading.Lock()
+_pool_pg = None
+_sqlite = None
+_lock: Optional[asyncio.Lock] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    # Criado no primeiro uso e recriado depois de fechar() (novo lifespan da API)
+    global _executor
+    if _executor is None:
+        with _lock_executor:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="db-async")
+    return _executor
+
+
+async def em_executor(func, *args, **kwargs):
+    """Executa uma função síncrona de acesso ao banco no executor dedicado."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), partial(func, *args, **kwargs))
+
+
+_FIM = object()
+
+async def transmitir(gerar: Callable[..., Iterator], *args, pendentes: int = 4) -> AsyncIterator:
+    """
+    Itens de um gerador síncrono de acesso ao banco (ex.: blocos de um cursor).
+    O gerador roda inteiro numa thread do executor dedicado, na mesma conexão
+    do começo ao fim, e fica no máximo `pendentes` itens à frente de quem
+    consome. Se o consumidor parar (cliente desconectou), o gerador é fechado
+    e a conexão volta ao pool.
+    """
+    loop = asyncio.get_running_loop()
+    fila: asyncio.Queue = asyncio.Queue()
+    vagas = threading.Semaphore(pendentes)
+    cancelado = threading.Event()
+
+    def entregar(item):
+        try:
+            loop.call_soon_threadsafe(fila.put_nowait, item)
+        except RuntimeError:
+            cancelado.set()  # event loop encerrado
+
+    def produzir():
+        gerador = gerar(*args)
+        try:
+            for item in gerador:
+                while not vagas.acquire(timeout=0.5):
+                    if cancelado.is_set():
+                        return
+                if cancelado.is_set():
+                    return
+                entregar(item)
+            entregar(_FIM)
+        except Exception as e:
+            entregar(e)
+        finally:
+            gerador.close()
+
+    produtor = loop.run_in_executor(_get_executor(), produzir)
+    try:
+        while True:
+            item = await fila.get()
+            if item is _FIM:
+                break
+            if isinstance(item, Exception):
+                raise item
+            vagas.release()
+            yield item
+    finally:
+        cancelado.set()
+        # O gerador é fechado (cursor e conexão) na própria thread do executor
+        await asyncio.shield(produtor)
+
+
+def backend() -> str:
+    """Backend ativo no momento (postgres ou sqlite)."""
+    return estado_backend()["backend_atual"]
+
+
+def nativo_disponivel() -> bool:
+    """True quando DB_ASYNC=nativo e o driver do backend ativo está instalado."""
+    if MODO != "nativo":
+        return False
+    if backend() == "postgres":
+        return asyncpg is not None
+    return aiosqlite is not None
+
+
+def _detectar_formato() -> str:
+    with conexao() as conn:
+        return tempo.formato(conn)
+
+
+async def formato_timestamp() -> str:
+    """Formato do timestamp no backend ativo (ver app.tempo); detecta uma vez no executor."""
+    fmt = tempo.formato_backend(backend())
+    if fmt is None:
+        fmt = await em_executor(_detectar_formato)
+    return fmt
+
+
+def _detectar_particionamento() -> bool:
+    with conexao() as conn:
+        return particoes.particionado(conn)
+
+
+async def leituras_particionadas() -> bool:
+    """True quando o backend ativo é SQLite com tabelas por período (ver app.particoes)."""
+    atual = backend()
+    if atual == "postgres":
+        return False
+    particionado = particoes.particionado_backend(atual)
+    if particionado is None:
+        particionado = await em_executor(_detectar_particionamento)
+    return particionado
+
+
+def _para_postgres(sql: str) -> str:
+    """Converte placeholders `?` para o estilo posicional do asyncpg ($1, $2...)."""
+    partes = sql.split("?")
+    return "".join(
+        parte + (f"${i}" if i < len(partes) else "")
+        for i, parte in enumerate(partes, start=1)
+    )
+
+
+async def _get_lock() -> asyncio.Lock:
+    global _lock
+    if _lock is None:
+        _lock = asyncio.Lock()
+    return _lock
+
+
+async def _get_pool_pg():
+    global _pool_pg
+    if _pool_pg is None:
+        async with await _get_lock():
+            if _pool_pg is None:
+                _pool_pg = await asyncpg.create_pool(
+                    os.getenv("DATABASE_URL"),
+                    min_size=POOL_MIN,
+                    max_size=POOL_MAX,
+                    ssl=os.getenv("SUPABASE_DB_SSLMODE", "require"),
+                )
+    return _pool_pg
+
+
+async def _get_sqlite():
+    global _sqlite
+    if _sqlite is None:
+        async with await _get_lock():
+            if _sqlite is None:
+                conn = await aiosqlite.connect(SQLITE_DB)
+                for pragma in pragmas_sqlite():
+                    await conn.execute(pragma)
+                conn.row_factory = aiosqlite.Row
+                _sqlite = conn
+    return _sqlite
+
+
+async def consultar(sql: str, params: tuple = ()) -> List[tuple]:
+    """SELECT assíncrono; o SQL usa `?` e é adaptado ao driver do backend."""
+    if backend() == "postgres":
+        pool = await _get_pool_pg()
+        async with pool.acquire() as conn:
+            return await conn.fetch(_para_postgres(sql), *params)
+
+    conn = await _get_sqlite()
+    # Mesma conexão das escritas: ler no meio de uma delas veria a transação aberta
+    async with await _get_lock():
+        async with conn.execute(sql, params) as cur:
+            return await cur.fetchall()
+
+
+async def escrever(sql: str, params: tuple = (), complementos: List[tuple] = ()) -> Optional[tuple]:
+    """
+    Executa um comando de escrita (com RETURNING) e faz o commit.
+    `complementos` são (sql, params) executados na mesma transação (ex.: rollups).
+    """
+    if backend() == "postgres":
+        pool = await _get_pool_pg()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                row = await conn.fetchrow(_para_postgres(sql), *params)
+                for sql_extra, params_extra in complementos:
+                    await conn.execute(_para_postgres(sql_extra), *params_extra)
+            return row
+
+    conn = await _get_sqlite()
+    # A conexão aiosqlite é compartilhada: o lock mantém INSERT e commit juntos
+    async with await _get_lock():
+        try:
+            async with conn.execute(sql, params) as cur:
+                row = await cur.fetchone()
+            for sql_extra, params_extra in complementos:
+                await conn.execute(sql_extra, params_extra)
+        except Exception:
+            await conn.rollback()
+            raise
+        await conn.commit()
+    return row
+
+
+async def fechar():
+    """Fecha pool asyncpg, conexão aiosqlite e o executor (shutdown); o próximo uso recria tudo."""
+    global _pool_pg, _sqlite, _lock, _executor
+    if _pool_pg is not None:
+        await _pool_pg.close()
+        _pool_pg = None
+    if _sqlite is not None:
+        await _sqlite.close()
+        _sqlite = None
+    _lock = None  # preso ao event loop que está terminando
+    with _lock_executor:
+        executor, _executor = _executor, None
+    if executor is not None:
+        # Espera as tarefas em andamento sem bloquear o event loop
+        await asyncio.get_running_loop().run_in_executor(None, executor.shutdown)
@@ -0,0 +1,51 @@
+# app/json_rapido.py
+"""
+JSON das respostas de listagem montado direto das linhas do banco, sem
+modelos Pydantic por linha nem jsonable_encoder: os services entregam dicts
+com os mesmos campos e tipos dos modelos documentados (Leitura, Campo) e a
+resposta é serializada de uma vez.
+
+Usa orjson quando instalado (pip install orjson); sem ele, o serializador
+do pydantic-core (Pydantic 2) e, por último, o json da biblioteca padrão.
+A saída é a mesma nos três, exceto a grafia de floats em notação
+científica (1e-7, 1e+16, 1e-07), que varia mas tem o mesmo valor.
+"""
+import json
+from datetime import datetime
+from typing import Any
+
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from pydantic_core import to_json
+except ImportError:  # Pydantic 1
+    to_json = None
+
+
+def _padrao(obj):
+    # Mesmo formato do jsonable_encoder (e do orjson) para datetimes
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(obj).__name__}")
+
+
+def dumps(conteudo: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(conteudo)
+    if to_json is not None:
+        return to_json(conteudo)
+    return json.dumps(conteudo, default=_padrao, ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode()
+
+
+class RespostaJSON(Response):
+    """JSONResponse com dumps acima; o response_model da rota segue só na documentação."""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
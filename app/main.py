@@ -4,9 +4,11 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 # Importa os Roteadores (que contêm as rotas)
-from app.routers import sensores, irrigacao
-# IMPORTANTE: Certifique-se de ter criado 'app/routers/campos.py' também.
-# from app.routers import campos 
+from app.routers import campos, sensores, irrigacao
+from app import database_async, particoes
+from app.database import estado_backend, fechar_pools
+from app.migracoes import aplicar_migracoes
+from app.services import sensor_service
 
 app = FastAPI(
     title="FarmTech API",
@@ -29,14 +31,35 @@ app.add_middleware(
 # O prefixo define a URL base (ex: /api/sensores/registrar)
 app.include_router(sensores.router, prefix="/api/sensores", tags=["Sensores"])
 app.include_router(irrigacao.router, prefix="/api/irrigacao", tags=["Irrigação (ML)"])
+app.include_router(campos.router, prefix="/api/campos", tags=["Campos"])
 
-# Descomente abaixo quando tiver o arquivo routers/campos.py pronto
-# app.include_router(campos.router, prefix="/api/campos", tags=["Campos"])
+# Migrações pendentes (desative com DB_MIGRAR_NA_INICIALIZACAO=0) e manutenção
+# das partições de leituras, quando o particionamento estiver ativo.
+# Buffer de ingestão opcional (INGEST_BUFFER=1): inicia a thread escritora
+# e garante o flush das leituras pendentes no desligamento, antes de fechar o pool.
+# O cache de últimas leituras (CACHE_ULTIMAS) é aquecido com os campos cadastrados.
+@app.on_event("startup")
+def iniciar_servicos():
+    if os.getenv("DB_MIGRAR_NA_INICIALIZACAO", "1") == "1":
+        aplicar_migracoes()
+    particoes.manter()
+    sensor_service.iniciar_buffer_ingestao()
+    sensor_service.aquecer_cache_ultimas()
+
+@app.on_event("shutdown")
+async def encerrar_servicos():
+    sensor_service.parar_buffer_ingestao()
+    await database_async.fechar()
+    fechar_pools()
 
 # Health Check simples
 @app.get("/health", tags=["Sistema"])
 def health_check():
-    return {"status": "online", "arquitetura": "microservices-ready"}
+    return {
+        "status": "online",
+        "arquitetura": "microservices-ready",
+        "banco": estado_backend(),
+    }
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,389 @@
+# app/migracoes.py
+"""
+Migrações versionadas do schema (SQLite e Postgres).
+
+Cada migração tem um número de versão, o DDL de cada backend e, se precisar,
+uma função Python para ajustes de dados. As versões aplicadas ficam na tabela
+schema_version; rodar de novo só aplica as pendentes.
+
+Migrações opcionais (MIGRACOES_OPCIONAIS) só rodam quando habilitadas,
+por variável de ambiente ou pela linha de comando.
+
+Uso: python -m app.migracoes              (aplica as pendentes)
+     python -m app.migracoes --epoch-ms   (inclui a conversão de timestamps para epoch ms)
+     python -m app.migracoes --particoes  (inclui o particionamento mensal das leituras)
+     python -m app.migracoes --status     (lista aplicadas/pendentes)
+"""
+import os
+import sqlite3
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from app import particoes, rollups, tempo
+from app.database import adaptar_sql, conexao
+
+
+@dataclass
+class Migracao:
+    versao: int
+    descricao: str
+    sqlite: List[str] = field(default_factory=list)
+    postgres: List[str] = field(default_factory=list)
+    funcao: Optional[Callable] = None  # recebe a conexão, roda depois do DDL
+
+
+def _backend(conn) -> str:
+    return getattr(conn, "backend", "postgres" if not isinstance(conn, sqlite3.Connection) else "sqlite")
+
+
+def _colunas(conn, tabela: str) -> set:
+    cur = conn.cursor()
+    if _backend(conn) == "postgres":
+        cur.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = %s", (tabela,)
+        )
+        return {r["column_name"] for r in cur.fetchall()}
+    cur.execute(f"PRAGMA table_info({tabela})")
+    return {r[1] for r in cur.fetchall()}
+
+
+def _indices_agro(conn):
+    # farm.db antigos podem ter o schema EcoWork (sensors.workstation_id):
+    # só indexa as colunas que existem
+    cur = conn.cursor()
+    if "sector_id" in _colunas(conn, "sensors"):
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_sensors_sector ON sensors (sector_id)")
+    if {"sensor_id", "recorded_at"} <= _colunas(conn, "sensor_readings"):
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_sensor_readings_sensor_recorded "
+            "ON sensor_readings (sensor_id, recorded_at)"
+        )
+
+
+MIGRACOES: List[Migracao] = [
+    Migracao(
+        1, "Tabela de leituras dos sensores da API",
+        sqlite=["""
+            CREATE TABLE IF NOT EXISTS leituras_sensores (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                campo_id INTEGER,
+                umidade REAL,
+                ph REAL,
+                nutrientes REAL,
+                temperatura REAL,
+                timestamp TEXT
+            )
+        """],
+        postgres=["""
+            CREATE TABLE IF NOT EXISTS leituras_sensores (
+                id BIGSERIAL PRIMARY KEY,
+                campo_id INTEGER,
+                umidade DOUBLE PRECISION,
+                ph DOUBLE PRECISION,
+                nutrientes DOUBLE PRECISION,
+                temperatura DOUBLE PRECISION,
+                timestamp TEXT
+            )
+        """],
+    ),
+    Migracao(
+        2, "Tabela de campos",
+        sqlite=["""
+            CREATE TABLE IF NOT EXISTS campos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                nome TEXT NOT NULL,
+                cultura TEXT,
+                largura REAL,
+                comprimento REAL,
+                area_m2 REAL
+            )
+        """],
+        postgres=["""
+            CREATE TABLE IF NOT EXISTS campos (
+                id SERIAL PRIMARY KEY,
+                nome TEXT NOT NULL,
+                cultura TEXT,
+                largura DOUBLE PRECISION,
+                comprimento DOUBLE PRECISION,
+                area_m2 DOUBLE PRECISION
+            )
+        """],
+    ),
+    Migracao(
+        3, "Índices de leituras por campo e tempo",
+        # Atende WHERE campo_id = ? ORDER BY timestamp DESC LIMIT n sem scan + sort.
+        # No Postgres o INCLUDE cobre as colunas lidas (index-only scan).
+        sqlite=[
+            "CREATE INDEX IF NOT EXISTS idx_leituras_campo_timestamp "
+            "ON leituras_sensores (campo_id, timestamp DESC)",
+            "CREATE INDEX IF NOT EXISTS idx_leituras_timestamp ON leituras_sensores (timestamp DESC)",
+        ],
+        postgres=[
+            "CREATE INDEX IF NOT EXISTS idx_leituras_campo_timestamp "
+            "ON leituras_sensores (campo_id, timestamp DESC) "
+            "INCLUDE (umidade, ph, nutrientes, temperatura)",
+            "CREATE INDEX IF NOT EXISTS idx_leituras_timestamp ON leituras_sensores (timestamp DESC)",
+        ],
+    ),
+    Migracao(
+        4, "Schema Agro-Sustentável (setores, sensores e leituras)",
+        sqlite=[
+            """
+            CREATE TABLE IF NOT EXISTS sectors (
+                id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,       -- Ex: "Talhão Norte", "Setor A"
+                crop_type TEXT,           -- Ex: "Soja", "Milho", "Pasto", "Floresta"
+                area_hectares REAL,       -- Tamanho da área
+                status TEXT               -- Ex: "Ativo", "Em Recuperação"
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS sensors (
+                id TEXT PRIMARY KEY,
+                sector_id TEXT,
+                name TEXT NOT NULL,
+                type TEXT NOT NULL,       -- "co2_emission", "luminosity", "crop_density"
+                unit TEXT NOT NULL,       -- "kg/ha", "lux", "plants/m2"
+                FOREIGN KEY(sector_id) REFERENCES sectors(id)
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS sensor_readings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                sensor_id TEXT,
+                value REAL NOT NULL,
+                recorded_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY(sensor_id) REFERENCES sensors(id)
+            )
+            """,
+        ],
+        postgres=[
+            """
+            CREATE TABLE IF NOT EXISTS sectors (
+                id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                crop_type TEXT,
+                area_hectares DOUBLE PRECISION,
+                status TEXT
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS sensors (
+                id TEXT PRIMARY KEY,
+                sector_id TEXT REFERENCES sectors(id),
+                name TEXT NOT NULL,
+                type TEXT NOT NULL,
+                unit TEXT NOT NULL
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS sensor_readings (
+                id BIGSERIAL PRIMARY KEY,
+                sensor_id TEXT REFERENCES sensors(id),
+                value DOUBLE PRECISION NOT NULL,
+                recorded_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+        ],
+        funcao=_indices_agro,
+    ),
+    Migracao(
+        5, "Rollups de leituras por minuto, hora e dia",
+        # Tabelas criadas e preenchidas a partir do histórico (ver app.rollups)
+        funcao=rollups.criar_tabelas,
+    ),
+    Migracao(
+        6, "Índice de sensor_readings por recorded_at (retenção)",
+        # DELETE em lotes do app.retencao filtra só por recorded_at
+        sqlite=["CREATE INDEX IF NOT EXISTS idx_sensor_readings_recorded ON sensor_readings (recorded_at)"],
+        postgres=["CREATE INDEX IF NOT EXISTS idx_sensor_readings_recorded ON sensor_readings (recorded_at)"],
+    ),
+]
+
+
+def _reconstruir_sqlite(conn, tabela: str, ddl: str, colunas: List[str], coluna_tempo: str):
+    """SQLite não altera o tipo de coluna: copia para `ddl` convertendo o timestamp e recria os índices."""
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (tabela,)
+    )
+    indices = [r[0] for r in cur.fetchall()]
+    cur.execute(ddl.format(tabela=f"{tabela}_epoch"))
+    selecao = [tempo.sql_epoch_ms("sqlite", tempo.ISO, c) if c == coluna_tempo else c for c in colunas]
+    cur.execute(
+        f"INSERT INTO {tabela}_epoch ({', '.join(colunas)}) SELECT {', '.join(selecao)} FROM {tabela}"
+    )
+    cur.execute(f"DROP TABLE {tabela}")
+    cur.execute(f"ALTER TABLE {tabela}_epoch RENAME TO {tabela}")
+    for sql in indices:
+        cur.execute(sql)
+
+
+def _converter_epoch_ms(conn):
+    """
+    Converte leituras_sensores.timestamp e sensor_readings.recorded_at de texto
+    ISO para INTEGER (epoch ms, UTC); o DEFAULT de recorded_at passa a ser o
+    instante atual em epoch ms.
+    """
+    cur = conn.cursor()
+    # Partições (e a chave de partição no Postgres) já teriam o tipo antigo
+    cur.execute(
+        adaptar_sql(conn, "SELECT versao FROM schema_version WHERE versao = ?"), (particoes.VERSAO_PARTICOES,)
+    )
+    if cur.fetchone() is not None:
+        raise RuntimeError("Converta os timestamps para epoch ms antes de particionar as leituras")
+    if _backend(conn) == "postgres":
+        cur.execute(
+            "ALTER TABLE leituras_sensores ALTER COLUMN timestamp TYPE BIGINT "
+            f"USING {tempo.sql_epoch_ms('postgres', tempo.ISO, 'timestamp')}"
+        )
+        cur.execute("ALTER TABLE sensor_readings ALTER COLUMN recorded_at DROP DEFAULT")
+        cur.execute(
+            "ALTER TABLE sensor_readings ALTER COLUMN recorded_at TYPE BIGINT "
+            f"USING {tempo.sql_epoch_ms('postgres', tempo.ISO, 'recorded_at')}"
+        )
+        cur.execute(
+            "ALTER TABLE sensor_readings ALTER COLUMN recorded_at "
+            "SET DEFAULT (EXTRACT(EPOCH FROM now()) * 1000)::BIGINT"
+        )
+        return
+
+    _reconstruir_sqlite(conn, "leituras_sensores", """
+        CREATE TABLE {tabela} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            campo_id INTEGER,
+            umidade REAL,
+            ph REAL,
+            nutrientes REAL,
+            temperatura REAL,
+            timestamp INTEGER
+        )
+    """, ["id", "campo_id", "umidade", "ph", "nutrientes", "temperatura", "timestamp"], "timestamp")
+    _reconstruir_sqlite(conn, "sensor_readings", f"""
+        CREATE TABLE {{tabela}} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sensor_id TEXT,
+            value REAL NOT NULL,
+            recorded_at INTEGER DEFAULT ({tempo.sql_epoch_ms('sqlite', tempo.ISO, "'now'")}),
+            FOREIGN KEY(sensor_id) REFERENCES sensors(id)
+        )
+    """, ["id", "sensor_id", "value", "recorded_at"], "recorded_at")
+
+
+MIGRACOES_OPCIONAIS = {
+    # Ativada por TIMESTAMP_EPOCH_MS=1 ou --epoch-ms (ver app.tempo)
+    "epoch_ms": Migracao(
+        tempo.VERSAO_EPOCH_MS, "Timestamps de leituras (API e sensores agro) em epoch ms (INTEGER)",
+        funcao=_converter_epoch_ms,
+    ),
+    # Ativada por LEITURAS_PARTICIONADAS=1 ou --particoes (ver app.particoes)
+    "particoes": Migracao(
+        particoes.VERSAO_PARTICOES, "Particionamento mensal de leituras_sensores",
+        funcao=particoes.migrar,
+    ),
+}
+
+
+def _migracoes_ativas(opcionais=None) -> List[Migracao]:
+    nomes = set(opcionais or ())
+    if os.getenv("TIMESTAMP_EPOCH_MS", "0") == "1":
+        nomes.add("epoch_ms")
+    if os.getenv("LEITURAS_PARTICIONADAS", "0") == "1":
+        nomes.add("particoes")
+    return sorted(
+        MIGRACOES + [MIGRACOES_OPCIONAIS[nome] for nome in nomes],
+        key=lambda m: m.versao
+    )
+
+
+def _garantir_tabela_versao(conn):
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            versao INTEGER PRIMARY KEY,
+            descricao TEXT NOT NULL,
+            aplicada_em TEXT NOT NULL
+        )
+    """)
+    conn.commit()
+
+
+def versoes_aplicadas(conn) -> set:
+    _garantir_tabela_versao(conn)
+    cur = conn.cursor()
+    cur.execute("SELECT versao FROM schema_version")
+    return {r[0] if not isinstance(r, dict) else r["versao"] for r in cur.fetchall()}
+
+
+def _aplicar(conn, migracao: Migracao):
+    cur = conn.cursor()
+    backend = _backend(conn)
+    # O módulo sqlite3 não abre transação para DDL: abre explicitamente
+    # para que a migração e o registro em schema_version sejam atômicos
+    if backend == "sqlite" and not conn.in_transaction:
+        cur.execute("BEGIN")
+    for comando in (migracao.postgres if backend == "postgres" else migracao.sqlite):
+        cur.execute(comando)
+    if migracao.funcao is not None:
+        migracao.funcao(conn)
+    cur.execute(
+        adaptar_sql(conn, "INSERT INTO schema_version (versao, descricao, aplicada_em) VALUES (?, ?, ?)"),
+        (migracao.versao, migracao.descricao, datetime.utcnow().isoformat())
+    )
+    conn.commit()
+
+
+def aplicar_migracoes(conn=None, verbose: bool = True, opcionais=None) -> List[int]:
+    """
+    Aplica as migrações pendentes, em ordem, cada uma na sua transação.
+    Sem `conn`, usa a conexão padrão da aplicação (Postgres ou SQLite).
+    `opcionais` lista nomes de MIGRACOES_OPCIONAIS a incluir.
+    Retorna as versões aplicadas nesta execução.
+    """
+    if conn is None:
+        with conexao() as conn:
+            return aplicar_migracoes(conn, verbose, opcionais)
+
+    aplicadas = versoes_aplicadas(conn)
+    novas = []
+    for migracao in _migracoes_ativas(opcionais):
+        if migracao.versao in aplicadas:
+            continue
+        try:
+            _aplicar(conn, migracao)
+        except Exception:
+            conn.rollback()
+            print(f"[migracoes] Falha na versão {migracao.versao}: {migracao.descricao}")
+            raise
+        novas.append(migracao.versao)
+        # Formato do timestamp e particionamento são detectados pelas versões aplicadas
+        tempo.limpar_cache()
+        particoes.limpar_cache()
+        if verbose:
+            print(f"[migracoes] v{migracao.versao} aplicada: {migracao.descricao}")
+    return novas
+
+
+def status(conn=None) -> List[dict]:
+    if conn is None:
+        with conexao() as conn:
+            return status(conn)
+    aplicadas = versoes_aplicadas(conn)
+    todas = MIGRACOES + [m for m in MIGRACOES_OPCIONAIS.values() if m.versao in aplicadas]
+    return [
+        {"versao": m.versao, "descricao": m.descricao, "aplicada": m.versao in aplicadas}
+        for m in sorted(todas, key=lambda m: m.versao)
+    ]
+
+
+if __name__ == "__main__":
+    if "--status" in sys.argv:
+        for item in status():
+            marca = "x" if item["aplicada"] else " "
+            print(f"[{marca}] v{item['versao']}: {item['descricao']}")
+    else:
+        opcoes = {"--epoch-ms": "epoch_ms", "--particoes": "particoes"}
+        novas = aplicar_migracoes(opcionais=[nome for flag, nome in opcoes.items() if flag in sys.argv])
+        print(f"{len(novas)} migração(ões) aplicada(s).")
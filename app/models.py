@@ -1,6 +1,6 @@
 # app/models.py
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 # ==============================
@@ -33,16 +33,48 @@ class LeituraCreate(BaseModel):
     ph: float
     nutrientes: float
     temperatura: float
+    # Opcional: gateways que bufferizam leituras informam o instante da coleta.
+    # Quando ausente, o servidor usa o horário do registro (UTC).
+    timestamp: Optional[datetime] = None
 
 
 class Leitura(BaseModel):
-    id: int
+    id: Optional[int] = None    # None enquanto a leitura aguarda o buffer de ingestão
     campo_id: int
     umidade: float
     ph: float
     nutrientes: float
     temperatura: float
     timestamp: datetime
+    pendente: bool = False
+
+
+class LeituraLoteItem(BaseModel):
+    indice: int                 # posição do item no lote enviado
+    status: str                 # "inserida" ou "rejeitada"
+    id: Optional[int] = None
+    erro: Optional[str] = None
+
+
+class LeituraLoteResponse(BaseModel):
+    total: int
+    inseridas: int
+    rejeitadas: int
+    itens: List[LeituraLoteItem]
+
+
+class ImportacaoErro(BaseModel):
+    linha: int                  # número da linha no arquivo (1 = primeira)
+    erro: str
+
+
+class ImportacaoResponse(BaseModel):
+    formato: str
+    linhas: int
+    aceitas: int
+    rejeitadas: int
+    lotes: int
+    erros: List[ImportacaoErro]  # limitado às primeiras ocorrências
 
 
 # ==============================
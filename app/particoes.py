@@ -0,0 +1,342 @@
+# app/particoes.py
+"""
+Particionamento mensal de `leituras_sensores` (migração opcional "particoes").
+
+Postgres: particionamento declarativo por RANGE(timestamp), uma partição
+por mês (leituras_sensores_pAAAA_MM) e uma partição DEFAULT para o que
+cair fora delas. O planner poda as partições nas consultas com intervalo.
+
+SQLite: `leituras_sensores` continua recebendo as escritas (tabela "quente")
+e a manutenção move os meses fechados para tabelas por período no mesmo
+arquivo. As consultas percorrem só as tabelas que cruzam o intervalo.
+
+Em ambos, a tabela particoes_leituras registra nome e limites (ISO, UTC) de
+cada partição, e descartar um mês inteiro é um DROP TABLE em vez de DELETE.
+
+Uso: python -m app.particoes                        (cria/rotaciona partições)
+     python -m app.particoes --status
+     python -m app.particoes --descartar-antes 2024-01
+"""
+import os
+import sys
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from app import tempo
+from app.database import adaptar_sql, conexao
+
+TABELA = "leituras_sensores"
+COLUNAS = "id, campo_id, umidade, ph, nutrientes, temperatura, timestamp"
+
+# Versão em schema_version que marca o particionamento (ver app.migracoes)
+VERSAO_PARTICOES = 101
+
+# Postgres: quantos meses à frente manter com partição criada
+MESES_A_FRENTE = int(os.getenv("PARTICOES_MESES_A_FRENTE", 3))
+
+_lock = threading.Lock()
+_particionado: Dict[str, bool] = {}
+
+
+@dataclass
+class Particao:
+    nome: str
+    inicio: Optional[datetime] = None   # None: tabela quente do SQLite (qualquer período)
+    fim: Optional[datetime] = None
+
+
+def _backend(conn) -> str:
+    return getattr(conn, "backend", "sqlite")
+
+
+def _valores(r, *nomes) -> tuple:
+    # RealDictRow (psycopg2) só aceita nome; sqlite3.Row e tuplas aceitam posição
+    return tuple(r[n] for n in nomes) if isinstance(r, dict) else tuple(r)
+
+
+def inicio_mes(dt: datetime) -> datetime:
+    return datetime(dt.year, dt.month, 1)
+
+
+def proximo_mes(dt: datetime) -> datetime:
+    return datetime(dt.year + dt.month // 12, dt.month % 12 + 1, 1)
+
+
+def nome_particao(mes: datetime) -> str:
+    return f"{TABELA}_p{mes.year:04d}_{mes.month:02d}"
+
+
+def particionado(conn) -> bool:
+    """True se a migração de particionamento foi aplicada neste backend (em cache)."""
+    backend = _backend(conn)
+    if backend not in _particionado:
+        with _lock:
+            cur = conn.cursor()
+            try:
+                cur.execute(
+                    adaptar_sql(conn, "SELECT versao FROM schema_version WHERE versao = ?"),
+                    (VERSAO_PARTICOES,)
+                )
+                _particionado[backend] = cur.fetchone() is not None
+            except Exception:
+                conn.rollback()
+                _particionado[backend] = False
+    return _particionado[backend]
+
+
+def particionado_backend(backend: str) -> Optional[bool]:
+    """Estado já detectado para o backend, ou None se ainda não houve detecção."""
+    return _particionado.get(backend)
+
+
+def limpar_cache():
+    with _lock:
+        _particionado.clear()
+
+
+def listar(conn) -> List[Particao]:
+    """Partições registradas, da mais recente para a mais antiga."""
+    cur = conn.cursor()
+    cur.execute("SELECT nome, inicio, fim FROM particoes_leituras ORDER BY inicio DESC")
+    return [
+        Particao(nome, datetime.fromisoformat(inicio), datetime.fromisoformat(fim))
+        for nome, inicio, fim in (_valores(r, "nome", "inicio", "fim") for r in cur.fetchall())
+    ]
+
+
+def tabelas(conn, inicio: Optional[datetime] = None, fim: Optional[datetime] = None) -> List[Particao]:
+    """
+    Tabelas a consultar para o intervalo [inicio, fim), da mais recente
+    para a mais antiga. No Postgres (e no SQLite sem particionamento) é
+    sempre a própria leituras_sensores.
+    """
+    quente = Particao(TABELA)
+    if _backend(conn) == "postgres" or not particionado(conn):
+        return [quente]
+    # Limites das partições são UTC sem tzinfo
+    inicio = tempo.utc_ingenuo(inicio) if inicio is not None else None
+    fim = tempo.utc_ingenuo(fim) if fim is not None else None
+    return [quente] + [
+        p for p in listar(conn)
+        if (inicio is None or p.fim > inicio) and (fim is None or p.inicio < fim)
+    ]
+
+
+def _registrar(conn, mes: datetime):
+    cur = conn.cursor()
+    cur.execute(
+        adaptar_sql(conn, "INSERT INTO particoes_leituras (nome, inicio, fim) VALUES (?, ?, ?)"),
+        (nome_particao(mes), mes.isoformat(), proximo_mes(mes).isoformat())
+    )
+
+
+# ==============================
+#    POSTGRES
+# ==============================
+
+def _criar_particao_postgres(conn, mes: datetime):
+    """
+    Cria a partição do mês. Linhas desse mês que estejam na partição DEFAULT
+    são movidas antes do ATTACH (senão o Postgres recusa a nova partição).
+    """
+    cur = conn.cursor()
+    nome = nome_particao(mes)
+    converter = tempo.conversor(tempo.formato(conn))
+    limites = (converter(mes), converter(proximo_mes(mes)))
+
+    cur.execute(f"CREATE TABLE {nome} (LIKE {TABELA} INCLUDING DEFAULTS)")
+    cur.execute(
+        f"WITH movidas AS (DELETE FROM {TABELA}_padrao WHERE timestamp >= %s AND timestamp < %s "
+        f"RETURNING {COLUNAS}) INSERT INTO {nome} ({COLUNAS}) SELECT {COLUNAS} FROM movidas",
+        limites
+    )
+    cur.execute(f"ALTER TABLE {TABELA} ATTACH PARTITION {nome} FOR VALUES FROM (%s) TO (%s)", limites)
+    _registrar(conn, mes)
+
+
+def garantir_particoes(conn, agora: Optional[datetime] = None,
+                       meses_a_frente: int = MESES_A_FRENTE) -> List[str]:
+    """Postgres: cria as partições do mês atual até `meses_a_frente` (sem commit)."""
+    existentes = {p.nome for p in listar(conn)}
+    mes = inicio_mes(agora or datetime.utcnow())
+    criadas = []
+    for _ in range(meses_a_frente + 1):
+        if nome_particao(mes) not in existentes:
+            _criar_particao_postgres(conn, mes)
+            criadas.append(nome_particao(mes))
+        mes = proximo_mes(mes)
+    return criadas
+
+
+def _converter_postgres(conn, indices: List[str]):
+    cur = conn.cursor()
+    tipo = "BIGINT" if tempo.formato(conn) == tempo.EPOCH_MS else "TEXT"
+    cur.execute(f"ALTER TABLE {TABELA} RENAME TO {TABELA}_legado")
+    # A sequência dos ids continua a mesma: nada de ids repetidos
+    cur.execute(f"ALTER SEQUENCE {TABELA}_id_seq OWNED BY NONE")
+    cur.execute(f"""
+        CREATE TABLE {TABELA} (
+            id BIGINT NOT NULL DEFAULT nextval('{TABELA}_id_seq'),
+            campo_id INTEGER,
+            umidade DOUBLE PRECISION,
+            ph DOUBLE PRECISION,
+            nutrientes DOUBLE PRECISION,
+            temperatura DOUBLE PRECISION,
+            timestamp {tipo}
+        ) PARTITION BY RANGE (timestamp)
+    """)
+    cur.execute(f"CREATE TABLE {TABELA}_padrao PARTITION OF {TABELA} DEFAULT")
+
+    cur.execute(f"SELECT MIN(timestamp) AS minimo FROM {TABELA}_legado WHERE timestamp IS NOT NULL")
+    minimo = cur.fetchone()["minimo"]
+    if minimo is not None:
+        mes, atual = inicio_mes(tempo.do_banco(minimo)), inicio_mes(datetime.utcnow())
+        while mes < atual:
+            _criar_particao_postgres(conn, mes)
+            mes = proximo_mes(mes)
+    garantir_particoes(conn)
+
+    cur.execute(f"INSERT INTO {TABELA} ({COLUNAS}) SELECT {COLUNAS} FROM {TABELA}_legado")
+    cur.execute(f"ALTER SEQUENCE {TABELA}_id_seq OWNED BY {TABELA}.id")
+    cur.execute(f"DROP TABLE {TABELA}_legado")
+    # Índices particionados: cada partição ganha o seu automaticamente
+    cur.execute(f"CREATE INDEX IF NOT EXISTS idx_leituras_id ON {TABELA} (id)")
+    for sql in indices:
+        cur.execute(sql)
+
+
+# ==============================
+#    SQLITE
+# ==============================
+
+def _criar_tabela_sqlite(conn, mes: datetime):
+    cur = conn.cursor()
+    nome = nome_particao(mes)
+    tipo = "INTEGER" if tempo.formato(conn) == tempo.EPOCH_MS else "TEXT"
+    cur.execute(f"""
+        CREATE TABLE {nome} (
+            id INTEGER PRIMARY KEY,
+            campo_id INTEGER,
+            umidade REAL,
+            ph REAL,
+            nutrientes REAL,
+            temperatura REAL,
+            timestamp {tipo}
+        )
+    """)
+    cur.execute(f"CREATE INDEX idx_{nome}_campo_timestamp ON {nome} (campo_id, timestamp DESC)")
+    _registrar(conn, mes)
+
+
+def rotacionar(conn, agora: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    SQLite: move da tabela quente para as tabelas por período todas as
+    leituras anteriores ao mês atual (sem commit). Retorna {partição: linhas}.
+    """
+    cur = conn.cursor()
+    converter = tempo.conversor(tempo.formato(conn))
+    limite = inicio_mes(agora or datetime.utcnow())
+    existentes = {p.nome for p in listar(conn)}
+    movidas = {}
+
+    cur.execute(f"SELECT MIN(timestamp) FROM {TABELA} WHERE timestamp < ?", (converter(limite),))
+    minimo = cur.fetchone()[0]
+    if minimo is None:
+        return movidas
+
+    mes = inicio_mes(tempo.do_banco(minimo))
+    while mes < limite:
+        de, ate = converter(mes), converter(proximo_mes(mes))
+        cur.execute(f"SELECT 1 FROM {TABELA} WHERE timestamp >= ? AND timestamp < ? LIMIT 1", (de, ate))
+        if cur.fetchone() is not None:
+            nome = nome_particao(mes)
+            if nome not in existentes:
+                _criar_tabela_sqlite(conn, mes)
+            cur.execute(
+                f"INSERT INTO {nome} ({COLUNAS}) SELECT {COLUNAS} FROM {TABELA} "
+                f"WHERE timestamp >= ? AND timestamp < ?", (de, ate)
+            )
+            movidas[nome] = cur.rowcount
+            cur.execute(f"DELETE FROM {TABELA} WHERE timestamp >= ? AND timestamp < ?", (de, ate))
+        mes = proximo_mes(mes)
+    return movidas
+
+
+# ==============================
+#    MIGRAÇÃO, MANUTENÇÃO E RETENÇÃO
+# ==============================
+
+def migrar(conn):
+    """Função da migração opcional "particoes" (chamada por app.migracoes)."""
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS particoes_leituras (
+            nome TEXT PRIMARY KEY,
+            inicio TEXT NOT NULL,
+            fim TEXT NOT NULL
+        )
+    """)
+    if _backend(conn) == "postgres":
+        cur.execute(
+            "SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname LIKE 'idx_%%'", (TABELA,)
+        )
+        _converter_postgres(conn, [r["indexdef"] for r in cur.fetchall()])
+    else:
+        rotacionar(conn)
+
+
+def manter(conn=None) -> dict:
+    """
+    Manutenção periódica (startup da API ou cron): Postgres cria as partições
+    dos próximos meses; SQLite move os meses fechados. Faz o commit.
+    """
+    if conn is None:
+        with conexao() as conn:
+            return manter(conn)
+    if not particionado(conn):
+        return {}
+    if _backend(conn) == "postgres":
+        resultado = {"criadas": garantir_particoes(conn)}
+    else:
+        if not conn.in_transaction:
+            conn.execute("BEGIN")
+        resultado = {"movidas": rotacionar(conn)}
+    conn.commit()
+    return resultado
+
+
+def descartar_anteriores(conn, antes_de: datetime) -> List[str]:
+    """
+    Retenção barata: remove as partições inteiramente anteriores a `antes_de`
+    (DETACH + DROP no Postgres, DROP TABLE no SQLite). Faz o commit.
+    Leituras antigas ainda na tabela quente/DEFAULT não são afetadas.
+    """
+    cur = conn.cursor()
+    removidas = []
+    for particao in listar(conn):
+        if particao.fim > antes_de:
+            continue
+        if _backend(conn) == "postgres":
+            cur.execute(f"ALTER TABLE {TABELA} DETACH PARTITION {particao.nome}")
+        cur.execute(f"DROP TABLE {particao.nome}")
+        cur.execute(adaptar_sql(conn, "DELETE FROM particoes_leituras WHERE nome = ?"), (particao.nome,))
+        removidas.append(particao.nome)
+    conn.commit()
+    return removidas
+
+
+if __name__ == "__main__":
+    with conexao() as conn:
+        if not particionado(conn):
+            print("Particionamento inativo: aplique com `python -m app.migracoes --particoes`.")
+            sys.exit(1)
+        if "--descartar-antes" in sys.argv:
+            mes = datetime.strptime(sys.argv[sys.argv.index("--descartar-antes") + 1], "%Y-%m")
+            for nome in descartar_anteriores(conn, mes):
+                print(f"[particoes] {nome} removida")
+        elif "--status" not in sys.argv:
+            print(f"[particoes] {manter(conn)}")
+        for particao in listar(conn):
+            print(f"{particao.nome}: {particao.inicio:%Y-%m-%d} a {particao.fim:%Y-%m-%d}")
@@ -0,0 +1,88 @@
+# app/protocolo_binario.py
+"""
+Formato binário compacto para leituras de dispositivos restritos (ESP32).
+
+Frame = cabeçalho + N registros de tamanho fixo, tudo little-endian:
+
+    cabeçalho (8 bytes):  magic b"FT" | versão u8 | reservado u8 | quantidade u32
+    registro (28 bytes):  campo_id u32 | timestamp i64 (epoch ms, 0 = horário do servidor)
+                          | umidade f32 | ph f32 | nutrientes f32 | temperatura f32
+
+Sem dependências além de struct (numpy é opcional), para poder ser usado
+tanto pela API quanto pelo simulador.
+"""
+import struct
+from typing import Iterable, List, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAGIC = b"FT"
+VERSAO = 1
+
+CABECALHO = struct.Struct("<2sBBI")
+REGISTRO = struct.Struct("<Iqffff")
+
+# Mesmo layout do REGISTRO, para leitura zero-copy com numpy.frombuffer
+DTYPE_REGISTRO = np.dtype([
+    ("campo_id", "<u4"),
+    ("timestamp", "<i8"),
+    ("umidade", "<f4"),
+    ("ph", "<f4"),
+    ("nutrientes", "<f4"),
+    ("temperatura", "<f4"),
+]) if np is not None else None
+
+Registro = Tuple[int, int, float, float, float, float]
+
+
+class FrameInvalidoError(ValueError):
+    """Frame com magic, versão ou tamanho inconsistentes."""
+
+
+def codificar_frame(registros: Iterable[Registro]) -> bytes:
+    """Empacota (campo_id, timestamp_ms, umidade, ph, nutrientes, temperatura) num frame."""
+    registros = list(registros)
+    frame = bytearray(CABECALHO.size + REGISTRO.size * len(registros))
+    CABECALHO.pack_into(frame, 0, MAGIC, VERSAO, 0, len(registros))
+    for i, registro in enumerate(registros):
+        REGISTRO.pack_into(frame, CABECALHO.size + i * REGISTRO.size, *registro)
+    return bytes(frame)
+
+
+def tamanho_frame(quantidade: int) -> int:
+    """Bytes de um frame com `quantidade` registros."""
+    return CABECALHO.size + quantidade * REGISTRO.size
+
+
+def ler_cabecalho(dados: bytes) -> int:
+    """Valida o cabeçalho e retorna a quantidade de registros do frame."""
+    if len(dados) < CABECALHO.size:
+        raise FrameInvalidoError("Frame menor que o cabeçalho")
+    magic, versao, _, quantidade = CABECALHO.unpack_from(dados)
+    if magic != MAGIC:
+        raise FrameInvalidoError("Magic inválido (esperado b'FT')")
+    if versao != VERSAO:
+        raise FrameInvalidoError(f"Versão de frame não suportada: {versao}")
+    esperado = tamanho_frame(quantidade)
+    if len(dados) != esperado:
+        raise FrameInvalidoError(f"Tamanho inconsistente: {len(dados)} bytes, esperado {esperado}")
+    return quantidade
+
+
+def decodificar_frame(dados: bytes):
+    """
+    Com numpy: array estruturado (DTYPE_REGISTRO) que é uma view sobre `dados`.
+    Sem numpy: lista de tuplas via struct.iter_unpack.
+    """
+    quantidade = ler_cabecalho(dados)
+    if np is not None:
+        return np.frombuffer(dados, dtype=DTYPE_REGISTRO, count=quantidade, offset=CABECALHO.size)
+    return decodificar_frame_struct(dados)
+
+
+def decodificar_frame_struct(dados: bytes) -> List[Registro]:
+    ler_cabecalho(dados)
+    return list(REGISTRO.iter_unpack(memoryview(dados)[CABECALHO.size:]))
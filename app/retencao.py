@@ -0,0 +1,320 @@
+# app/retencao.py
+"""
+Job de retenção: downsampling, remoção de leituras brutas antigas e compactação.
+
+1. Garante que os dias mais antigos que RETENCAO_DIAS estão nos rollups
+   (app.rollups); dias com mais leituras brutas que no rollup diário são
+   reconstruídos antes de qualquer remoção.
+2. Com ARQUIVO_ATIVO=1, copia as leituras antigas para Parquet/Arrow
+   (app.arquivo) antes de apagá-las.
+3. Descarta partições inteiras anteriores ao corte (app.particoes) e apaga
+   o restante em lotes de RETENCAO_LOTE linhas, com commit e pausa entre
+   lotes para não segurar o lock de escrita do SQLite.
+4. Poda os rollups por minuto/hora mais antigos que o configurado (os
+   diários ficam para sempre).
+5. Compacta: SQLite com VACUUM completo ou incremental + ANALYZE;
+   Postgres com VACUUM (ANALYZE). O incremental (padrão) depende de
+   auto_vacuum=INCREMENTAL: num banco ainda sem ele, a primeira execução
+   faz um VACUUM completo para convertê-lo (demora e precisa de espaço
+   livre do tamanho do arquivo) e as seguintes são incrementais.
+
+Depois da retenção, reconstrua rollups só com --desde: uma reconstrução
+completa perderia o histórico que já não existe em forma bruta.
+
+Uso: python -m app.retencao --dry-run        (só relata o que seria feito)
+     python -m app.retencao [--dias 90] [--vacuum completo|incremental|nao]
+     python -m app.retencao --loop           (repete a cada RETENCAO_INTERVALO_H horas)
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from app import arquivo, particoes, rollups
+from app.database import adaptar_sql, conexao, fechar_pools
+
+DIAS_BRUTAS = int(os.getenv("RETENCAO_DIAS", 90))
+DIAS_ROLLUP_MINUTO = int(os.getenv("RETENCAO_DIAS_MINUTO", 7))
+DIAS_ROLLUP_HORA = int(os.getenv("RETENCAO_DIAS_HORA", 365))
+LOTE = int(os.getenv("RETENCAO_LOTE", 5000))
+PAUSA_MS = float(os.getenv("RETENCAO_PAUSA_MS", 50))
+VACUUM = os.getenv("RETENCAO_VACUUM", "incremental")  # completo | incremental | nao
+INTERVALO_H = float(os.getenv("RETENCAO_INTERVALO_H", 24))
+
+
+def _backend(conn) -> str:
+    return getattr(conn, "backend", "sqlite")
+
+
+def _escalar(cur):
+    r = cur.fetchone()
+    if r is None:
+        return None
+    return next(iter(r.values())) if isinstance(r, dict) else r[0]
+
+
+def _contar(conn, serie: rollups.Serie, ate: Optional[datetime] = None,
+            desde: Optional[datetime] = None) -> int:
+    cur = conn.cursor()
+    coluna = serie.tempo_origem
+    filtros, params = [], []
+    if ate is not None:
+        filtros.append(f"{coluna} < ?")
+        params.append(rollups.limite_origem(conn, serie, ate))
+    if desde is not None:
+        filtros.append(f"{coluna} >= ?")
+        params.append(rollups.limite_origem(conn, serie, desde))
+    where = f" WHERE {' AND '.join(filtros)}" if filtros else ""
+    total = 0
+    for origem in rollups.origens(conn, serie, desde, ate):
+        cur.execute(adaptar_sql(conn, f"SELECT COUNT(*) AS n FROM {origem}{where}"), tuple(params))
+        total += _escalar(cur)
+    return total
+
+
+def dias_sem_rollup(conn, serie: rollups.Serie, corte: datetime) -> List[datetime]:
+    """
+    Dias anteriores ao corte com mais leituras brutas que o rollup diário.
+    Menos brutas que no rollup é esperado (remoção já começou): o rollup vale.
+    """
+    dia = rollups.mais_antiga(conn, serie, corte)
+    if dia is None:
+        return []
+    dia = rollups.truncar(dia, "dia")
+    cur = conn.cursor()
+    descobertos = []
+    while dia < corte:
+        seguinte = dia + timedelta(days=1)
+        brutas = _contar(conn, serie, seguinte, dia)
+        if brutas:
+            cur.execute(
+                adaptar_sql(conn, f"SELECT COALESCE(SUM(n), 0) AS n FROM {serie.tabela} "
+                                  "WHERE resolucao = 'dia' AND bucket = ?"),
+                (dia.isoformat(),)
+            )
+            if brutas > _escalar(cur):
+                descobertos.append(dia)
+        dia = seguinte
+    return descobertos
+
+
+def _tamanho(conn, tabelas: List[str]) -> Optional[int]:
+    """Bytes de tabelas + índices (dbstat no SQLite, pg_partition_tree no Postgres)."""
+    if not tabelas:
+        return 0
+    cur = conn.cursor()
+    try:
+        if _backend(conn) == "postgres":
+            total = 0
+            for tabela in tabelas:
+                cur.execute(
+                    "SELECT COALESCE(SUM(pg_total_relation_size(relid)), 0) AS n FROM pg_partition_tree(%s)",
+                    (tabela,)
+                )
+                total += _escalar(cur)
+            return total
+        marcadores = ", ".join("?" for _ in tabelas)
+        cur.execute(
+            f"SELECT COALESCE(SUM(pgsize), 0) FROM dbstat WHERE name IN "
+            f"(SELECT name FROM sqlite_master WHERE tbl_name IN ({marcadores}))", tuple(tabelas)
+        )
+        return _escalar(cur)
+    except Exception:
+        conn.rollback()
+        return None
+
+
+def _maior_id(conn, tabelas: List[str]) -> int:
+    cur = conn.cursor()
+    maior = 0
+    for tabela in tabelas:
+        cur.execute(f"SELECT COALESCE(MAX(id), 0) AS n FROM {tabela}")
+        maior = max(maior, _escalar(cur))
+    return maior
+
+
+def _apagar_em_lotes(conn, tabela: str, coluna: str, limite, lote: int, pausa_s: float,
+                     ate_id: Optional[int] = None) -> int:
+    """DELETE em lotes por id, com commit a cada lote; com `ate_id`, só ids até ele."""
+    cur = conn.cursor()
+    filtro_id = " AND id <= ?" if ate_id is not None else ""
+    sql = adaptar_sql(
+        conn, f"DELETE FROM {tabela} WHERE id IN (SELECT id FROM {tabela} WHERE {coluna} < ?{filtro_id} LIMIT ?)"
+    )
+    params = (limite, ate_id, lote) if ate_id is not None else (limite, lote)
+    total = 0
+    while True:
+        cur.execute(sql, params)
+        apagadas = cur.rowcount
+        conn.commit()
+        total += apagadas
+        if apagadas < lote:
+            return total
+        time.sleep(pausa_s)
+
+
+def _espaco_sqlite(conn) -> dict:
+    cur = conn.cursor()
+    valores = {}
+    for pragma in ("page_count", "freelist_count", "page_size"):
+        cur.execute(f"PRAGMA {pragma}")
+        valores[pragma] = _escalar(cur)
+    return {
+        "arquivo": valores["page_count"] * valores["page_size"],
+        "livre": valores["freelist_count"] * valores["page_size"],
+    }
+
+
+def compactar(conn, modo: str = VACUUM, tabelas: List[str] = ()) -> dict:
+    """
+    SQLite: VACUUM completo (e passa a auto_vacuum=INCREMENTAL) ou
+    incremental_vacuum, seguido de ANALYZE. O incremental num banco ainda
+    sem auto_vacuum=INCREMENTAL faz o VACUUM completo de conversão.
+    Postgres: VACUUM (ANALYZE) nas tabelas, fora de transação.
+    """
+    conn.commit()
+    cur = conn.cursor()
+    if _backend(conn) == "postgres":
+        if modo != "nao":
+            conn.set_session(autocommit=True)
+            try:
+                for tabela in tabelas:
+                    cur.execute(f"VACUUM (ANALYZE) {tabela}")
+            finally:
+                conn.set_session(autocommit=False)
+        return {"modo": modo}
+
+    antes = _espaco_sqlite(conn)
+    cur.execute("PRAGMA auto_vacuum")
+    incremental = _escalar(cur) == 2
+    executado = modo
+    if modo == "completo" or (modo == "incremental" and not incremental):
+        if not incremental:
+            # Só passa a valer depois de um VACUUM completo
+            cur.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        cur.execute("VACUUM")
+        if modo == "incremental":
+            executado = "completo (conversão para auto_vacuum incremental)"
+    elif modo == "incremental":
+        # Pelo execute() cada passo do pragma libera uma página só; executescript roda até o fim
+        cur.executescript("PRAGMA incremental_vacuum;")
+    cur.execute("ANALYZE")
+    conn.commit()
+    depois = _espaco_sqlite(conn)
+    return {
+        "modo": executado,
+        "arquivo_antes": antes["arquivo"],
+        "arquivo_depois": depois["arquivo"],
+        "bytes_devolvidos": antes["arquivo"] - depois["arquivo"],
+        "livre_no_arquivo": depois["livre"],
+    }
+
+
+def _podar_rollups(conn, agora: datetime, dry_run: bool) -> dict:
+    cur = conn.cursor()
+    podados = {}
+    for serie in rollups.SERIES:
+        for resolucao, dias in (("minuto", DIAS_ROLLUP_MINUTO), ("hora", DIAS_ROLLUP_HORA)):
+            limite = rollups.truncar(agora - timedelta(days=dias), "dia").isoformat()
+            filtro = f"FROM {serie.tabela} WHERE resolucao = ? AND bucket < ?"
+            if dry_run:
+                cur.execute(adaptar_sql(conn, f"SELECT COUNT(*) AS n {filtro}"), (resolucao, limite))
+                podados[f"{serie.tabela}.{resolucao}"] = _escalar(cur)
+            else:
+                cur.execute(adaptar_sql(conn, f"DELETE {filtro}"), (resolucao, limite))
+                podados[f"{serie.tabela}.{resolucao}"] = cur.rowcount
+    if not dry_run:
+        conn.commit()
+    return podados
+
+
+def executar(conn=None, dias: int = DIAS_BRUTAS, dry_run: bool = False, vacuum: str = VACUUM,
+             agora: Optional[datetime] = None) -> dict:
+    """Roda o job completo; com dry_run só conta linhas e estima bytes."""
+    if conn is None:
+        with conexao() as conn:
+            return executar(conn, dias, dry_run, vacuum, agora)
+
+    agora = agora or datetime.utcnow()
+    corte = rollups.truncar(agora - timedelta(days=dias), "dia")
+    relatorio = {"corte": corte.isoformat(), "dry_run": dry_run, "series": {}}
+
+    for serie in rollups.SERIES:
+        tabelas = rollups.origens(conn, serie, None, corte)
+        antigas, total = _contar(conn, serie, corte), _contar(conn, serie)
+        descobertos = dias_sem_rollup(conn, serie, corte)
+        # Estimativa proporcional às linhas (dbstat/pg_partition_tree dão o tamanho atual)
+        tamanho = _tamanho(conn, rollups.origens(conn, serie))
+        item = {
+            "tabelas": tabelas,
+            "leituras_antigas": antigas,
+            "dias_sem_rollup": [d.date().isoformat() for d in descobertos],
+            "bytes_estimados": int(tamanho * antigas / total) if tamanho and total else tamanho,
+        }
+        relatorio["series"][serie.origem] = item
+        if dry_run or not antigas:
+            continue
+
+        # 1. Downsampling: nada é removido sem estar no rollup
+        for dia in descobertos:
+            rollups.reconstruir(conn, serie, dia, dia + timedelta(days=1))
+            conn.commit()
+
+        # 2. Cópia para o arquivo colunar (app.arquivo), se ativo; leituras
+        # gravadas durante a cópia (ids acima do maior visto) ficam para a próxima
+        ate_id = None
+        if arquivo.ATIVO:
+            ate_id = _maior_id(conn, rollups.origens(conn, serie))
+            item["arquivadas"] = arquivo.arquivar(conn, serie, corte)
+
+        # 3. Partições inteiras saem com DROP; o resto em lotes
+        apagadas = 0
+        if serie is rollups.LEITURAS and particoes.particionado(conn):
+            item["particoes_descartadas"] = particoes.descartar_anteriores(conn, corte)
+            tabelas = rollups.origens(conn, serie, None, corte)
+        for tabela in tabelas:
+            apagadas += _apagar_em_lotes(
+                conn, tabela, serie.tempo_origem, rollups.limite_origem(conn, serie, corte),
+                LOTE, PAUSA_MS / 1000, ate_id
+            )
+        item["linhas_apagadas"] = apagadas
+
+    relatorio["rollups_podados"] = _podar_rollups(conn, agora, dry_run)
+    if not dry_run:
+        relatorio["compactacao"] = compactar(
+            conn, vacuum, [s.origem for s in rollups.SERIES] + [s.tabela for s in rollups.SERIES]
+        )
+    return relatorio
+
+
+def _argumento(nome: str, padrao):
+    if nome in sys.argv:
+        return type(padrao)(sys.argv[sys.argv.index(nome) + 1])
+    return padrao
+
+
+def main():
+    dias = _argumento("--dias", DIAS_BRUTAS)
+    vacuum = _argumento("--vacuum", VACUUM)
+    dry_run = "--dry-run" in sys.argv
+    try:
+        while True:
+            relatorio = executar(dias=dias, dry_run=dry_run, vacuum=vacuum)
+            print(f"[retencao] corte {relatorio['corte']}{' (dry-run)' if dry_run else ''}")
+            for origem, item in relatorio["series"].items():
+                print(f"  {origem}: {item}")
+            print(f"  rollups podados: {relatorio['rollups_podados']}")
+            if "compactacao" in relatorio:
+                print(f"  compactação: {relatorio['compactacao']}")
+            if "--loop" not in sys.argv:
+                break
+            time.sleep(INTERVALO_H * 3600)
+    except KeyboardInterrupt:
+        print("Job de retenção encerrado.")
+    finally:
+        fechar_pools()
+
+
+if __name__ == "__main__":
+    main()
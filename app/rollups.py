@@ -0,0 +1,282 @@
+# app/rollups.py
+"""
+Rollups das leituras por minuto, hora e dia.
+
+Para cada série (campo em leituras_sensores, sensor em sensor_readings) e
+cada bucket de tempo guardamos contagem, mínimo, máximo, soma e último valor
+de cada métrica. As tabelas são atualizadas de forma incremental, na mesma
+transação da inserção: cada lote é agregado em Python e mesclado com um
+upsert (ON CONFLICT), então consultas de longo prazo leem milhares de linhas
+de rollup em vez de milhões de leituras.
+
+Buckets e `ultimo_em` ficam sempre em texto ISO (UTC), independente do
+formato do timestamp das leituras (ver app.tempo).
+
+Uso: python -m app.rollups                 (reconstrói todos os rollups)
+     python -m app.rollups --desde 2025-01-01
+"""
+import os
+import sys
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app import particoes, tempo
+from app.database import adaptar_sql, conexao
+
+ATIVOS = os.getenv("ROLLUPS_ATIVOS", "1") == "1"
+
+RESOLUCOES = ("minuto", "hora", "dia")
+
+# Linhas lidas por vez na reconstrução
+LOTE_RECONSTRUCAO = 5000
+
+
+@dataclass(frozen=True)
+class Serie:
+    tabela: str
+    chave: str
+    metricas: Tuple[str, ...]
+    origem: str                      # tabela de leituras brutas
+    tempo_origem: str                # coluna de timestamp da origem
+    valores_origem: Tuple[str, ...]  # colunas da origem, na ordem de `metricas`
+
+
+LEITURAS = Serie(
+    "rollup_leituras", "campo_id", ("umidade", "ph", "nutrientes", "temperatura"),
+    "leituras_sensores", "timestamp", ("umidade", "ph", "nutrientes", "temperatura"),
+)
+SENSORES = Serie("rollup_sensores", "sensor_id", ("valor",), "sensor_readings", "recorded_at", ("value",))
+
+SERIES = (LEITURAS, SENSORES)
+
+_iso = tempo.conversor(tempo.ISO)
+
+
+def truncar(dt: datetime, resolucao: str) -> datetime:
+    """Início do bucket de `dt` na resolução."""
+    if resolucao == "minuto":
+        return dt.replace(second=0, microsecond=0)
+    if resolucao == "hora":
+        return dt.replace(minute=0, second=0, microsecond=0)
+    return dt.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _colunas(serie: Serie) -> List[str]:
+    colunas = ["resolucao", serie.chave, "bucket", "n", "ultimo_em"]
+    for m in serie.metricas:
+        colunas += [f"{m}_min", f"{m}_max", f"{m}_soma", f"{m}_ultimo"]
+    return colunas
+
+
+def ddl(serie: Serie, backend: str) -> str:
+    real = "DOUBLE PRECISION" if backend == "postgres" else "REAL"
+    tipo_chave = "INTEGER" if serie.chave == "campo_id" else "TEXT"
+    metricas = "".join(
+        f"{m}_min {real}, {m}_max {real}, {m}_soma {real}, {m}_ultimo {real}, "
+        for m in serie.metricas
+    )
+    return (
+        f"CREATE TABLE IF NOT EXISTS {serie.tabela} ("
+        f"resolucao TEXT NOT NULL, {serie.chave} {tipo_chave} NOT NULL, bucket TEXT NOT NULL, "
+        f"n INTEGER NOT NULL, ultimo_em TEXT NOT NULL, {metricas}"
+        f"PRIMARY KEY (resolucao, {serie.chave}, bucket))"
+    )
+
+
+def _sql_upsert(serie: Serie, backend: str) -> str:
+    colunas = _colunas(serie)
+    menor, maior = ("LEAST", "GREATEST") if backend == "postgres" else ("MIN", "MAX")
+    t = serie.tabela
+    atribuicoes = [f"n = {t}.n + excluded.n"]
+    for m in serie.metricas:
+        atribuicoes += [
+            f"{m}_min = {menor}({t}.{m}_min, excluded.{m}_min)",
+            f"{m}_max = {maior}({t}.{m}_max, excluded.{m}_max)",
+            f"{m}_soma = {t}.{m}_soma + excluded.{m}_soma",
+            f"{m}_ultimo = CASE WHEN excluded.ultimo_em >= {t}.ultimo_em "
+            f"THEN excluded.{m}_ultimo ELSE {t}.{m}_ultimo END",
+        ]
+    # Todas as expressões do SET enxergam a linha antiga, então ultimo_em pode vir por último
+    atribuicoes.append(f"ultimo_em = {maior}({t}.ultimo_em, excluded.ultimo_em)")
+    return (
+        f"INSERT INTO {t} ({', '.join(colunas)}) VALUES ({', '.join('?' for _ in colunas)}) "
+        f"ON CONFLICT (resolucao, {serie.chave}, bucket) DO UPDATE SET {', '.join(atribuicoes)}"
+    )
+
+
+def agregar(serie: Serie, linhas: Iterable[tuple]) -> List[tuple]:
+    """
+    Agrega linhas (chave, timestamp: datetime, *valores) por resolução/chave/bucket.
+    Retorna as tuplas de parâmetros do upsert, na ordem de _colunas(serie).
+    """
+    grupos: Dict[tuple, list] = {}
+    for chave, ts, *valores in linhas:
+        ts = tempo.utc_ingenuo(ts)
+        for resolucao in RESOLUCOES:
+            id_grupo = (resolucao, chave, truncar(ts, resolucao))
+            g = grupos.get(id_grupo)
+            if g is None:
+                # [n, ultimo_em, [min, max, soma, ultimo] por métrica]
+                grupos[id_grupo] = [1, ts] + [[v, v, v, v] for v in valores]
+                continue
+            g[0] += 1
+            mais_recente = ts >= g[1]
+            if mais_recente:
+                g[1] = ts
+            for acc, v in zip(g[2:], valores):
+                acc[0] = min(acc[0], v)
+                acc[1] = max(acc[1], v)
+                acc[2] += v
+                if mais_recente:
+                    acc[3] = v
+
+    parametros = []
+    for (resolucao, chave, bucket), (n, ultimo_em, *accs) in grupos.items():
+        linha = [resolucao, chave, _iso(bucket), n, _iso(ultimo_em)]
+        for acc in accs:
+            linha += acc
+        parametros.append(tuple(linha))
+    return parametros
+
+
+def comandos(serie: Serie, backend: str, linhas: Iterable[tuple]) -> List[tuple]:
+    """(sql com `?`, parâmetros) do upsert de cada grupo; usado pelo caminho assíncrono."""
+    sql = _sql_upsert(serie, backend)
+    return [(sql, p) for p in agregar(serie, linhas)]
+
+
+def mesclar(conn, serie: Serie, parametros: List[tuple]):
+    """Upsert de grupos já agregados (tuplas na ordem de _colunas(serie)), sem commit."""
+    if parametros:
+        backend = getattr(conn, "backend", "sqlite")
+        conn.cursor().executemany(adaptar_sql(conn, _sql_upsert(serie, backend)), parametros)
+
+
+def atualizar(conn, serie: Serie, linhas: Iterable[tuple]):
+    """Mescla as linhas (chave, timestamp, *valores) nos rollups (sem commit)."""
+    mesclar(conn, serie, agregar(serie, linhas))
+
+
+def linhas_leituras(linhas: Iterable[tuple]) -> Iterable[tuple]:
+    """Tuplas de inserção (campo_id, umidade, ph, nutrientes, temperatura, timestamp) -> rollup."""
+    return ((l[0], l[5], l[1], l[2], l[3], l[4]) for l in linhas)
+
+
+def atualizar_leituras(conn, linhas: List[tuple]):
+    if ATIVOS:
+        atualizar(conn, LEITURAS, linhas_leituras(linhas))
+
+
+def atualizar_sensores(conn, linhas: List[tuple]):
+    """Linhas (sensor_id, valor, recorded_at: datetime) de sensor_readings."""
+    if ATIVOS:
+        atualizar(conn, SENSORES, ((s, ts, v) for s, v, ts in linhas))
+
+
+# ==============================
+#    RECONSTRUÇÃO
+# ==============================
+
+def limite_origem(conn, serie: Serie, dia: datetime):
+    """
+    Limite de dia para filtrar a tabela de origem: epoch ms ou, em texto, só a
+    data ("AAAA-MM-DD"), que compara bem com "AAAA-MM-DD HH:MM" e "AAAA-MM-DDTHH:MM".
+    """
+    if tempo.formato(conn) == tempo.EPOCH_MS:
+        return tempo.datetime_para_ms(dia)
+    return dia.date().isoformat()
+
+
+def origens(conn, serie: Serie, desde: Optional[datetime] = None, ate: Optional[datetime] = None) -> List[str]:
+    """Tabelas de leituras brutas da série que cruzam o intervalo."""
+    if serie is LEITURAS:
+        return [p.nome for p in particoes.tabelas(conn, desde, ate)]
+    return [serie.origem]
+
+
+def mais_antiga(conn, serie: Serie, ate: datetime) -> Optional[datetime]:
+    """Timestamp da leitura bruta mais antiga da série antes de `ate`."""
+    cur = conn.cursor()
+    coluna = serie.tempo_origem
+    minimos = []
+    for origem in origens(conn, serie, None, ate):
+        cur.execute(
+            adaptar_sql(conn, f"SELECT MIN({coluna}) AS minimo FROM {origem} WHERE {coluna} < ?"),
+            (limite_origem(conn, serie, ate),)
+        )
+        r = cur.fetchone()
+        valor = r["minimo"] if isinstance(r, dict) else r[0]
+        if valor is not None:
+            minimos.append(tempo.do_banco(valor))
+    return min(minimos) if minimos else None
+
+
+def reconstruir(conn, serie: Serie, desde: Optional[datetime] = None, ate: Optional[datetime] = None) -> int:
+    """
+    Recalcula os rollups da série a partir das leituras brutas (sem commit).
+    Com `desde`/`ate`, só os dias do intervalo (buckets de todas as resoluções).
+    Retorna o número de leituras processadas.
+    """
+    cur = conn.cursor()
+    coluna = serie.tempo_origem
+    filtros, params, filtros_bucket, params_bucket = [], [], [], []
+    if desde is not None:
+        desde = truncar(desde, "dia")
+        filtros.append(f"{coluna} >= ?")
+        params.append(limite_origem(conn, serie, desde))
+        filtros_bucket.append("bucket >= ?")
+        params_bucket.append(_iso(desde))
+    if ate is not None:
+        ate = truncar(ate, "dia")
+        filtros.append(f"{coluna} < ?")
+        params.append(limite_origem(conn, serie, ate))
+        filtros_bucket.append("bucket < ?")
+        params_bucket.append(_iso(ate))
+    where_bucket = f" WHERE {' AND '.join(filtros_bucket)}" if filtros_bucket else ""
+    cur.execute(adaptar_sql(conn, f"DELETE FROM {serie.tabela}{where_bucket}"), tuple(params_bucket))
+    filtro = "".join(f" AND {f}" for f in filtros)
+
+    colunas = ", ".join((serie.chave, coluna) + serie.valores_origem)
+    processadas = 0
+    for origem in origens(conn, serie, desde, ate):
+        # Cursor nomeado no Postgres: as linhas vêm do servidor aos poucos
+        leitura = conn.cursor(name=f"rollup_{origem}") if getattr(conn, "backend", "") == "postgres" \
+            else conn.cursor()
+        leitura.execute(
+            adaptar_sql(conn, f"SELECT {colunas} FROM {origem} WHERE {coluna} IS NOT NULL{filtro}"), tuple(params)
+        )
+        while True:
+            rows = leitura.fetchmany(LOTE_RECONSTRUCAO)
+            if not rows:
+                break
+            linhas = []
+            for r in rows:
+                chave, ts, *valores = (r[c] for c in r.keys()) if isinstance(r, dict) else r
+                linhas.append((chave, tempo.do_banco(ts), *valores))
+            atualizar(conn, serie, linhas)
+            processadas += len(linhas)
+        leitura.close()
+    return processadas
+
+
+def criar_tabelas(conn):
+    """Função da migração dos rollups: cria as tabelas e preenche a partir do histórico."""
+    backend = getattr(conn, "backend", "sqlite")
+    cur = conn.cursor()
+    for serie in SERIES:
+        cur.execute(ddl(serie, backend))
+        reconstruir(conn, serie)
+
+
+if __name__ == "__main__":
+    inicio = None
+    if "--desde" in sys.argv:
+        inicio = datetime.fromisoformat(sys.argv[sys.argv.index("--desde") + 1])
+    with conexao() as conn:
+        if getattr(conn, "backend", "sqlite") == "sqlite" and not conn.in_transaction:
+            conn.execute("BEGIN")
+        for serie in SERIES:
+            total = reconstruir(conn, serie, inicio)
+            print(f"[rollups] {serie.tabela}: {total} leituras agregadas")
+        conn.commit()
@@ -1,16 +1,20 @@
 # app/routes/campos.py
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from typing import List
 from app.models import Campo, CampoCreate
+from app import cache_http
 # Importar o service que contém a lógica do banco
 from app.services import campo_service 
 
 router = APIRouter()
 
 @router.post("/", response_model=Campo)
-def criar_campo(payload: CampoCreate):
-    return campo_service.create_campo(payload)
+async def criar_campo(payload: CampoCreate):
+    return await campo_service.create_campo_async(payload)
 
 @router.get("/", response_model=List[Campo])
-def listar_campos():
-    return campo_service.get_all_campos()
\ No newline at end of file
+async def listar_campos(request: Request):
+    # ETag da lista: 304 sem ir ao banco enquanto nenhum campo for criado
+    async def produzir():
+        return await campo_service.get_registros_campos_async(), {}
+    return await cache_http.responder(request, cache_http.CAMPOS, ("campos",), produzir)
\ No newline at end of file
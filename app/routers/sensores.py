@@ -1,21 +1,203 @@
 # app/routers/sensores.py
-from fastapi import APIRouter, HTTPException
-from typing import List
-from app.models import Leitura, LeituraCreate
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from typing import Dict, List, Optional
+from app.models import ImportacaoResponse, Leitura, LeituraCreate, LeituraLoteResponse
 # CORREÇÃO AQUI: de sensor_service para sensores_service (plural)
 from app.services import sensor_service 
+from app.services import ingestao_service
+from app.services import exportacao_service
+from app import cache_http, database_async, json_rapido, protocolo_binario, rollups, tempo
 
 router = APIRouter()
 
 @router.post("/registrar", response_model=Leitura)
-def registrar_leitura_endpoint(payload: LeituraCreate):
+async def registrar_leitura_endpoint(payload: LeituraCreate):
     # CORREÇÃO AQUI: chamada atualizada
-    return sensor_service.registrar_leitura(payload)
+    try:
+        return await sensor_service.registrar_leitura_async(payload)
+    except sensor_service.BufferCheioError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@router.post("/lote", response_model=LeituraLoteResponse)
+def registrar_lote_endpoint(payload: List[LeituraCreate]):
+    if len(payload) > sensor_service.LOTE_MAX_ITENS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Lote excede o limite de {sensor_service.LOTE_MAX_ITENS} leituras"
+        )
+    return sensor_service.registrar_leituras_lote(payload)
+
+@router.post("/importar", response_model=ImportacaoResponse)
+async def importar_leituras_endpoint(request: Request, formato: Optional[str] = None):
+    # Backfill de gateways: corpo NDJSON ou CSV consumido em streaming
+    formato = ingestao_service.detectar_formato(request.headers.get("content-type"), formato)
+    if formato is None:
+        raise HTTPException(
+            status_code=415,
+            detail="Formato não suportado: use ?formato=ndjson|csv ou Content-Type correspondente"
+        )
+    return await ingestao_service.importar_stream(request.stream(), formato)
+
+@router.post("/binario", response_model=ImportacaoResponse)
+async def importar_binario_endpoint(request: Request):
+    # Frames compactos dos nós ESP32 (formato em app/protocolo_binario.py)
+    excede = HTTPException(
+        status_code=413,
+        detail=f"Frame excede o limite de {sensor_service.LOTE_MAX_ITENS} leituras"
+    )
+    # Recusa pelo tamanho antes de ler o corpo (e para de ler sem Content-Length)
+    limite = protocolo_binario.tamanho_frame(sensor_service.LOTE_MAX_ITENS)
+    tamanho = request.headers.get("content-length", "")
+    if tamanho.isdigit() and int(tamanho) > limite:
+        raise excede
+    dados = bytearray()
+    async for chunk in request.stream():
+        dados += chunk
+        if len(dados) > limite:
+            raise excede
+    dados = bytes(dados)
+    try:
+        quantidade = protocolo_binario.ler_cabecalho(dados)
+    except protocolo_binario.FrameInvalidoError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if quantidade > sensor_service.LOTE_MAX_ITENS:
+        raise excede
+    return await database_async.em_executor(ingestao_service.importar_frame, dados)
+
+# Paginação por cursor (keyset): a resposta traz em X-Proximo-Cursor o valor a
+# repassar em `cursor` para a página seguinte (ausente no fim do histórico)
+CABECALHO_CURSOR = "X-Proximo-Cursor"
 
 @router.get("/ultimas", response_model=List[Leitura])
-def ultimas_leituras_endpoint(campo_id: int, limit: int = 20):
-    return sensor_service.get_ultimas_leituras(campo_id, limit)
+async def ultimas_leituras_endpoint(campo_id: int, limit: int = 20, cursor: Optional[str] = None):
+    # Linhas do banco direto para JSON, sem um Leitura por linha (ver app.json_rapido)
+    try:
+        leituras, proximo = await sensor_service.get_ultimas_registros_async(campo_id, limit, cursor)
+    except sensor_service.CursorInvalidoError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return json_rapido.RespostaJSON(leituras, headers={CABECALHO_CURSOR: proximo} if proximo else None)
+
+@router.get("/ultimas/campos", response_model=Dict[int, List[Leitura]])
+async def ultimas_leituras_campos_endpoint(campo_ids: str, limit: int = 20):
+    # Visão da frota: as `limit` últimas leituras de cada campo (campo_ids=1,2,3)
+    # numa requisição e numa consulta, por campo_id
+    try:
+        ids = list(dict.fromkeys(int(c) for c in campo_ids.split(",") if c.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="campo_ids deve ser uma lista de inteiros separados por vírgula")
+    if not ids:
+        raise HTTPException(status_code=400, detail="Informe ao menos um campo em campo_ids")
+    if len(ids) > sensor_service.ULTIMAS_CAMPOS_MAX:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Consulta excede o limite de {sensor_service.ULTIMAS_CAMPOS_MAX} campos"
+        )
+    if not 1 <= limit <= sensor_service.ULTIMAS_CAMPOS_MAX_LIMIT:
+        raise HTTPException(
+            status_code=400,
+            detail=f"limit deve estar entre 1 e {sensor_service.ULTIMAS_CAMPOS_MAX_LIMIT}"
+        )
+    return json_rapido.RespostaJSON(await sensor_service.get_ultimas_campos_async(ids, limit))
+
+# Teto de pontos por resposta reduzida
+SERIE_MAX_POINTS = 10000
 
 @router.get("/serie")
-def serie_temporal_endpoint(campo_id: int, limit: int = 100):
-    return sensor_service.get_serie_temporal(campo_id, limit)
\ No newline at end of file
+async def serie_temporal_endpoint(request: Request, campo_id: int, limit: int = 100, resolucao: Optional[str] = None,
+                                  start: Optional[datetime] = None, end: Optional[datetime] = None,
+                                  max_points: Optional[int] = None, amostragem: str = "media",
+                                  metrica: str = "umidade", cursor: Optional[str] = None):
+    # resolucao=minuto|hora|dia lê os rollups em vez das leituras brutas;
+    # start/end restringem o período (com limit, os pontos mais recentes dentro dele);
+    # max_points reduz o período inteiro no servidor (amostragem=media|lttb);
+    # cursor (proximo_cursor da resposta anterior) continua para trás no tempo;
+    # If-None-Match com a ETag do campo responde 304 sem consultar o banco
+    if resolucao is not None and resolucao not in rollups.RESOLUCOES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Resolução inválida: use {', '.join(rollups.RESOLUCOES)}"
+        )
+    if start is not None and end is not None and tempo.utc_ingenuo(start) >= tempo.utc_ingenuo(end):
+        raise HTTPException(status_code=400, detail="start deve ser anterior a end")
+    if max_points is not None:
+        if resolucao is not None or cursor is not None:
+            raise HTTPException(status_code=400, detail="max_points não se combina com resolucao nem cursor")
+        if not 2 <= max_points <= SERIE_MAX_POINTS:
+            raise HTTPException(status_code=400, detail=f"max_points deve estar entre 2 e {SERIE_MAX_POINTS}")
+        if amostragem not in sensor_service.AMOSTRAGENS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Amostragem inválida: use {', '.join(sensor_service.AMOSTRAGENS)}"
+            )
+        if metrica not in sensor_service.METRICAS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Métrica inválida: use {', '.join(sensor_service.METRICAS)}"
+            )
+
+    async def produzir():
+        try:
+            serie = await sensor_service.get_serie_temporal_async(
+                campo_id, limit, resolucao, start, end, max_points, amostragem, metrica, cursor
+            )
+        except sensor_service.CursorInvalidoError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        proximo = serie.get("proximo_cursor")
+        return serie, {CABECALHO_CURSOR: proximo} if proximo else {}
+
+    await sensor_service.sincronizar_versoes_async()
+    parametros = ("serie", campo_id, limit, resolucao, start, end, max_points, amostragem, metrica, cursor)
+    return await cache_http.responder(request, cache_http.chave_campo(campo_id), parametros, produzir)
+
+def _validar_formato_exportacao(formato: str):
+    if formato not in exportacao_service.FORMATOS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Formato inválido: use {', '.join(exportacao_service.FORMATOS)}"
+        )
+
+def _resposta_exportacao(corpo, formato: str, nome: str) -> StreamingResponse:
+    return StreamingResponse(
+        corpo,
+        media_type=exportacao_service.TIPOS_CONTEUDO[formato],
+        headers={"Content-Disposition": f'attachment; filename="{nome}.{formato}"'},
+    )
+
+@router.get("/serie/exportar")
+async def exportar_serie_endpoint(campo_id: int, formato: str = "ndjson", resolucao: Optional[str] = None,
+                                  start: Optional[datetime] = None, end: Optional[datetime] = None):
+    # Série completa de [start, end) em streaming, do mais antigo ao mais recente,
+    # sem limit: leituras brutas ou, com resolucao, os buckets dos rollups
+    _validar_formato_exportacao(formato)
+    if resolucao is not None and resolucao not in rollups.RESOLUCOES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Resolução inválida: use {', '.join(rollups.RESOLUCOES)}"
+        )
+    if start is not None and end is not None and tempo.utc_ingenuo(start) >= tempo.utc_ingenuo(end):
+        raise HTTPException(status_code=400, detail="start deve ser anterior a end")
+    corpo = exportacao_service.exportar_serie(campo_id, formato, start, end, resolucao)
+    return _resposta_exportacao(corpo, formato, f"serie_campo_{campo_id}")
+
+@router.get("/ultimas/exportar")
+async def exportar_ultimas_endpoint(campo_id: int, limit: int = 1000, formato: str = "ndjson"):
+    # As `limit` leituras mais recentes em streaming, sem limite de tamanho
+    _validar_formato_exportacao(formato)
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="limit deve ser positivo")
+    corpo = exportacao_service.exportar_ultimas(campo_id, formato, limit)
+    return _resposta_exportacao(corpo, formato, f"ultimas_campo_{campo_id}")
+
+@router.get("/ingestao/metricas")
+def metricas_ingestao_endpoint():
+    return sensor_service.get_metricas_buffer()
+
+@router.get("/ultimas/metricas")
+def metricas_cache_ultimas_endpoint():
+    return sensor_service.get_metricas_cache()
+
+@router.get("/respostas/metricas")
+def metricas_cache_http_endpoint():
+    return cache_http.metricas()
\ No newline at end of file
@@ -1,31 +1,85 @@
 # app/services/campo_service.py
-from fase2.db_utils import get_connection # Ajuste o import conforme sua estrutura real
+from typing import NamedTuple
+from app.database import conexao
+from app import cache_http, consultas, database_async
+from app.consultas import Consulta
 from app.models import Campo, CampoCreate
 
+class LinhaCampo(NamedTuple):
+    id: int
+    nome: str
+    cultura: str
+    largura: float
+    comprimento: float
+    area_m2: float
+
+CAMPOS = Consulta(
+    "campos", "SELECT id, nome, cultura, largura, comprimento, area_m2 FROM campos ORDER BY id DESC", LinhaCampo
+)
+
+INSERIR_CAMPO = Consulta("inserir_campo", """
+    INSERT INTO campos (nome, cultura, largura, comprimento, area_m2)
+    VALUES (?, ?, ?, ?, ?)
+    RETURNING id, nome, cultura, largura, comprimento, area_m2
+""", LinhaCampo)
+
+def _campo_de_linha(r: LinhaCampo) -> Campo:
+    return Campo(**r._asdict())
+
+def _registro_campo(r: LinhaCampo) -> dict:
+    """O JSON de Campo montado direto da linha (listagens, ver app.json_rapido)."""
+    return {
+        "id": r.id, "nome": r.nome, "cultura": r.cultura, "largura": float(r.largura),
+        "comprimento": float(r.comprimento), "area_m2": float(r.area_m2),
+    }
+
+def _publicar_campo(row: LinhaCampo):
+    # Muda a ETag da lista de campos e a do próprio campo
+    cache_http.registrar_mudanca(cache_http.CAMPOS, cache_http.chave_campo(row.id))
+
 def create_campo(payload: CampoCreate) -> Campo:
-    conn = get_connection()
-    cur = conn.cursor()
     area = payload.largura * payload.comprimento
-    
-    cur.execute("""
-        INSERT INTO campos (nome, cultura, largura, comprimento, area_m2)
-        VALUES (?, ?, ?, ?, ?)
-    """, (payload.nome, payload.cultura, payload.largura, payload.comprimento, area))
-    
-    campo_id = cur.lastrowid
-    conn.commit()
-    
-    # Recuperar o objeto criado
-    cur.execute("SELECT id, nome, cultura, largura, comprimento, area_m2 FROM campos WHERE id = ?", (campo_id,))
-    row = cur.fetchone()
-    conn.close()
-    
-    return Campo(id=row[0], nome=row[1], cultura=row[2], largura=row[3], comprimento=row[4], area_m2=row[5])
+
+    with conexao() as conn:
+        # A linha criada volta no próprio INSERT (RETURNING)
+        row = consultas.uma(conn, INSERIR_CAMPO,
+                            (payload.nome, payload.cultura, payload.largura, payload.comprimento, area))
+        conn.commit()
+
+    _publicar_campo(row)
+    return _campo_de_linha(row)
+
+def _linhas_campos() -> list:
+    with conexao() as conn:
+        return consultas.todas(conn, CAMPOS)
 
 def get_all_campos():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT id, nome, cultura, largura, comprimento, area_m2 FROM campos ORDER BY id DESC")
-    rows = cur.fetchall()
-    conn.close()
-    return [Campo(id=r[0], nome=r[1], cultura=r[2], largura=r[3], comprimento=r[4], area_m2=r[5]) for r in rows]
\ No newline at end of file
+    return [_campo_de_linha(r) for r in _linhas_campos()]
+
+# Variantes assíncronas (ver app.database_async)
+async def create_campo_async(payload: CampoCreate) -> Campo:
+    if not database_async.nativo_disponivel():
+        return await database_async.em_executor(create_campo, payload)
+
+    area = payload.largura * payload.comprimento
+    row = await consultas.escrever_async(
+        INSERIR_CAMPO,
+        (payload.nome, payload.cultura, payload.largura, payload.comprimento, area)
+    )
+    _publicar_campo(row)
+    return _campo_de_linha(row)
+
+async def get_all_campos_async():
+    if not database_async.nativo_disponivel():
+        return await database_async.em_executor(get_all_campos)
+
+    rows = await consultas.todas_async(CAMPOS)
+    return [_campo_de_linha(r) for r in rows]
+
+async def get_registros_campos_async() -> list:
+    """Lista de campos em dicts prontos para serializar (sem Campo por linha)."""
+    if not database_async.nativo_disponivel():
+        rows = await database_async.em_executor(_linhas_campos)
+    else:
+        rows = await consultas.todas_async(CAMPOS)
+    return [_registro_campo(r) for r in rows]
@@ -0,0 +1,168 @@
+# app/services/exportacao_service.py
+"""
+Exportação de leituras em streaming (NDJSON ou CSV), o caminho inverso de
+ingestao_service: as linhas saem do banco em blocos de
+EXPORTACAO_BLOCO_LINHAS por um cursor server-side (consultas.em_blocos) e
+cada bloco é formatado e enviado antes do seguinte ser lido, com memória
+constante em downloads de milhões de pontos.
+
+- exportar_serie: leituras brutas (ou buckets dos rollups) de um campo em
+  [inicio, fim), do mais antigo para o mais recente.
+- exportar_ultimas: as `limit` leituras mais recentes, na ordem de /ultimas.
+"""
+import asyncio
+import csv
+import heapq
+import io
+import json
+import os
+from datetime import datetime
+from itertools import chain
+from typing import AsyncIterator, Iterator, List, Optional
+
+from app import consultas, database_async, particoes, rollups, tempo
+from app.consultas import Consulta
+from app.database import conexao
+from app.services.sensor_service import (
+    FIM_ABERTO, INICIO_ABERTO, ULTIMAS_LEITURAS, LinhaBucket, LinhaLeitura,
+)
+
+EXPORTACAO_BLOCO_LINHAS = 5000
+
+# Downloads simultâneos: cada um ocupa uma thread do executor e uma conexão
+EXPORTACAO_MAX_SIMULTANEAS = int(os.getenv("EXPORTACAO_MAX_SIMULTANEAS", 4))
+
+FORMATOS = ("ndjson", "csv")
+TIPOS_CONTEUDO = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+COLUNAS_LEITURA = ("id", "campo_id", "umidade", "ph", "nutrientes", "temperatura", "timestamp")
+COLUNAS_BUCKET = ("timestamp", "n", "umidade", "ph", "nutrientes", "temperatura")
+
+# (timestamp, id DESC): a ordem de /ultimas invertida, que o SQLite lê do índice
+# (campo_id, timestamp DESC) de trás para frente, sem ordenar o resultado
+EXPORTAR_LEITURAS = Consulta("exportar_leituras", """
+    SELECT id, campo_id, umidade, ph, nutrientes, temperatura, timestamp
+    FROM {tabela}
+    WHERE campo_id = ? AND timestamp >= ? AND timestamp < ?
+    ORDER BY timestamp, id DESC
+""", LinhaLeitura)
+
+EXPORTAR_AGREGADA = Consulta("exportar_agregada", """
+    SELECT bucket, n, umidade_soma, ph_soma, nutrientes_soma, temperatura_soma
+    FROM rollup_leituras
+    WHERE resolucao = ? AND campo_id = ? AND bucket >= ? AND bucket < ?
+    ORDER BY bucket
+""", LinhaBucket)
+
+_vagas: Optional[asyncio.Semaphore] = None
+
+
+def _linhas(conn, consulta: Consulta, params: tuple) -> Iterator[LinhaLeitura]:
+    for bloco in consultas.em_blocos(conn, consulta, params, EXPORTACAO_BLOCO_LINHAS):
+        yield from bloco
+
+
+def _em_ordem(conn, consulta: Consulta, params: tuple, inicio: Optional[datetime],
+              fim: Optional[datetime], recentes_primeiro: bool) -> Iterator[LinhaLeitura]:
+    """
+    Leituras de todas as tabelas que cruzam [inicio, fim), numa única ordem.
+    As partições mensais do SQLite são disjuntas e lidas uma após a outra; só
+    a tabela quente (que pode ter leituras retroativas) é intercalada com elas.
+    """
+    quente, *periodos = particoes.tabelas(conn, inicio, fim)
+    fluxo = _linhas(conn, consulta.para(tabela=quente.nome), params)
+    if not periodos:
+        return fluxo
+    if not recentes_primeiro:
+        periodos.reverse()
+    antigas = chain.from_iterable(_linhas(conn, consulta.para(tabela=p.nome), params) for p in periodos)
+    return heapq.merge(fluxo, antigas, key=lambda r: (tempo.do_banco(r.timestamp), -r.id),
+                       reverse=recentes_primeiro)
+
+
+def _blocos(linhas: Iterator, tamanho: int = EXPORTACAO_BLOCO_LINHAS) -> Iterator[list]:
+    bloco = []
+    for linha in linhas:
+        bloco.append(linha)
+        if len(bloco) >= tamanho:
+            yield bloco
+            bloco = []
+    if bloco:
+        yield bloco
+
+
+def _registros_leituras(rows: List[LinhaLeitura]) -> List[tuple]:
+    return [
+        (r.id, r.campo_id, r.umidade, r.ph, r.nutrientes, r.temperatura, tempo.do_banco(r.timestamp).isoformat())
+        for r in rows
+    ]
+
+
+def _registros_buckets(rows: List[LinhaBucket]) -> List[tuple]:
+    return [
+        (tempo.do_banco(r.bucket).isoformat(), r.n, r.umidade_soma / r.n, r.ph_soma / r.n,
+         r.nutrientes_soma / r.n, r.temperatura_soma / r.n)
+        for r in rows
+    ]
+
+
+def _leituras_serie(campo_id: int, inicio: Optional[datetime], fim: Optional[datetime]) -> Iterator[List[tuple]]:
+    with conexao() as conn:
+        converter = tempo.conversor(tempo.formato(conn))
+        params = (campo_id, converter(inicio or INICIO_ABERTO), converter(fim or FIM_ABERTO))
+        for bloco in _blocos(_em_ordem(conn, EXPORTAR_LEITURAS, params, inicio, fim, False)):
+            yield _registros_leituras(bloco)
+
+
+def _buckets_serie(campo_id: int, resolucao: str, inicio: Optional[datetime],
+                   fim: Optional[datetime]) -> Iterator[List[tuple]]:
+    iso = tempo.conversor(tempo.ISO)
+    desde = rollups.truncar(tempo.utc_ingenuo(inicio), resolucao) if inicio is not None else INICIO_ABERTO
+    params = (resolucao, campo_id, iso(desde), iso(fim or FIM_ABERTO))
+    with conexao() as conn:
+        for bloco in consultas.em_blocos(conn, EXPORTAR_AGREGADA, params, EXPORTACAO_BLOCO_LINHAS):
+            yield _registros_buckets(bloco)
+
+
+def _leituras_ultimas(campo_id: int, limit: int) -> Iterator[List[tuple]]:
+    with conexao() as conn:
+        rows = _em_ordem(conn, ULTIMAS_LEITURAS, (campo_id, limit), None, None, True)
+        for bloco in _blocos(r for _, r in zip(range(limit), rows)):
+            yield _registros_leituras(bloco)
+
+
+def _ndjson(colunas: tuple, registros: List[tuple]) -> bytes:
+    return "".join(json.dumps(dict(zip(colunas, r))) + "\n" for r in registros).encode()
+
+
+def _csv(registros: List[tuple]) -> bytes:
+    saida = io.StringIO()
+    csv.writer(saida, lineterminator="\n").writerows(registros)
+    return saida.getvalue().encode()
+
+
+async def _transmitir(formato: str, colunas: tuple, gerar, *args) -> AsyncIterator[bytes]:
+    global _vagas
+    if _vagas is None:
+        _vagas = asyncio.Semaphore(EXPORTACAO_MAX_SIMULTANEAS)
+    async with _vagas:
+        if formato == "csv":
+            yield _csv([colunas])
+        async for registros in database_async.transmitir(gerar, *args):
+            yield _ndjson(colunas, registros) if formato == "ndjson" else _csv(registros)
+
+
+def exportar_serie(campo_id: int, formato: str, inicio: Optional[datetime] = None,
+                   fim: Optional[datetime] = None, resolucao: Optional[str] = None) -> AsyncIterator[bytes]:
+    """Corpo da exportação da série (leituras ou buckets), do mais antigo ao mais recente."""
+    # Normalizado antes do streaming: um erro depois dos cabeçalhos truncaria o corpo
+    inicio = tempo.utc_ingenuo(inicio) if inicio is not None else None
+    fim = tempo.utc_ingenuo(fim) if fim is not None else None
+    if resolucao is not None:
+        return _transmitir(formato, COLUNAS_BUCKET, _buckets_serie, campo_id, resolucao, inicio, fim)
+    return _transmitir(formato, COLUNAS_LEITURA, _leituras_serie, campo_id, inicio, fim)
+
+
+def exportar_ultimas(campo_id: int, formato: str, limit: int) -> AsyncIterator[bytes]:
+    """Corpo da exportação das `limit` leituras mais recentes (mais recente primeiro)."""
+    return _transmitir(formato, COLUNAS_LEITURA, _leituras_ultimas, campo_id, limit)
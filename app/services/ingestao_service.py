@@ -0,0 +1,256 @@
+# app/services/ingestao_service.py
+"""
+Ingestão em massa de leituras enviadas pelos gateways de campo.
+
+Importação em streaming (NDJSON ou CSV): o corpo da requisição é consumido
+em pedaços, cada linha é validada assim que chega e as leituras aceitas são
+gravadas em transações de IMPORTACAO_LOTE_LINHAS, sem materializar o
+arquivo inteiro em memória.
+
+Frames binários (app.protocolo_binario): decodificados sem cópia com
+numpy.frombuffer, validados de forma vetorizada e gravados num único lote.
+"""
+import codecs
+import csv
+import json
+from datetime import datetime, timedelta
+from typing import AsyncIterator, List, Optional
+
+from pydantic import ValidationError
+
+from app import database_async, protocolo_binario, tempo
+from app.models import ImportacaoErro, ImportacaoResponse, LeituraCreate
+from app.services import sensor_service
+
+IMPORTACAO_LOTE_LINHAS = 1000
+# Uma leitura ocupa ~150 caracteres; acima disso a linha é rejeitada sem ser acumulada
+IMPORTACAO_MAX_LINHA = 64 * 1024
+MAX_ERROS_REPORTADOS = 100
+
+FORMATOS = ("ndjson", "csv")
+
+# Faixa aceita para o timestamp dos frames binários (epoch ms): de 2000 até
+# um dia à frente do relógio do servidor (fora disso é relógio desajustado)
+TIMESTAMP_MIN_MS = tempo.datetime_para_ms(datetime(2000, 1, 1))
+TOLERANCIA_FUTURO = timedelta(days=1)
+
+
+def _linha(texto: str) -> Optional[str]:
+    return texto.rstrip("\r") if len(texto) <= IMPORTACAO_MAX_LINHA else None
+
+
+async def _linhas(chunks: AsyncIterator[bytes]) -> AsyncIterator[Optional[str]]:
+    """
+    Converte pedaços de bytes em linhas de texto (UTF-8 incremental; bytes
+    inválidos viram U+FFFD e a linha falha na validação). Linhas maiores que
+    IMPORTACAO_MAX_LINHA saem como None.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    pendente: List[str] = []  # pedaços da linha incompleta (só o pedaço novo é dividido)
+    tamanho = 0
+    async for chunk in chunks:
+        partes = decoder.decode(chunk).split("\n")
+        if len(partes) == 1:
+            if tamanho <= IMPORTACAO_MAX_LINHA:
+                pendente.append(partes[0])
+            tamanho += len(partes[0])
+            continue
+        yield _linha("".join(pendente) + partes[0]) if tamanho + len(partes[0]) <= IMPORTACAO_MAX_LINHA else None
+        for linha in partes[1:-1]:
+            yield _linha(linha)
+        pendente, tamanho = [partes[-1]], len(partes[-1])
+    resto = decoder.decode(b"", final=True)
+    if tamanho + len(resto):
+        yield _linha("".join(pendente) + resto) if tamanho + len(resto) <= IMPORTACAO_MAX_LINHA else None
+
+
+def _erro_validacao(e: ValidationError) -> str:
+    primeiro = e.errors()[0]
+    campo = ".".join(str(parte) for parte in primeiro.get("loc", ()))
+    return f"{campo}: {primeiro['msg']}" if campo else primeiro["msg"]
+
+
+def _parse_ndjson(linha: str) -> LeituraCreate:
+    return LeituraCreate(**json.loads(linha))
+
+
+def _parse_csv(linha: str, cabecalho: List[str]) -> LeituraCreate:
+    valores = next(csv.reader([linha]))
+    if len(valores) != len(cabecalho):
+        raise ValueError(f"esperadas {len(cabecalho)} colunas, recebidas {len(valores)}")
+    dados = {coluna: valor for coluna, valor in zip(cabecalho, valores) if valor != ""}
+    return LeituraCreate(**dados)
+
+
+async def importar_stream(chunks: AsyncIterator[bytes], formato: str) -> ImportacaoResponse:
+    """
+    Valida e grava as leituras do stream em lotes.
+    Linhas inválidas são contadas (e reportadas até MAX_ERROS_REPORTADOS)
+    sem interromper a importação.
+    """
+    cabecalho: Optional[List[str]] = None
+    lote: List[LeituraCreate] = []
+    erros: List[ImportacaoErro] = []
+    total = aceitas = rejeitadas = lotes = 0
+
+    def rejeitar(numero: int, mensagem: str):
+        nonlocal rejeitadas
+        rejeitadas += 1
+        if len(erros) < MAX_ERROS_REPORTADOS:
+            erros.append(ImportacaoErro(linha=numero, erro=mensagem))
+
+    async def gravar():
+        nonlocal aceitas, lotes
+        # Escrita síncrona no executor de banco: o loop continua livre
+        await database_async.em_executor(sensor_service.gravar_leituras, list(lote))
+        aceitas += len(lote)
+        lotes += 1
+        lote.clear()
+
+    numero = 0
+    async for linha in _linhas(chunks):
+        numero += 1
+        if linha is None:
+            total += 1
+            rejeitar(numero, f"linha excede {IMPORTACAO_MAX_LINHA} caracteres")
+            continue
+        if not linha.strip():
+            continue
+
+        if formato == "csv" and cabecalho is None:
+            cabecalho = [coluna.strip() for coluna in next(csv.reader([linha]))]
+            continue
+
+        total += 1
+        try:
+            payload = _parse_csv(linha, cabecalho) if formato == "csv" else _parse_ndjson(linha)
+        except ValidationError as e:
+            rejeitar(numero, _erro_validacao(e))
+            continue
+        except (ValueError, TypeError) as e:
+            rejeitar(numero, f"linha malformada: {e}")
+            continue
+
+        erro = sensor_service.validar_leitura(payload)
+        if erro:
+            rejeitar(numero, erro)
+            continue
+
+        lote.append(payload)
+        if len(lote) >= IMPORTACAO_LOTE_LINHAS:
+            await gravar()
+
+    if lote:
+        await gravar()
+
+    return ImportacaoResponse(
+        formato=formato,
+        linhas=total,
+        aceitas=aceitas,
+        rejeitadas=rejeitadas,
+        lotes=lotes,
+        erros=erros,
+    )
+
+
+def detectar_formato(content_type: Optional[str], formato: Optional[str] = None) -> Optional[str]:
+    """Resolve o formato pelo parâmetro explícito ou pelo Content-Type (None se não suportado)."""
+    if formato:
+        formato = formato.lower()
+    elif content_type:
+        tipo = content_type.split(";")[0].strip().lower()
+        if tipo in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+            formato = "ndjson"
+        elif tipo in ("text/csv", "application/csv"):
+            formato = "csv"
+    return formato if formato in FORMATOS else None
+
+
+def _timestamp_registro(ms: int, agora: datetime) -> datetime:
+    return tempo.ms_para_datetime(ms) if ms else agora
+
+
+def _timestamp_max_ms(agora: datetime) -> int:
+    return tempo.datetime_para_ms(agora + TOLERANCIA_FUTURO)
+
+
+def _erro_registro(ms: int, valores, timestamp_max_ms: int) -> str:
+    erro = sensor_service.validar_valores(*valores)
+    if erro:
+        return erro
+    if ms and not TIMESTAMP_MIN_MS <= ms <= timestamp_max_ms:
+        return "timestamp fora da faixa"
+    return None
+
+
+def _linhas_frame_numpy(registros):
+    """Validação vetorizada; retorna (linhas válidas, [(indice, erro)])."""
+    np = protocolo_binario.np
+    agora = datetime.utcnow()
+    timestamp_max_ms = _timestamp_max_ms(agora)
+    valores = [registros[c] for c in ("umidade", "ph", "nutrientes", "temperatura")]
+    umidade, ph, nutrientes, _ = valores
+    ms = registros["timestamp"]
+    validos = np.logical_and.reduce([np.isfinite(v) for v in valores])
+    validos &= (umidade >= sensor_service.FAIXA_UMIDADE[0]) & (umidade <= sensor_service.FAIXA_UMIDADE[1])
+    validos &= (ph >= sensor_service.FAIXA_PH[0]) & (ph <= sensor_service.FAIXA_PH[1])
+    validos &= nutrientes >= 0
+    validos &= (ms == 0) | ((ms >= TIMESTAMP_MIN_MS) & (ms <= timestamp_max_ms))
+
+    # A mensagem detalhada só é calculada para os registros rejeitados
+    rejeitados = [
+        (int(i), _erro_registro(int(ms[i]), [float(v[i]) for v in valores], timestamp_max_ms))
+        for i in np.flatnonzero(~validos)
+    ]
+
+    aceitos = registros[validos]
+    agora = np.datetime64(agora, "us")
+    timestamps = np.where(
+        aceitos["timestamp"] != 0,
+        aceitos["timestamp"].astype("datetime64[ms]").astype("datetime64[us]"),
+        agora,
+    )
+    linhas = list(zip(
+        aceitos["campo_id"].tolist(), aceitos["umidade"].tolist(), aceitos["ph"].tolist(),
+        aceitos["nutrientes"].tolist(), aceitos["temperatura"].tolist(), timestamps.tolist(),
+    ))
+    return linhas, rejeitados
+
+
+def _linhas_frame_struct(registros):
+    linhas, rejeitados = [], []
+    agora = datetime.utcnow()
+    timestamp_max_ms = _timestamp_max_ms(agora)
+    for indice, (campo_id, ms, umidade, ph, nutrientes, temperatura) in enumerate(registros):
+        erro = _erro_registro(ms, (umidade, ph, nutrientes, temperatura), timestamp_max_ms)
+        if erro:
+            rejeitados.append((indice, erro))
+        else:
+            linhas.append((campo_id, umidade, ph, nutrientes, temperatura, _timestamp_registro(ms, agora)))
+    return linhas, rejeitados
+
+
+def importar_frame(dados: bytes) -> ImportacaoResponse:
+    """
+    Decodifica um frame binário e grava os registros válidos numa transação.
+    Levanta protocolo_binario.FrameInvalidoError para frames malformados.
+    """
+    registros = protocolo_binario.decodificar_frame(dados)
+    if protocolo_binario.np is not None:
+        linhas, rejeitados = _linhas_frame_numpy(registros)
+    else:
+        linhas, rejeitados = _linhas_frame_struct(registros)
+
+    sensor_service.gravar_linhas(linhas)
+
+    return ImportacaoResponse(
+        formato="binario",
+        linhas=len(registros),
+        aceitas=len(linhas),
+        rejeitadas=len(rejeitados),
+        lotes=1 if linhas else 0,
+        erros=[
+            ImportacaoErro(linha=indice + 1, erro=erro)
+            for indice, erro in rejeitados[:MAX_ERROS_REPORTADOS]
+        ],
+    )
@@ -1,80 +1,1236 @@
+import base64
+import bisect
+import json
+import logging
+import math
+import os
+import queue
 import sqlite3
-from datetime import datetime
-from typing import List
-from app.models import Leitura, LeituraCreate
-from app.database import get_connection
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FuturoTimeoutError
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+from app.models import Leitura, LeituraCreate, LeituraLoteItem, LeituraLoteResponse
+from app.database import conexao, inserir_varios
+from app import cache_http, consultas, database_async, particoes, rollups, tempo
+from app.amostragem import lttb
+from app.consultas import Consulta
 
-def registrar_leitura(payload: LeituraCreate) -> Leitura:
-    conn = get_connection()
-    cur = conn.cursor()
-    timestamp = datetime.utcnow().isoformat()
-
-    cur.execute("""
-        INSERT INTO leituras_sensores (campo_id, umidade, ph, nutrientes, temperatura, timestamp)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (
+logger = logging.getLogger(__name__)
+
+# Limite de itens por lote (protege a transação única de crescer sem controle)
+LOTE_MAX_ITENS = 5000
+
+def _timestamp_leitura(payload: LeituraCreate) -> datetime:
+    """Usa o horário informado pelo gateway ou, na falta dele, o horário atual (UTC)."""
+    if payload.timestamp is not None:
+        return payload.timestamp
+    return datetime.utcnow()
+
+# Faixas aceitas pelas regras de domínio (também usadas na validação vetorizada)
+FAIXA_UMIDADE = (0.0, 100.0)
+FAIXA_PH = (0.0, 14.0)
+
+def validar_valores(umidade: float, ph: float, nutrientes: float, temperatura: float) -> Optional[str]:
+    """
+    Regras de domínio aplicadas a cada leitura.
+    Retorna a mensagem de erro ou None quando os valores são válidos.
+    """
+    if not all(math.isfinite(v) for v in (umidade, ph, nutrientes, temperatura)):
+        return "valor não numérico (NaN/inf)"
+    if not FAIXA_UMIDADE[0] <= umidade <= FAIXA_UMIDADE[1]:
+        return "umidade fora da faixa (0-100%)"
+    if not FAIXA_PH[0] <= ph <= FAIXA_PH[1]:
+        return "ph fora da faixa (0-14)"
+    if nutrientes < 0:
+        return "nutrientes não pode ser negativo"
+    return None
+
+def validar_leitura(payload: LeituraCreate) -> Optional[str]:
+    return validar_valores(payload.umidade, payload.ph, payload.nutrientes, payload.temperatura)
+
+def _linha_insercao(payload: LeituraCreate, timestamp: datetime) -> tuple:
+    return (
         payload.campo_id, payload.umidade, payload.ph,
         payload.nutrientes, payload.temperatura, timestamp,
-    ))
-    
-    leitura_id = cur.lastrowid
-    conn.commit()
-    
-    # Retorna o objeto criado
-    cur.execute("""
-        SELECT id, campo_id, umidade, ph, nutrientes, temperatura, timestamp
-        FROM leituras_sensores WHERE id = ?
-    """, (leitura_id,))
-    row = cur.fetchone()
-    conn.close()
-    
+    )
+
+COLUNAS_INSERCAO = ("campo_id", "umidade", "ph", "nutrientes", "temperatura", "timestamp")
+
+class LinhaLeitura(NamedTuple):
+    id: int
+    campo_id: int
+    umidade: float
+    ph: float
+    nutrientes: float
+    temperatura: float
+    timestamp: Any  # texto ISO ou epoch ms (ver app.tempo)
+
+INSERIR_LEITURA = Consulta("inserir_leitura", """
+    INSERT INTO leituras_sensores (campo_id, umidade, ph, nutrientes, temperatura, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?)
+    RETURNING id, campo_id, umidade, ph, nutrientes, temperatura, timestamp
+""", LinhaLeitura)
+
+def _linhas_banco(fmt: str, linhas: List[tuple]) -> List[tuple]:
+    """Converte o timestamp (datetime, última coluna) para o formato do banco."""
+    converter = tempo.conversor(fmt)
+    return [linha[:-1] + (converter(linha[-1]),) for linha in linhas]
+
+def _inserir_linhas(conn, linhas: List[tuple]) -> List[LinhaLeitura]:
+    """
+    Insere as linhas numa única ida ao banco e atualiza os rollups na mesma
+    transação (sem commit). Retorna as linhas gravadas, com id, na ordem.
+    """
+    banco = _linhas_banco(tempo.formato(conn), linhas)
+    ids = inserir_varios(conn, "leituras_sensores", COLUNAS_INSERCAO, banco)
+    rollups.atualizar_leituras(conn, linhas)
+    return [LinhaLeitura(i, *linha) for i, linha in zip(ids, banco)]
+
+# ==============================
+#    BUFFER DE INGESTÃO (WRITE-BEHIND)
+# ==============================
+
+class BufferCheioError(Exception):
+    """A fila do buffer permaneceu cheia além do tempo de espera (back-pressure)."""
+
+
+class BufferIngestao:
+    """
+    Buffer write-behind: as leituras entram numa fila limitada e uma thread
+    escritora grava em group commits a cada `max_linhas` ou `intervalo_ms`.
+    Com `aguardar_commit` o chamador espera o commit do seu grupo e recebe o id
+    definitivo; sem ele, a leitura volta imediatamente marcada como pendente.
+
+    Leituras pendentes já foram confirmadas ao cliente: um grupo que falha é
+    regravado `tentativas` vezes com espera crescente (a fila segura os novos
+    enquanto isso) e, se ainda assim falhar, vai para `arquivo_descarte` em
+    NDJSON, no formato de /api/sensores/importar, para ser reenviado depois.
+    """
+
+    def __init__(self, max_linhas: int = 500, intervalo_ms: int = 200,
+                 capacidade: int = 10000, timeout_s: float = 5.0,
+                 aguardar_commit: bool = False, tentativas: int = 5,
+                 arquivo_descarte: str = "ingestao_descartada.ndjson"):
+        self.max_linhas = max_linhas
+        self.intervalo_s = intervalo_ms / 1000
+        self.timeout_s = timeout_s
+        self.aguardar_commit = aguardar_commit
+        self.tentativas = max(tentativas, 1)
+        self.arquivo_descarte = arquivo_descarte
+        self.fila: "queue.Queue[tuple]" = queue.Queue(maxsize=capacidade)
+
+        self._parar = threading.Event()
+        # Verificar `_parar` e enfileirar são atômicos em relação a parar()
+        self._lock_entrada = threading.Lock()
+        self._lock = threading.Lock()
+        self._linhas_gravadas = 0
+        self._lotes_gravados = 0
+        self._falhas = 0
+        self._retentativas = 0
+        self._descartadas = 0
+        self._ultimo_lote = 0
+        self._ultima_latencia_ms = 0.0
+        self._latencia_total_ms = 0.0
+        self._latencia_max_ms = 0.0
+
+        self._thread = threading.Thread(target=self._executar, name="buffer-ingestao", daemon=True)
+        self._thread.start()
+
+    def registrar(self, payload: LeituraCreate) -> Leitura:
+        timestamp = _timestamp_leitura(payload)
+        futuro: Future = Future()
+        with self._lock_entrada:
+            if self._parar.is_set():
+                raise BufferCheioError("Buffer de ingestão encerrado")
+            try:
+                # Back-pressure: bloqueia o produtor enquanto a fila estiver cheia
+                self.fila.put((_linha_insercao(payload, timestamp), futuro), timeout=self.timeout_s)
+            except queue.Full:
+                raise BufferCheioError(
+                    f"Fila de ingestão cheia ({self.fila.maxsize} leituras), tente novamente"
+                )
+
+        leitura_id = None
+        if self.aguardar_commit:
+            try:
+                leitura_id = futuro.result(timeout=self.timeout_s)
+            except FuturoTimeoutError:
+                # Continua na fila (ou em nova tentativa): volta como pendente
+                pass
+        return Leitura(
+            id=leitura_id, campo_id=payload.campo_id, umidade=payload.umidade,
+            ph=payload.ph, nutrientes=payload.nutrientes, temperatura=payload.temperatura,
+            timestamp=timestamp, pendente=leitura_id is None
+        )
+
+    def _executar(self):
+        while not (self._parar.is_set() and self.fila.empty()):
+            try:
+                lote = [self.fila.get(timeout=self.intervalo_s)]
+            except queue.Empty:
+                continue
+
+            # Agrupa até max_linhas ou até o fim da janela de intervalo_ms
+            prazo = time.monotonic() + self.intervalo_s
+            while len(lote) < self.max_linhas:
+                restante = prazo - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(self.fila.get(timeout=restante))
+                except queue.Empty:
+                    break
+
+            self._gravar(lote)
+
+    def _gravar(self, lote: List[tuple]):
+        linhas = [linha for linha, _ in lote]
+        espera_s = 0.1
+        for tentativa in range(1, self.tentativas + 1):
+            inicio = time.perf_counter()
+            try:
+                with conexao() as conn:
+                    gravadas = _inserir_linhas(conn, linhas)
+                    conn.commit()
+                break
+            except Exception as e:
+                erro = e
+                with self._lock:
+                    self._falhas += 1
+                if tentativa == self.tentativas:
+                    self._descartar(linhas, erro)
+                    for _, futuro in lote:
+                        futuro.set_exception(erro)
+                    return
+                logger.warning("Falha ao gravar lote de %d leituras do buffer (tentativa %d/%d): %s",
+                               len(linhas), tentativa, self.tentativas, e)
+                with self._lock:
+                    self._retentativas += 1
+                # Espera crescente (database is locked, conexão caída); a fila segura os novos
+                time.sleep(espera_s)
+                espera_s = min(espera_s * 2, 5.0)
+
+        latencia_ms = (time.perf_counter() - inicio) * 1000
+        _publicar_gravacoes(gravadas)
+        for r, (_, futuro) in zip(gravadas, lote):
+            futuro.set_result(r.id)
+
+        with self._lock:
+            self._linhas_gravadas += len(lote)
+            self._lotes_gravados += 1
+            self._ultimo_lote = len(lote)
+            self._ultima_latencia_ms = latencia_ms
+            self._latencia_total_ms += latencia_ms
+            self._latencia_max_ms = max(self._latencia_max_ms, latencia_ms)
+
+    def _descartar(self, linhas: List[tuple], erro: Exception):
+        """Última saída de um grupo que não gravou: NDJSON reenviável por /importar."""
+        with self._lock:
+            self._descartadas += len(linhas)
+        try:
+            with open(self.arquivo_descarte, "a", encoding="utf-8") as arquivo:
+                for campo_id, umidade, ph, nutrientes, temperatura, timestamp in linhas:
+                    arquivo.write(json.dumps({
+                        "campo_id": campo_id, "umidade": umidade, "ph": ph, "nutrientes": nutrientes,
+                        "temperatura": temperatura, "timestamp": timestamp.isoformat(),
+                    }) + "\n")
+        except OSError as e:
+            logger.error("Lote de %d leituras do buffer PERDIDO após %d tentativas (%s); "
+                         "falha ao salvar em %s: %s", len(linhas), self.tentativas, erro,
+                         self.arquivo_descarte, e)
+            return
+        logger.error("Lote de %d leituras do buffer não gravado após %d tentativas (%s); "
+                     "salvo em %s para reenvio", len(linhas), self.tentativas, erro, self.arquivo_descarte)
+
+    def parar(self, timeout: Optional[float] = None):
+        """Recusa novas leituras e aguarda a gravação do que restou na fila."""
+        with self._lock_entrada:
+            self._parar.set()
+        self._thread.join(timeout)
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {
+                "ativo": True,
+                "profundidade_fila": self.fila.qsize(),
+                "capacidade_fila": self.fila.maxsize,
+                "max_linhas": self.max_linhas,
+                "intervalo_ms": self.intervalo_s * 1000,
+                "linhas_gravadas": self._linhas_gravadas,
+                "lotes_gravados": self._lotes_gravados,
+                "falhas": self._falhas,
+                "retentativas": self._retentativas,
+                "linhas_descartadas": self._descartadas,
+                "arquivo_descarte": self.arquivo_descarte,
+                "ultimo_lote_linhas": self._ultimo_lote,
+                "ultima_latencia_ms": round(self._ultima_latencia_ms, 3),
+                "latencia_media_ms": round(self._latencia_total_ms / self._lotes_gravados, 3)
+                if self._lotes_gravados else 0.0,
+                "latencia_max_ms": round(self._latencia_max_ms, 3),
+            }
+
+
+_buffer: Optional[BufferIngestao] = None
+
+def iniciar_buffer_ingestao() -> Optional[BufferIngestao]:
+    """
+    Ativa o modo bufferizado quando INGEST_BUFFER=1.
+    Ajustes: INGEST_BUFFER_MAX_LINHAS, INGEST_BUFFER_INTERVALO_MS,
+    INGEST_BUFFER_CAPACIDADE, INGEST_BUFFER_TIMEOUT_S, INGEST_BUFFER_AGUARDAR_COMMIT,
+    INGEST_BUFFER_TENTATIVAS e INGEST_BUFFER_DESCARTE (arquivo dos lotes não gravados).
+    """
+    global _buffer
+    if _buffer is None and os.getenv("INGEST_BUFFER", "0") == "1":
+        _buffer = BufferIngestao(
+            max_linhas=int(os.getenv("INGEST_BUFFER_MAX_LINHAS", 500)),
+            intervalo_ms=int(os.getenv("INGEST_BUFFER_INTERVALO_MS", 200)),
+            capacidade=int(os.getenv("INGEST_BUFFER_CAPACIDADE", 10000)),
+            timeout_s=float(os.getenv("INGEST_BUFFER_TIMEOUT_S", 5)),
+            aguardar_commit=os.getenv("INGEST_BUFFER_AGUARDAR_COMMIT", "0") == "1",
+            tentativas=int(os.getenv("INGEST_BUFFER_TENTATIVAS", 5)),
+            arquivo_descarte=os.getenv("INGEST_BUFFER_DESCARTE", "ingestao_descartada.ndjson"),
+        )
+    return _buffer
+
+def parar_buffer_ingestao():
+    """Descarrega a fila no banco (chamado no shutdown da API)."""
+    global _buffer
+    if _buffer is not None:
+        _buffer.parar()
+        _buffer = None
+
+def get_metricas_buffer() -> dict:
+    if _buffer is None:
+        return {"ativo": False}
+    return _buffer.metricas()
+
+def registrar_leitura(payload: LeituraCreate) -> Leitura:
+    if _buffer is not None:
+        return _buffer.registrar(payload)
+
+    linha = _linha_insercao(payload, _timestamp_leitura(payload))
+
+    with conexao() as conn:
+        # INSERT ... RETURNING devolve a linha criada no mesmo comando
+        # (Postgres e SQLite >= 3.35), sem depender de lastrowid
+        row = consultas.uma(conn, INSERIR_LEITURA, _linhas_banco(tempo.formato(conn), [linha])[0])
+        rollups.atualizar_leituras(conn, [linha])
+        conn.commit()
+
+    _publicar_gravacoes([row])
+    return _leitura_de_linha(row)
+
+def gravar_linhas(linhas: List[tuple]) -> List[int]:
+    """
+    Grava tuplas (campo_id, umidade, ph, nutrientes, temperatura, timestamp: datetime)
+    já validadas numa única transação e retorna os ids, na ordem.
+    """
+    if not linhas:
+        return []
+    with conexao() as conn:
+        gravadas = _inserir_linhas(conn, linhas)
+        conn.commit()
+    _publicar_gravacoes(gravadas)
+    return [r.id for r in gravadas]
+
+def gravar_leituras(payloads: List[LeituraCreate]) -> List[int]:
+    """Grava leituras já validadas numa única transação e retorna os ids, na ordem."""
+    return gravar_linhas([_linha_insercao(p, _timestamp_leitura(p)) for p in payloads])
+
+def registrar_leituras_lote(payloads: List[LeituraCreate]) -> LeituraLoteResponse:
+    """
+    Registra um lote de leituras em uma única transação (executemany).
+    Leituras inválidas são rejeitadas individualmente sem abortar o lote.
+    """
+    itens: List[LeituraLoteItem] = []
+    validas = []
+
+    for indice, payload in enumerate(payloads):
+        erro = validar_leitura(payload)
+        if erro:
+            itens.append(LeituraLoteItem(indice=indice, status="rejeitada", erro=erro))
+        else:
+            validas.append((indice, payload))
+
+    if validas:
+        ids = gravar_leituras([p for _, p in validas])
+        for leitura_id, (indice, _) in zip(ids, validas):
+            itens.append(LeituraLoteItem(indice=indice, status="inserida", id=leitura_id))
+
+    itens.sort(key=lambda item: item.indice)
+    return LeituraLoteResponse(
+        total=len(payloads),
+        inseridas=len(validas),
+        rejeitadas=len(payloads) - len(validas),
+        itens=itens,
+    )
+
+class LinhaSerie(NamedTuple):
+    timestamp: Any
+    umidade: float
+    ph: float
+    nutrientes: float
+    temperatura: float
+    id: int
+
+class LinhaBucket(NamedTuple):
+    bucket: str
+    n: int
+    umidade_soma: float
+    ph_soma: float
+    nutrientes_soma: float
+    temperatura_soma: float
+
+class LinhaGrupo(NamedTuple):
+    grupo: int
+    n: int
+    umidade_soma: float
+    ph_soma: float
+    nutrientes_soma: float
+    temperatura_soma: float
+
+METRICAS = ("umidade", "ph", "nutrientes", "temperatura")
+
+# Limites usados quando o intervalo fica aberto de um dos lados
+INICIO_ABERTO = datetime(1970, 1, 1)
+FIM_ABERTO = datetime(9999, 1, 1)
+
+# ==============================
+#    CURSORES (KEYSET)
+# ==============================
+# Leituras saem em (timestamp DESC, id ASC): a ordem do índice (campo_id, timestamp DESC)
+# no SQLite, onde o rowid desempata. A próxima página começa depois da chave
+# (timestamp, id) da última linha: "timestamp <= ? AND (timestamp < ? OR id > ?)"
+# é uma busca no índice, com custo igual em qualquer profundidade.
+
+class CursorInvalidoError(ValueError):
+    """Cursor de paginação malformado ou de outro tipo de consulta."""
+
+
+def codificar_cursor(*chave) -> str:
+    """Cursor opaco com a chave de ordenação (valores do banco) da última linha da página."""
+    return base64.urlsafe_b64encode(json.dumps(chave, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str, *tipos) -> list:
+    """Chave do cursor, conferindo a quantidade e os tipos dos valores."""
+    try:
+        chave = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise CursorInvalidoError("Cursor inválido")
+    if not isinstance(chave, list) or len(chave) != len(tipos) \
+            or not all(isinstance(v, t) and not isinstance(v, bool) for v, t in zip(chave, tipos)):
+        raise CursorInvalidoError("Cursor inválido")
+    return chave
+
+
+def _chave_leitura(cursor: str, fmt: str) -> Tuple[Any, int]:
+    """(timestamp no formato do banco, id) de um cursor de leituras."""
+    return tuple(decodificar_cursor(cursor, int if fmt == tempo.EPOCH_MS else str, int))
+
+
+def _proximo_cursor(rows: list, limite: int) -> Optional[str]:
+    """Cursor da página seguinte; None quando a página veio incompleta (fim do histórico)."""
+    if not rows or len(rows) < limite:
+        return None
+    ultima = rows[-1]
+    if isinstance(ultima, LinhaBucket):
+        return codificar_cursor(ultima.bucket)
+    return codificar_cursor(ultima.timestamp, ultima.id)
+
+
+# {tabela}: leituras_sensores ou uma partição do SQLite (ver app.particoes)
+ULTIMAS_LEITURAS = Consulta("ultimas_leituras", """
+    SELECT id, campo_id, umidade, ph, nutrientes, temperatura, timestamp
+    FROM {tabela}
+    WHERE campo_id = ?
+    ORDER BY timestamp DESC, id
+    LIMIT ?
+""", LinhaLeitura)
+
+ULTIMAS_PAGINA = Consulta("ultimas_pagina", """
+    SELECT id, campo_id, umidade, ph, nutrientes, temperatura, timestamp
+    FROM {tabela}
+    WHERE campo_id = ? AND timestamp <= ? AND (timestamp < ? OR id > ?)
+    ORDER BY timestamp DESC, id
+    LIMIT ?
+""", LinhaLeitura)
+
+SERIE_TEMPORAL = Consulta("serie_temporal", """
+    SELECT timestamp, umidade, ph, nutrientes, temperatura, id
+    FROM {tabela}
+    WHERE campo_id = ?
+    ORDER BY timestamp DESC, id
+    LIMIT ?
+""", LinhaSerie)
+
+SERIE_INTERVALO = Consulta("serie_intervalo", """
+    SELECT timestamp, umidade, ph, nutrientes, temperatura, id
+    FROM {tabela}
+    WHERE campo_id = ? AND timestamp >= ? AND timestamp < ?
+    ORDER BY timestamp DESC, id
+    LIMIT ?
+""", LinhaSerie)
+
+SERIE_PAGINA = Consulta("serie_pagina", """
+    SELECT timestamp, umidade, ph, nutrientes, temperatura, id
+    FROM {tabela}
+    WHERE campo_id = ? AND timestamp >= ? AND timestamp <= ? AND (timestamp < ? OR id > ?)
+    ORDER BY timestamp DESC, id
+    LIMIT ?
+""", LinhaSerie)
+
+# Pontos já agregados (app.rollups): médias por bucket, antigo -> recente após inverter
+SERIE_AGREGADA = Consulta("serie_agregada", """
+    SELECT bucket, n, umidade_soma, ph_soma, nutrientes_soma, temperatura_soma
+    FROM rollup_leituras
+    WHERE resolucao = ? AND campo_id = ? AND bucket >= ? AND bucket < ?
+    ORDER BY bucket DESC
+    LIMIT ?
+""", LinhaBucket)
+
+# Primeira e última leitura do campo, pelo índice (campo_id, timestamp)
+LIMITES_SERIE = Consulta("serie_limites", """
+    SELECT (SELECT MIN(timestamp) FROM {tabela} WHERE campo_id = ?),
+           (SELECT MAX(timestamp) FROM {tabela} WHERE campo_id = ?)
+""")
+
+LIMITES_ROLLUP = Consulta("serie_limites_rollup", """
+    SELECT MIN(bucket), MAX(bucket) FROM rollup_leituras WHERE resolucao = 'dia' AND campo_id = ?
+""")
+
+# Somas por grupo de `largura` ms a partir do início (epoch ms), calculadas no banco;
+# {ms} é a coluna de tempo em epoch ms no dialeto do backend (tempo.sql_epoch_ms)
+_SQL_GRUPOS_LEITURAS = """
+    SELECT ({ms} - ?) / ? AS grupo, COUNT(*) AS n,
+           SUM(umidade), SUM(ph), SUM(nutrientes), SUM(temperatura)
+    FROM {tabela}
+    WHERE campo_id = ? AND timestamp >= ? AND timestamp < ?
+    GROUP BY grupo
+    ORDER BY grupo
+"""
+
+_SQL_GRUPOS_ROLLUP = """
+    SELECT ({ms} - ?) / ? AS grupo, SUM(n) AS n,
+           SUM(umidade_soma), SUM(ph_soma), SUM(nutrientes_soma), SUM(temperatura_soma)
+    FROM rollup_leituras
+    WHERE resolucao = ? AND campo_id = ? AND bucket >= ? AND bucket < ?
+    GROUP BY grupo
+    ORDER BY grupo
+"""
+
+@lru_cache(maxsize=None)
+def _consulta_grupos(backend: str, fmt: str, tabela: str) -> Consulta:
+    if tabela == rollups.LEITURAS.tabela:
+        sql = _SQL_GRUPOS_ROLLUP.format(ms=tempo.sql_epoch_ms(backend, tempo.ISO, "bucket"))
+    else:
+        sql = _SQL_GRUPOS_LEITURAS.format(ms=tempo.sql_epoch_ms(backend, fmt, "timestamp"), tabela=tabela)
+    return Consulta(f"serie_grupos_{tabela}", sql, LinhaGrupo)
+
+def _leitura_de_linha(r: LinhaLeitura) -> Leitura:
     return Leitura(
-        id=row[0], campo_id=row[1], umidade=row[2],
-        ph=row[3], nutrientes=row[4], temperatura=row[5],
-        timestamp=row[6]
+        id=r.id, campo_id=r.campo_id, umidade=r.umidade,
+        ph=r.ph, nutrientes=r.nutrientes, temperatura=r.temperatura,
+        timestamp=tempo.do_banco(r.timestamp)
     )
 
+def _registro_leitura(r: LinhaLeitura) -> dict:
+    """O JSON de Leitura montado direto da linha (listagens, ver app.json_rapido)."""
+    return {
+        "id": r.id, "campo_id": r.campo_id, "umidade": float(r.umidade), "ph": float(r.ph),
+        "nutrientes": float(r.nutrientes), "temperatura": float(r.temperatura),
+        "timestamp": tempo.do_banco(r.timestamp), "pendente": False,
+    }
+
+def _serie_de_linhas(campo_id: int, rows, limite: int) -> dict:
+    # Inverte para o gráfico (antigo -> recente); o cursor segue para trás no tempo
+    return {
+        "campo_id": campo_id,
+        "pontos": [
+            {
+                "timestamp": tempo.do_banco(r.timestamp), "umidade": r.umidade, "ph": r.ph,
+                "nutrientes": r.nutrientes, "temperatura": r.temperatura
+            } for r in rows[::-1]
+        ],
+        "proximo_cursor": _proximo_cursor(rows, limite),
+    }
+
+def _serie_agregada_de_linhas(campo_id: int, resolucao: str, rows, limite: int) -> dict:
+    return {
+        "campo_id": campo_id,
+        "resolucao": resolucao,
+        "pontos": [
+            {
+                "timestamp": tempo.do_banco(r.bucket), "n": r.n,
+                "umidade": r.umidade_soma / r.n, "ph": r.ph_soma / r.n,
+                "nutrientes": r.nutrientes_soma / r.n, "temperatura": r.temperatura_soma / r.n
+            } for r in rows[::-1]
+        ],
+        "proximo_cursor": _proximo_cursor(rows, limite),
+    }
+
+def _consultar_recentes(conn, consulta: Consulta, params: tuple, limite: int,
+                        inicio: Optional[datetime] = None, fim: Optional[datetime] = None) -> list:
+    """
+    Executa uma consulta "ORDER BY timestamp DESC, id LIMIT ?" em cada tabela de
+    leituras (que cruze [inicio, fim)), da mais recente para a mais antiga,
+    parando quando as partições restantes já não podem ter linhas mais novas
+    que as encontradas.
+    """
+    rows = []
+    for particao in particoes.tabelas(conn, inicio, fim):
+        if _completo(rows, limite, particao):
+            break
+        novas = consultas.todas(conn, consulta.para(tabela=particao.nome), params + (limite,))
+        rows = _intercalar(rows, novas)
+    return rows[:limite]
+
+def _completo(rows: list, limite: int, particao: particoes.Particao) -> bool:
+    """True se a partição (e as seguintes, mais antigas) já não tem linhas mais novas que as `limite` encontradas."""
+    return len(rows) >= limite and particao.fim is not None \
+        and particao.fim <= tempo.do_banco(rows[limite - 1].timestamp)
+
+def _intercalar(rows: list, novas: list) -> list:
+    if rows and novas:
+        # A tabela quente do SQLite pode ter leituras retroativas: intercala por (timestamp DESC, id)
+        rows = sorted(rows + novas, key=lambda r: r.id)
+        rows.sort(key=lambda r: tempo.do_banco(r.timestamp), reverse=True)
+        return rows
+    return rows or novas
+
+def _ultimas_do_banco(cache, campo_id: int, limit: int) -> List[LinhaLeitura]:
+    versao = cache.versao(campo_id) if cache is not None else 0
+    with conexao() as conn:
+        rows = _consultar_recentes(conn, ULTIMAS_LEITURAS, (campo_id,), limit)
+    if cache is not None:
+        cache.carregar(campo_id, rows, limit, versao)
+    return rows
+
+def _pagina_do_banco(campo_id: int, limit: int, cursor: str) -> List[LinhaLeitura]:
+    with conexao() as conn:
+        ts, leitura_id = _chave_leitura(cursor, tempo.formato(conn))
+        fim = tempo.do_banco(ts) + timedelta(milliseconds=1)
+        return _consultar_recentes(conn, ULTIMAS_PAGINA, (campo_id, ts, ts, leitura_id), limit, None, fim)
+
+def ultimas_linhas(campo_id: int, limit: int = 20, cursor: Optional[str] = None) -> List[LinhaLeitura]:
+    """
+    Últimas leituras do campo (mais recente primeiro): do cache ou, na falta,
+    do banco. Com `cursor`, a página seguinte (sempre do banco).
+    """
+    if cursor is not None:
+        return _pagina_do_banco(campo_id, limit, cursor)
+    cache = iniciar_cache_ultimas()
+    if cache is not None:
+        cache.sincronizar()
+        rows = cache.consultar(campo_id, limit)
+        if rows is not None:
+            return rows
+    return _ultimas_do_banco(cache, campo_id, limit)
+
 def get_ultimas_leituras(campo_id: int, limit: int = 20) -> List[Leitura]:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT id, campo_id, umidade, ph, nutrientes, temperatura, timestamp
-        FROM leituras_sensores
-        WHERE campo_id = ?
-        ORDER BY timestamp DESC
-        LIMIT ?
-    """, (campo_id, limit))
-    rows = cur.fetchall()
-    conn.close()
-    
+    return [_leitura_de_linha(r) for r in ultimas_linhas(campo_id, limit)]
+
+def get_ultimas_pagina(campo_id: int, limit: int = 20,
+                       cursor: Optional[str] = None) -> Tuple[List[Leitura], Optional[str]]:
+    """Página de leituras e o cursor da seguinte (None no fim do histórico)."""
+    rows = ultimas_linhas(campo_id, limit, cursor)
+    return [_leitura_de_linha(r) for r in rows], _proximo_cursor(rows, limit)
+
+# ==============================
+#    ÚLTIMAS DE VÁRIOS CAMPOS
+# ==============================
+
+# Limites de /ultimas/campos (visão da frota)
+ULTIMAS_CAMPOS_MAX = 1000
+ULTIMAS_CAMPOS_MAX_LIMIT = 100
+
+# Uma busca no índice (campo_id, timestamp DESC) por campo, numa única consulta:
+# LATERAL no Postgres; no SQLite, sem LATERAL, a subconsulta correlacionada com
+# LIMIT faz o mesmo papel. ROW_NUMBER() OVER (PARTITION BY campo_id) leria todas
+# as leituras dos campos antes de filtrar as N primeiras.
+_SQL_ULTIMAS_POR_CAMPO = {
+    "postgres": """
+        SELECT l.id, l.campo_id, l.umidade, l.ph, l.nutrientes, l.temperatura, l.timestamp
+        FROM unnest(?::int[]) AS c(campo_id)
+        CROSS JOIN LATERAL (
+            SELECT id, campo_id, umidade, ph, nutrientes, temperatura, timestamp
+            FROM {tabela}
+            WHERE campo_id = c.campo_id
+            ORDER BY timestamp DESC, id
+            LIMIT ?
+        ) AS l
+        ORDER BY l.campo_id, l.timestamp DESC, l.id
+    """,
+    "sqlite": """
+        SELECT l.id, l.campo_id, l.umidade, l.ph, l.nutrientes, l.temperatura, l.timestamp
+        FROM json_each(?) AS c
+        JOIN {tabela} AS l ON l.id IN (
+            SELECT id FROM {tabela}
+            WHERE campo_id = c.value
+            ORDER BY timestamp DESC, id
+            LIMIT ?
+        )
+        ORDER BY l.campo_id, l.timestamp DESC, l.id
+    """,
+}
+
+@lru_cache(maxsize=None)
+def _consulta_ultimas_por_campo(backend: str, tabela: str) -> Consulta:
+    sql = _SQL_ULTIMAS_POR_CAMPO[backend].format(tabela=tabela)
+    return Consulta(f"ultimas_por_campo_{tabela}", sql, LinhaLeitura)
+
+def _ids_banco(backend: str, campo_ids: List[int]):
+    # int[] no Postgres; texto JSON para o json_each do SQLite
+    return list(campo_ids) if backend == "postgres" else json.dumps(campo_ids)
+
+def _agrupar(rows: List[LinhaLeitura]) -> Dict[int, List[LinhaLeitura]]:
+    grupos: Dict[int, List[LinhaLeitura]] = {}
+    for r in rows:
+        grupos.setdefault(r.campo_id, []).append(r)
+    return grupos
+
+def _consultar_recentes_campos(conn, campo_ids: List[int], limite: int) -> Dict[int, List[LinhaLeitura]]:
+    """
+    _consultar_recentes para vários campos: uma consulta por tabela de
+    leituras, só com os campos que ainda podem ter linhas mais novas nela.
+    """
+    backend = getattr(conn, "backend", "sqlite")
+    resultado: Dict[int, List[LinhaLeitura]] = {c: [] for c in campo_ids}
+    for particao in particoes.tabelas(conn):
+        pendentes = [c for c in campo_ids if not _completo(resultado[c], limite, particao)]
+        if not pendentes:
+            break
+        consulta = _consulta_ultimas_por_campo(backend, particao.nome)
+        novas = _agrupar(consultas.todas(conn, consulta, (_ids_banco(backend, pendentes), limite)))
+        for campo_id, rows in novas.items():
+            resultado[campo_id] = _intercalar(resultado[campo_id], rows)[:limite]
+    return resultado
+
+def _ultimas_campos_do_banco(cache, campo_ids: List[int], limit: int) -> Dict[int, List[LinhaLeitura]]:
+    versoes = {c: cache.versao(c) for c in campo_ids} if cache is not None else {}
+    with conexao() as conn:
+        resultado = _consultar_recentes_campos(conn, campo_ids, limit)
+    if cache is not None:
+        for campo_id, rows in resultado.items():
+            cache.carregar(campo_id, rows, limit, versoes[campo_id])
+    return resultado
+
+def _ultimas_do_cache(cache, campo_ids: List[int], limit: int) -> Dict[int, List[LinhaLeitura]]:
+    encontrados = {c: cache.consultar(c, limit) for c in campo_ids}
+    return {c: rows for c, rows in encontrados.items() if rows is not None}
+
+def ultimas_linhas_campos(campo_ids: List[int], limit: int = 20) -> Dict[int, List[LinhaLeitura]]:
+    """
+    Últimas `limit` leituras de cada campo (mais recente primeiro): o que o
+    cache responde sai dele, o resto vem do banco numa única consulta.
+    """
+    cache = iniciar_cache_ultimas()
+    resultado = {}
+    if cache is not None:
+        cache.sincronizar()
+        resultado = _ultimas_do_cache(cache, campo_ids, limit)
+    faltam = [c for c in campo_ids if c not in resultado]
+    if faltam:
+        resultado.update(_ultimas_campos_do_banco(cache, faltam, limit))
+    return resultado
+
+def _registros_campos(campo_ids: List[int], linhas: Dict[int, List[LinhaLeitura]]) -> Dict[str, List[dict]]:
+    # Chaves em texto, como em qualquer objeto JSON; campo sem leituras vem com lista vazia
+    return {str(c): [_registro_leitura(r) for r in linhas.get(c, ())] for c in campo_ids}
+
+_iso = tempo.conversor(tempo.ISO)
+
+def _params_agregada(campo_id: int, resolucao: str, limit: int, inicio: Optional[datetime],
+                     fim: Optional[datetime], cursor: Optional[str] = None) -> tuple:
+    desde = rollups.truncar(tempo.utc_ingenuo(inicio), resolucao) if inicio is not None else INICIO_ABERTO
+    # Cursor de buckets: a próxima página termina antes do último bucket entregue
+    ate = decodificar_cursor(cursor, str)[0] if cursor is not None else _iso(fim or FIM_ABERTO)
+    return (resolucao, campo_id, _iso(desde), ate, limit)
+
+def _serie_intervalo(conn, campo_id: int, limit: int, inicio: Optional[datetime],
+                     fim: Optional[datetime], cursor: Optional[str] = None):
+    converter = tempo.conversor(tempo.formato(conn))
+    if cursor is None:
+        params = (campo_id, converter(inicio or INICIO_ABERTO), converter(fim or FIM_ABERTO))
+        return _consultar_recentes(conn, SERIE_INTERVALO, params, limit, inicio, fim)
+    ts, leitura_id = _chave_leitura(cursor, tempo.formato(conn))
+    params = (campo_id, converter(inicio or INICIO_ABERTO), ts, ts, leitura_id)
+    return _consultar_recentes(conn, SERIE_PAGINA, params, limit, inicio, tempo.do_banco(ts) + timedelta(milliseconds=1))
+
+def get_serie_temporal(campo_id: int, limit: int = 100, resolucao: Optional[str] = None,
+                       inicio: Optional[datetime] = None, fim: Optional[datetime] = None,
+                       max_points: Optional[int] = None, amostragem: str = "media", metrica: str = "umidade",
+                       cursor: Optional[str] = None):
+    """
+    Últimos `limit` pontos brutos ou, com `resolucao` (minuto/hora/dia), buckets
+    dos rollups, opcionalmente restritos a [inicio, fim) e continuando de
+    `cursor`. Com `max_points`, o intervalo inteiro reduzido no servidor (ver
+    get_serie_amostrada).
+    """
+    inicio = tempo.utc_ingenuo(inicio) if inicio is not None else None
+    fim = tempo.utc_ingenuo(fim) if fim is not None else None
+    if max_points is not None:
+        return get_serie_amostrada(campo_id, max_points, inicio, fim, amostragem, metrica)
+    with conexao() as conn:
+        if resolucao is not None:
+            params = _params_agregada(campo_id, resolucao, limit, inicio, fim, cursor)
+            rows = consultas.todas(conn, SERIE_AGREGADA, params)
+            return _serie_agregada_de_linhas(campo_id, resolucao, rows, limit)
+        if inicio is None and fim is None and cursor is None:
+            rows = _consultar_recentes(conn, SERIE_TEMPORAL, (campo_id,), limit)
+        else:
+            rows = _serie_intervalo(conn, campo_id, limit, inicio, fim, cursor)
+
+    return _serie_de_linhas(campo_id, rows, limit)
+
+# ==============================
+#    SÉRIE REDUZIDA (max_points)
+# ==============================
+
+AMOSTRAGENS = ("media", "lttb")
+
+# O LTTB escolhe entre max_points x SERIE_LTTB_FATOR médias do banco, não entre as
+# leituras brutas: memória e transferência limitadas em qualquer período
+LTTB_FATOR = int(os.getenv("SERIE_LTTB_FATOR", 10))
+
+# Grupos a partir desta largura saem dos rollups em vez das leituras brutas
+_RESOLUCOES_MS = (("dia", 86_400_000), ("hora", 3_600_000))
+
+def _limites(conn, campo_id: int, inicio: Optional[datetime], fim: Optional[datetime]) -> tuple:
+    """Fecha o intervalo com a primeira/última leitura do campo (brutas ou rollups diários)."""
+    if inicio is not None and fim is not None:
+        return inicio, fim
+    primeiras, ultimas = [], []
+    for particao in particoes.tabelas(conn):
+        menor, maior = consultas.uma(conn, LIMITES_SERIE.para(tabela=particao.nome), (campo_id, campo_id))
+        if menor is not None:
+            primeiras.append(tempo.do_banco(menor))
+            ultimas.append(tempo.do_banco(maior) + timedelta(milliseconds=1))
+    if rollups.ATIVOS:
+        menor, maior = consultas.uma(conn, LIMITES_ROLLUP, (campo_id,))
+        if menor is not None:
+            primeiras.append(tempo.do_banco(menor))
+            ultimas.append(tempo.do_banco(maior) + timedelta(days=1))
+    if not primeiras:
+        return inicio, fim
+    return inicio or min(primeiras), fim or max(ultimas)
+
+def _grupos(conn, campo_id: int, inicio: datetime, fim: datetime, largura: int) -> List[tuple]:
+    """Médias por grupo de `largura` ms: [(início do grupo em ms, n, *médias)], só grupos com leituras."""
+    backend, fmt = getattr(conn, "backend", "sqlite"), tempo.formato(conn)
+    inicio_ms = tempo.datetime_para_ms(inicio)
+    resolucao = next((r for r, ms in _RESOLUCOES_MS if largura >= ms), None) if rollups.ATIVOS else None
+    if resolucao is not None:
+        fontes = [(
+            _consulta_grupos(backend, fmt, rollups.LEITURAS.tabela),
+            (inicio_ms, largura, resolucao, campo_id, _iso(rollups.truncar(inicio, resolucao)), _iso(fim)),
+        )]
+    else:
+        converter = tempo.conversor(fmt)
+        fontes = [
+            (_consulta_grupos(backend, fmt, p.nome), (inicio_ms, largura, campo_id, converter(inicio), converter(fim)))
+            for p in particoes.tabelas(conn, inicio, fim)
+        ]
+
+    # Somas de cada grupo (partições diferentes podem contribuir para o mesmo grupo)
+    somas: Dict[int, list] = {}
+    for consulta, params in fontes:
+        for g in consultas.todas(conn, consulta, params):
+            acc = somas.get(g.grupo)
+            if acc is None:
+                somas[g.grupo] = [g.n, *g[2:]]
+                continue
+            acc[0] += g.n
+            for i, v in enumerate(g[2:], 1):
+                if v is not None:
+                    acc[i] = v if acc[i] is None else acc[i] + v
     return [
-        Leitura(
-            id=r[0], campo_id=r[1], umidade=r[2],
-            ph=r[3], nutrientes=r[4], temperatura=r[5],
-            timestamp=r[6]
-        ) for r in rows
+        (inicio_ms + grupo * largura, n, *(v / n if v is not None else None for v in valores))
+        for grupo, (n, *valores) in sorted(somas.items()) if n
     ]
 
-def get_serie_temporal(campo_id: int, limit: int = 100):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT timestamp, umidade, ph, nutrientes, temperatura
-        FROM leituras_sensores
-        WHERE campo_id = ?
-        ORDER BY timestamp DESC
-        LIMIT ?
-    """, (campo_id, limit))
-    rows = cur.fetchall()
-    conn.close()
-    
-    # Inverte para o gráfico (antigo -> recente)
+def get_serie_amostrada(campo_id: int, max_points: int, inicio: Optional[datetime] = None,
+                        fim: Optional[datetime] = None, amostragem: str = "media", metrica: str = "umidade") -> dict:
+    """
+    No máximo `max_points` pontos cobrindo [inicio, fim) (aberto = primeira/última
+    leitura). "media": médias por intervalos iguais, no banco (rollups de hora/dia
+    quando o intervalo comporta). "lttb": LTTB sobre médias mais finas, guiado por `metrica`.
+    """
+    inicio = tempo.utc_ingenuo(inicio) if inicio is not None else None
+    fim = tempo.utc_ingenuo(fim) if fim is not None else None
+    with conexao() as conn:
+        inicio, fim = _limites(conn, campo_id, inicio, fim)
+        if inicio is None or fim is None or fim <= inicio:
+            pontos, largura = [], None
+        else:
+            alvo = max_points * (LTTB_FATOR if amostragem == "lttb" else 1)
+            largura = max(math.ceil((tempo.datetime_para_ms(fim) - tempo.datetime_para_ms(inicio)) / alvo), 1)
+            pontos = _grupos(conn, campo_id, inicio, fim, largura)
+
+    if amostragem == "lttb" and len(pontos) > max_points:
+        y = 2 + METRICAS.index(metrica)
+        ys = [p[y] if p[y] is not None else math.nan for p in pontos]
+        pontos = [pontos[i] for i in lttb([p[0] for p in pontos], ys, max_points)]
+
     return {
         "campo_id": campo_id,
+        "inicio": inicio,
+        "fim": fim,
+        "amostragem": amostragem,
+        "largura_ms": largura,
         "pontos": [
-            {
-                "timestamp": r[0], "umidade": r[1], "ph": r[2],
-                "nutrientes": r[3], "temperatura": r[4]
-            } for r in rows[::-1]
+            {"timestamp": tempo.ms_para_datetime(ms), "n": n, **dict(zip(METRICAS, medias))}
+            for ms, n, *medias in pontos
         ]
-    }
\ No newline at end of file
+    }
+
+# ==============================
+#    CACHE DE ÚLTIMAS LEITURAS
+# ==============================
+
+# Leituras novas trazidas do banco por sincronização; acima disso o cache recomeça do zero
+SINCRONIA_MAX_LINHAS = 10000
+
+NOVAS_LEITURAS = Consulta("ultimas_novas_leituras", """
+    SELECT id, campo_id, umidade, ph, nutrientes, temperatura, timestamp
+    FROM leituras_sensores
+    WHERE id > ?
+    ORDER BY id
+    LIMIT ?
+""", LinhaLeitura)
+
+MAIOR_ID = Consulta("ultimas_maior_id", "SELECT MAX(id) FROM leituras_sensores")
+
+CAMPOS_CADASTRADOS = Consulta("ultimas_campos", "SELECT id FROM campos")
+
+
+class CacheUltimas:
+    """
+    Últimas `capacidade` leituras de cada campo em memória, em ordem de
+    timestamp, para "qual a leitura mais recente" não ir ao banco.
+
+    Cada campo guarda as N leituras mais novas que o banco tem para ele (ou
+    todas, quando são menos de N). Gravações deste processo entram após o
+    commit; as de outros processos (scripts, outra instância da API) chegam
+    por id crescente, no máximo a cada `sincronia_s` segundos. Campo fora do
+    cache, ou pedido maior que o que há nele, vai ao SQL, e o resultado passa
+    a alimentar o cache. Exclusões (retenção, partições descartadas) só são
+    vistas ao recomeçar (invalidar ou reiniciar o processo).
+
+    A sincronização parte do maior id já visto, inclusive os gravados aqui.
+    No PostgreSQL, com vários processos gravando, ids não são commitados em
+    ordem: cada sincronização relê os últimos `margem_ids` ids (as já vistas
+    são ignoradas). Uma transação de fora que fica aberta enquanto mais de
+    `margem_ids` ids são alocados depois do seu só aparece ao recomeçar.
+    """
+
+    def __init__(self, capacidade: int = 100, sincronia_s: float = 1.0, margem_ids: int = 1000):
+        self.capacidade = capacidade
+        self.sincronia_s = sincronia_s
+        self.margem_ids = margem_ids
+        self._lock = threading.Lock()
+        self._campos: Dict[int, list] = {}   # campo -> [(timestamp, -id, LinhaLeitura)] crescente
+        self._ids: Dict[int, Set[int]] = {}   # campo -> ids em _campos
+        self._completos: Set[int] = set()     # campos com todas as leituras no cache
+        self._versoes: Dict[int, int] = {}    # gravações vistas por campo (ver carregar)
+        self._ultimo_id: Optional[int] = None
+        self._vistos: Set[int] = set()        # ids da janela de releitura já vistos
+        self._margem = margem_ids
+        self._proxima_sincronia = 0.0
+        self._acertos = 0
+        self._faltas = 0
+        self._sincronias = 0
+
+    def _inserir(self, r: LinhaLeitura):
+        self._versoes[r.campo_id] = self._versoes.get(r.campo_id, 0) + 1
+        entradas = self._campos.get(r.campo_id)
+        if entradas is None:
+            return
+        # -id: invertida, a lista sai na ordem das consultas (timestamp DESC, id)
+        chave = (tempo.do_banco(r.timestamp), -r.id)
+        if entradas and chave < entradas[0][:2] and r.campo_id not in self._completos:
+            # Mais antiga que o cache e ele não tem tudo: pode haver leituras entre as duas no banco
+            return
+        ids = self._ids[r.campo_id]
+        if r.id in ids:
+            return
+        bisect.insort(entradas, chave + (r,))
+        ids.add(r.id)
+        if len(entradas) > self.capacidade:
+            ids.discard(entradas.pop(0)[2].id)
+            self._completos.discard(r.campo_id)
+
+    def registrar(self, linhas: List[LinhaLeitura]):
+        """Leituras já commitadas (com id) por este processo."""
+        with self._lock:
+            for r in linhas:
+                self._inserir(r)
+            if linhas and self._ultimo_id is not None:
+                # A sincronização não precisa trazê-las de volta
+                self._vistos.update(r.id for r in linhas)
+                self._ultimo_id = max(self._ultimo_id, max(r.id for r in linhas))
+                if len(self._vistos) > 2 * self._margem + SINCRONIA_MAX_LINHAS:
+                    self._podar_vistos()
+
+    def versao(self, campo_id: int) -> int:
+        with self._lock:
+            return self._versoes.get(campo_id, 0)
+
+    def carregar(self, campo_id: int, rows: List[LinhaLeitura], limite: int, versao: int):
+        """
+        Alimenta o campo com o resultado do SQL (mais recente primeiro), se
+        nenhuma gravação do campo passou pelo cache desde a leitura `versao`.
+        """
+        with self._lock:
+            if self._versoes.get(campo_id, 0) != versao:
+                return
+            if len(rows) < limite and len(rows) <= self.capacidade:
+                self._completos.add(campo_id)
+            else:
+                self._completos.discard(campo_id)
+            rows = rows[:self.capacidade]
+            self._campos[campo_id] = [(tempo.do_banco(r.timestamp), -r.id, r) for r in reversed(rows)]
+            self._ids[campo_id] = {r.id for r in rows}
+
+    def consultar(self, campo_id: int, limite: int) -> Optional[List[LinhaLeitura]]:
+        """As `limite` mais recentes (mais recente primeiro) ou None se o cache não responde."""
+        with self._lock:
+            entradas = self._campos.get(campo_id)
+            if entradas is None or (limite > len(entradas) and campo_id not in self._completos):
+                self._faltas += 1
+                return None
+            self._acertos += 1
+            return [e[2] for e in entradas[:-limite - 1:-1]] if limite > 0 else []
+
+    def aquecer(self):
+        """Carrega os campos cadastrados (chamado na inicialização da API)."""
+        with conexao() as conn:
+            self._marcar_inicio(conn)
+            campos = [r[0] for r in consultas.todas(conn, CAMPOS_CADASTRADOS)]
+            for campo_id in campos:
+                versao = self.versao(campo_id)
+                rows = _consultar_recentes(conn, ULTIMAS_LEITURAS, (campo_id,), self.capacidade)
+                self.carregar(campo_id, rows, self.capacidade, versao)
+        return len(campos)
+
+    def _marcar_inicio(self, conn):
+        maior = consultas.uma(conn, MAIOR_ID)[0]
+        with self._lock:
+            self._ultimo_id = maior or 0
+            self._vistos.clear()
+            self._proxima_sincronia = time.monotonic() + self.sincronia_s
+
+    def sincronizar(self, forcar: bool = False):
+        """Traz as leituras gravadas por outros processos desde a última sincronização."""
+        if not forcar and time.monotonic() < self._proxima_sincronia:
+            return
+        with conexao() as conn:
+            if self._ultimo_id is None:
+                self._marcar_inicio(conn)
+                return
+            # No SQLite as escritas são serializadas: ids chegam em ordem de commit
+            margem = self.margem_ids if conn.backend == "postgres" else 0
+            with self._lock:
+                desde = max(self._ultimo_id - margem, 0)
+            rows = consultas.todas(conn, NOVAS_LEITURAS, (desde, SINCRONIA_MAX_LINHAS + margem + 1))
+            if len(rows) > SINCRONIA_MAX_LINHAS + margem:
+                # Carga grande por fora (importação, seed): mais barato recomeçar
+                self.invalidar()
+                self._marcar_inicio(conn)
+                cache_http.versoes.invalidar()
+                return
+        with self._lock:
+            novas = [r for r in rows if r.id not in self._vistos]
+            for r in novas:
+                self._inserir(r)
+            if rows:
+                self._ultimo_id = max(self._ultimo_id, rows[-1].id)
+            self._margem = margem
+            self._vistos.update(r.id for r in novas)
+            self._podar_vistos()
+            self._proxima_sincronia = time.monotonic() + self.sincronia_s
+            self._sincronias += 1
+        cache_http.registrar_mudanca(*{cache_http.chave_campo(r.campo_id) for r in novas})
+
+    def _podar_vistos(self):
+        # Só importam os ids que a próxima sincronização relê
+        limite = self._ultimo_id - self._margem
+        self._vistos = {i for i in self._vistos if i > limite}
+
+    def sincronia_pendente(self) -> bool:
+        return time.monotonic() >= self._proxima_sincronia
+
+    def invalidar(self):
+        with self._lock:
+            self._campos.clear()
+            self._ids.clear()
+            self._completos.clear()
+            self._versoes.clear()
+
+    def metricas(self) -> dict:
+        with self._lock:
+            consultas_total = self._acertos + self._faltas
+            return {
+                "ativo": True,
+                "capacidade_por_campo": self.capacidade,
+                "sincronia_s": self.sincronia_s,
+                "campos": len(self._campos),
+                "leituras": sum(len(e) for e in self._campos.values()),
+                "acertos": self._acertos,
+                "faltas": self._faltas,
+                "taxa_acerto": round(self._acertos / consultas_total, 4) if consultas_total else 0.0,
+                "sincronizacoes": self._sincronias,
+                "ultimo_id": self._ultimo_id,
+            }
+
+
+_cache: Optional[CacheUltimas] = None
+_lock_cache = threading.Lock()
+
+def iniciar_cache_ultimas() -> Optional[CacheUltimas]:
+    """
+    Cache das últimas leituras, criado no primeiro uso (desative com
+    CACHE_ULTIMAS=0). Ajustes: CACHE_ULTIMAS (leituras por campo),
+    CACHE_ULTIMAS_SINCRONIA_S e CACHE_ULTIMAS_MARGEM_IDS (releitura no PostgreSQL).
+    """
+    global _cache
+    if _cache is None:
+        capacidade = int(os.getenv("CACHE_ULTIMAS", 100))
+        if capacidade <= 0:
+            return None
+        with _lock_cache:
+            if _cache is None:
+                _cache = CacheUltimas(capacidade, float(os.getenv("CACHE_ULTIMAS_SINCRONIA_S", 1.0)),
+                                      int(os.getenv("CACHE_ULTIMAS_MARGEM_IDS", 1000)))
+    return _cache
+
+def aquecer_cache_ultimas():
+    """Cria o cache e carrega os campos cadastrados (startup da API)."""
+    cache = iniciar_cache_ultimas()
+    if cache is not None:
+        try:
+            cache.aquecer()
+        except Exception as e:
+            # Sem aquecimento o cache se preenche pelas consultas
+            print(f"Erro ao aquecer o cache de últimas leituras: {e}")
+
+def get_metricas_cache() -> dict:
+    if _cache is None:
+        return {"ativo": False}
+    return _cache.metricas()
+
+def _publicar_gravacoes(linhas: List[LinhaLeitura]):
+    """Leituras commitadas: entram no cache de últimas e mudam a versão HTTP dos campos."""
+    if not linhas:
+        return
+    if _cache is not None:
+        _cache.registrar(linhas)
+    cache_http.registrar_mudanca(*{cache_http.chave_campo(r.campo_id) for r in linhas})
+
+async def sincronizar_versoes_async():
+    """
+    Antes de conferir ETags: traz as gravações de outros processos, no máximo
+    a cada CACHE_ULTIMAS_SINCRONIA_S (ver CacheUltimas.sincronizar).
+    """
+    cache = iniciar_cache_ultimas()
+    if cache is not None and cache.sincronia_pendente():
+        await database_async.em_executor(cache.sincronizar)
+
+# ==============================
+#    VARIANTES ASSÍNCRONAS
+# ==============================
+# Com DB_ASYNC=nativo usam asyncpg/aiosqlite; caso contrário delegam às
+# versões síncronas no executor dedicado de app.database_async.
+
+async def registrar_leitura_async(payload: LeituraCreate) -> Leitura:
+    # O buffer de ingestão é síncrono (fila + thread), então segue pelo executor
+    if _buffer is not None or not database_async.nativo_disponivel():
+        return await database_async.em_executor(registrar_leitura, payload)
+
+    fmt = await database_async.formato_timestamp()
+    linha = _linha_insercao(payload, _timestamp_leitura(payload))
+    complementos = []
+    if rollups.ATIVOS:
+        complementos = rollups.comandos(rollups.LEITURAS, database_async.backend(), rollups.linhas_leituras([linha]))
+    row = await consultas.escrever_async(INSERIR_LEITURA, _linhas_banco(fmt, [linha])[0], complementos)
+    _publicar_gravacoes([row])
+    return _leitura_de_linha(row)
+
+async def _consulta_nativa() -> bool:
+    # Tabelas por período do SQLite são percorridas só pelo caminho síncrono
+    return database_async.nativo_disponivel() and not await database_async.leituras_particionadas()
+
+async def _ultimas_linhas_async(campo_id: int, limit: int, cursor: Optional[str] = None) -> List[LinhaLeitura]:
+    if cursor is not None:
+        return await database_async.em_executor(ultimas_linhas, campo_id, limit, cursor)
+    cache = iniciar_cache_ultimas()
+    if cache is not None:
+        # Acerto sem sincronização pendente não toca no banco nem no executor
+        if cache.sincronia_pendente():
+            return await database_async.em_executor(ultimas_linhas, campo_id, limit)
+        rows = cache.consultar(campo_id, limit)
+        if rows is None:
+            rows = await database_async.em_executor(_ultimas_do_banco, cache, campo_id, limit)
+        return rows
+
+    if not await _consulta_nativa():
+        return await database_async.em_executor(ultimas_linhas, campo_id, limit)
+
+    return await consultas.todas_async(ULTIMAS_LEITURAS.para(tabela=particoes.TABELA), (campo_id, limit))
+
+async def get_ultimas_leituras_async(campo_id: int, limit: int = 20) -> List[Leitura]:
+    return [_leitura_de_linha(r) for r in await _ultimas_linhas_async(campo_id, limit)]
+
+async def get_ultimas_pagina_async(campo_id: int, limit: int = 20,
+                                   cursor: Optional[str] = None) -> Tuple[List[Leitura], Optional[str]]:
+    rows = await _ultimas_linhas_async(campo_id, limit, cursor)
+    return [_leitura_de_linha(r) for r in rows], _proximo_cursor(rows, limit)
+
+async def get_ultimas_registros_async(campo_id: int, limit: int = 20,
+                                     cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    """Como get_ultimas_pagina_async, mas em dicts prontos para serializar (sem Leitura por linha)."""
+    rows = await _ultimas_linhas_async(campo_id, limit, cursor)
+    return [_registro_leitura(r) for r in rows], _proximo_cursor(rows, limit)
+
+async def get_ultimas_campos_async(campo_ids: List[int], limit: int = 20) -> Dict[str, List[dict]]:
+    """Últimas leituras de vários campos em dicts prontos para serializar, por campo_id."""
+    cache = iniciar_cache_ultimas()
+    if cache is not None and not cache.sincronia_pendente():
+        # Só os campos fora do cache passam pelo executor (e pelo banco)
+        linhas = _ultimas_do_cache(cache, campo_ids, limit)
+        faltam = [c for c in campo_ids if c not in linhas]
+        if faltam:
+            linhas.update(await database_async.em_executor(_ultimas_campos_do_banco, cache, faltam, limit))
+    elif cache is not None or not await _consulta_nativa():
+        linhas = await database_async.em_executor(ultimas_linhas_campos, campo_ids, limit)
+    else:
+        backend = database_async.backend()
+        consulta = _consulta_ultimas_por_campo(backend, particoes.TABELA)
+        linhas = _agrupar(await consultas.todas_async(consulta, (_ids_banco(backend, campo_ids), limit)))
+    return _registros_campos(campo_ids, linhas)
+
+async def get_serie_temporal_async(campo_id: int, limit: int = 100, resolucao: Optional[str] = None,
+                                   inicio: Optional[datetime] = None, fim: Optional[datetime] = None,
+                                   max_points: Optional[int] = None, amostragem: str = "media",
+                                   metrica: str = "umidade", cursor: Optional[str] = None):
+    inicio = tempo.utc_ingenuo(inicio) if inicio is not None else None
+    fim = tempo.utc_ingenuo(fim) if fim is not None else None
+    if max_points is None and resolucao is not None and database_async.nativo_disponivel():
+        params = _params_agregada(campo_id, resolucao, limit, inicio, fim, cursor)
+        rows = await consultas.todas_async(SERIE_AGREGADA, params)
+        return _serie_agregada_de_linhas(campo_id, resolucao, rows, limit)
+    if max_points is not None or resolucao is not None or cursor is not None or not await _consulta_nativa():
+        return await database_async.em_executor(
+            get_serie_temporal, campo_id, limit, resolucao, inicio, fim, max_points, amostragem, metrica, cursor
+        )
+
+    if inicio is None and fim is None:
+        rows = await consultas.todas_async(SERIE_TEMPORAL.para(tabela=particoes.TABELA), (campo_id, limit))
+    else:
+        converter = tempo.conversor(await database_async.formato_timestamp())
+        params = (campo_id, converter(inicio or INICIO_ABERTO), converter(fim or FIM_ABERTO), limit)
+        rows = await consultas.todas_async(SERIE_INTERVALO.para(tabela=particoes.TABELA), params)
+    return _serie_de_linhas(campo_id, rows, limit)
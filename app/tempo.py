@@ -0,0 +1,117 @@
+# app/tempo.py
+"""
+Representação de `leituras_sensores.timestamp` e `sensor_readings.recorded_at`
+no banco.
+
+Por padrão os timestamps são texto ISO 8601 (UTC). Com a migração opcional
+"epoch_ms" (TIMESTAMP_EPOCH_MS=1 ou `python -m app.migracoes --epoch-ms`)
+as duas colunas passam a guardar inteiros em milissegundos desde 1970 (UTC):
+linhas e índices menores e comparações numéricas nas consultas por intervalo.
+Os buckets dos rollups continuam em texto ISO.
+
+O formato efetivo é detectado no próprio banco (schema_version) e fica em
+cache por backend; a API continua recebendo e devolvendo datetimes.
+"""
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional, Union
+
+ISO = "iso"
+EPOCH_MS = "epoch_ms"
+
+# Versão em schema_version que marca a conversão para epoch ms (ver app.migracoes)
+VERSAO_EPOCH_MS = 100
+
+_EPOCH = datetime(1970, 1, 1)
+_lock = threading.Lock()
+_formatos: Dict[str, str] = {}
+
+
+def _backend(conn) -> str:
+    return getattr(conn, "backend", "sqlite")
+
+
+def formato(conn) -> str:
+    """Formato dos timestamps de leituras (das duas tabelas) no banco desta conexão (ISO ou EPOCH_MS)."""
+    backend = _backend(conn)
+    if backend not in _formatos:
+        with _lock:
+            _formatos[backend] = _detectar(conn)
+    return _formatos[backend]
+
+
+def formato_backend(backend: str) -> Optional[str]:
+    """Formato já detectado para o backend, ou None se ainda não houve detecção."""
+    return _formatos.get(backend)
+
+
+def _detectar(conn) -> str:
+    cur = conn.cursor()
+    marcador = "%s" if _backend(conn) == "postgres" else "?"
+    try:
+        cur.execute(f"SELECT versao FROM schema_version WHERE versao = {marcador}", (VERSAO_EPOCH_MS,))
+        encontrado = cur.fetchone() is not None
+    except Exception:
+        # Banco sem schema_version: nunca foi migrado, então é ISO
+        conn.rollback()
+        encontrado = False
+    return EPOCH_MS if encontrado else ISO
+
+
+def limpar_cache():
+    """Chamado após migrações para forçar nova detecção."""
+    with _lock:
+        _formatos.clear()
+
+
+def utc_ingenuo(dt: datetime) -> datetime:
+    """Datetime em UTC sem tzinfo (a forma usada em todo o armazenamento)."""
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def datetime_para_ms(dt: datetime) -> int:
+    return int((utc_ingenuo(dt) - _EPOCH).total_seconds() * 1000)
+
+
+def ms_para_datetime(ms: int) -> datetime:
+    return datetime.utcfromtimestamp(ms / 1000)
+
+
+def conversor(fmt: str) -> Callable[[datetime], Union[str, int]]:
+    """Função datetime -> valor de banco para o formato (útil em lotes)."""
+    if fmt == EPOCH_MS:
+        return datetime_para_ms
+    return lambda dt: utc_ingenuo(dt).isoformat()
+
+
+def para_banco(conn, dt: datetime) -> Union[str, int]:
+    """Converte um datetime para a representação usada pelo banco da conexão."""
+    return conversor(formato(conn))(dt)
+
+
+def sql_epoch_ms(backend: str, fmt: str, coluna: str) -> str:
+    """
+    Expressão SQL com a coluna de timestamp em epoch ms (inteiro), para
+    aritmética no banco (ex.: agrupar por intervalos). Texto ISO sem fuso é UTC;
+    julianday (SQLite) entende frações de segundo e sufixo de fuso (+HH:MM / Z).
+    """
+    if fmt == EPOCH_MS:
+        return coluna
+    if backend == "postgres":
+        # Sem "?" na expressão: o texto também passa pelos placeholders de app.consultas
+        return (
+            f"(EXTRACT(EPOCH FROM (CASE WHEN {coluna} ~ '(Z|[+-]\\d\\d:\\d\\d|[+-]\\d\\d\\d\\d)$' "
+            f"THEN {coluna}::timestamptz ELSE {coluna}::timestamp AT TIME ZONE 'UTC' END)) * 1000)::BIGINT"
+        )
+    return f"CAST(ROUND((julianday({coluna}) - 2440587.5) * 86400000) AS INTEGER)"
+
+
+def do_banco(valor) -> datetime:
+    """Converte o valor lido do banco (ISO ou epoch ms) para datetime."""
+    if isinstance(valor, datetime):
+        return valor
+    if isinstance(valor, (int, float)):
+        return ms_para_datetime(valor)
+    return utc_ingenuo(datetime.fromisoformat(valor))
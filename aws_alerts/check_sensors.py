@@ -8,6 +8,7 @@ send_alert.py.
 import time
 from datetime import datetime
 
+from ..app.database import fechar_pools
 from ..fase2 import db_utils
 from . import send_alert
 from ..fase3 import control
@@ -17,6 +18,7 @@ INTERVALO_SEGUNDOS = 60  # frequência de verificação
 
 
 def verificar_leituras() -> None:
+    # A leitura usa o pool de conexões: a mesma conexão é reaproveitada entre ciclos
     # Assume sensor_id 1 para umidade
     leitura = db_utils.get_last_reading(1)
     if leitura is None:
@@ -44,6 +46,8 @@ def main() -> None:
             time.sleep(INTERVALO_SEGUNDOS)
     except KeyboardInterrupt:
         print("Monitoramento de alertas encerrado.")
+    finally:
+        fechar_pools()
 
 
 if __name__ == "__main__":
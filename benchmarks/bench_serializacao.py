@@ -0,0 +1,97 @@
+"""
+Benchmark: custo por linha das listagens com Leitura + response_model x dicts direto da linha (app.json_rapido).
+
+Monta uma API mínima com as mesmas linhas em memória (sem banco) servidas
+pelos dois caminhos e mede requisições completas pelo TestClient; o custo
+por linha é (tempo com N linhas - tempo sem linhas) / N. O caminho rápido é
+medido com cada serializador disponível em app.json_rapido.
+
+    python -m benchmarks.bench_serializacao --linhas 10000 --repeticoes 20
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import json_rapido
+from app.models import Leitura
+from app.services.sensor_service import LinhaLeitura, _leitura_de_linha, _registro_leitura
+
+INICIO = datetime(2025, 1, 1)
+
+
+def _gerar(linhas: int) -> List[LinhaLeitura]:
+    passo = timedelta(seconds=30)
+    return [
+        LinhaLeitura(
+            i + 1, i % 20 + 1, random.uniform(10, 80), random.uniform(5.5, 7.5),
+            random.uniform(0.5, 3.0), random.uniform(15, 35), (INICIO + passo * i).isoformat(),
+        )
+        for i in range(linhas)
+    ]
+
+
+def _app(dados: dict) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/modelos", response_model=List[Leitura])
+    def modelos(n: int):
+        return [_leitura_de_linha(r) for r in dados[n]]
+
+    @app.get("/rapido", response_model=List[Leitura])
+    def rapido(n: int):
+        return json_rapido.RespostaJSON([_registro_leitura(r) for r in dados[n]])
+
+    return app
+
+
+def _medir(cliente: TestClient, rota: str, n: int, repeticoes: int) -> float:
+    cliente.get(rota, params={"n": n})  # aquecimento
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        cliente.get(rota, params={"n": n}).content
+    return (time.perf_counter() - inicio) / repeticoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--linhas", type=int, default=10_000)
+    parser.add_argument("--repeticoes", type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(42)
+    dados = {0: [], args.linhas: _gerar(args.linhas)}
+    cliente = TestClient(_app(dados))
+
+    # (rótulo, rota, serializadores desligados em json_rapido)
+    caminhos = [("Leitura + response_model (antes)", "/modelos", ())]
+    if json_rapido.orjson is not None:
+        caminhos.append(("dicts + orjson", "/rapido", ()))
+    if json_rapido.to_json is not None:
+        caminhos.append(("dicts + pydantic_core", "/rapido", ("orjson",)))
+    caminhos.append(("dicts + json", "/rapido", ("orjson", "to_json")))
+
+    originais = {nome: getattr(json_rapido, nome) for nome in ("orjson", "to_json")}
+    resultados = []
+    for rotulo, rota, desligados in caminhos:
+        for nome, valor in originais.items():
+            setattr(json_rapido, nome, None if nome in desligados else valor)
+        base = _medir(cliente, rota, 0, args.repeticoes)
+        total = _medir(cliente, rota, args.linhas, args.repeticoes)
+        resultados.append((rotulo, total, (total - base) / args.linhas))
+    for nome, valor in originais.items():
+        setattr(json_rapido, nome, valor)
+
+    print(f"{args.linhas} linhas por resposta, {args.repeticoes} repetições\n")
+    print(f"{'':36}{'resposta (ms)':>14}{'por linha (µs)':>16}{'ganho':>8}")
+    antes = resultados[0][2]
+    for rotulo, total, por_linha in resultados:
+        print(f"{rotulo:36}{total * 1000:>14,.1f}{por_linha * 1e6:>16,.2f}{antes / por_linha:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Benchmark: leitores x escritor concorrentes no SQLite, perfil "padrao" x "wal".
+
+Para cada perfil (ver app.database.pragmas_sqlite) cria um banco temporário
+com histórico, sobe um escritor no ritmo do simulador (uma leitura por
+transação, com rollups) e N leitores com as consultas do dashboard/API, e
+mede vazão, latência e erros de "database is locked".
+
+    python -m benchmarks.bench_sqlite_concorrencia --leitores 4 --segundos 10
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from app import rollups
+from app.database import conectar_sqlite
+from app.migracoes import aplicar_migracoes
+
+INICIO = datetime(2025, 1, 1)
+CAMPOS = 20
+
+SQL_INSERIR = (
+    "INSERT INTO leituras_sensores (campo_id, umidade, ph, nutrientes, temperatura, timestamp) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+CONSULTAS = (
+    "SELECT * FROM leituras_sensores WHERE campo_id = ? ORDER BY timestamp DESC LIMIT 100",
+    "SELECT bucket, umidade_soma / n FROM rollup_leituras "
+    "WHERE resolucao = 'hora' AND campo_id = ? ORDER BY bucket DESC LIMIT 500",
+    "SELECT campo_id, AVG(umidade), MAX(temperatura) FROM leituras_sensores "
+    "WHERE timestamp >= ? GROUP BY campo_id",
+)
+
+
+def _linha(i: int) -> tuple:
+    return (
+        i % CAMPOS + 1, random.uniform(10, 80), random.uniform(5.5, 7.5),
+        random.uniform(0.5, 3.0), random.uniform(15, 35), INICIO + timedelta(seconds=30 * i),
+    )
+
+
+def _criar_banco(caminho: str, perfil: str, historico: int):
+    conn = conectar_sqlite(caminho, perfil)
+    aplicar_migracoes(conn, verbose=False)
+    linhas = [_linha(i) for i in range(historico)]
+    conn.executemany(SQL_INSERIR, [l[:-1] + (l[-1].isoformat(),) for l in linhas])
+    rollups.atualizar_leituras(conn, linhas)
+    conn.commit()
+    conn.close()
+
+
+def _percentil(valores, p: float) -> float:
+    if not valores:
+        return 0.0
+    valores = sorted(valores)
+    return valores[min(int(len(valores) * p), len(valores) - 1)]
+
+
+def _rodar(caminho: str, perfil: str, historico: int, leitores: int, segundos: float) -> dict:
+    parar = threading.Event()
+    resultado = {"escritas": [], "leituras": [], "bloqueios": 0}
+    lock = threading.Lock()
+
+    def escritor():
+        conn = conectar_sqlite(caminho, perfil)
+        i = historico
+        while not parar.is_set():
+            linha = _linha(i)
+            inicio = time.perf_counter()
+            try:
+                conn.execute(SQL_INSERIR, linha[:-1] + (linha[-1].isoformat(),))
+                rollups.atualizar_leituras(conn, [linha])
+                conn.commit()
+            except sqlite3.OperationalError:
+                conn.rollback()
+                with lock:
+                    resultado["bloqueios"] += 1
+                continue
+            with lock:
+                resultado["escritas"].append(time.perf_counter() - inicio)
+            i += 1
+        conn.close()
+
+    def leitor(semente: int):
+        rnd = random.Random(semente)
+        conn = conectar_sqlite(caminho, perfil)
+        corte = (INICIO + timedelta(seconds=30 * historico) - timedelta(days=1)).isoformat()
+        while not parar.is_set():
+            sql = rnd.choice(CONSULTAS)
+            params = (corte,) if "GROUP BY" in sql else (rnd.randint(1, CAMPOS),)
+            inicio = time.perf_counter()
+            try:
+                conn.execute(sql, params).fetchall()
+            except sqlite3.OperationalError:
+                with lock:
+                    resultado["bloqueios"] += 1
+                continue
+            with lock:
+                resultado["leituras"].append(time.perf_counter() - inicio)
+        conn.close()
+
+    threads = [threading.Thread(target=escritor)]
+    threads += [threading.Thread(target=leitor, args=(n,)) for n in range(leitores)]
+    for t in threads:
+        t.start()
+    time.sleep(segundos)
+    parar.set()
+    for t in threads:
+        t.join()
+
+    return {
+        "escritas/s": len(resultado["escritas"]) / segundos,
+        "leituras/s": len(resultado["leituras"]) / segundos,
+        "escrita p95 (ms)": _percentil(resultado["escritas"], 0.95) * 1000,
+        "leitura p50 (ms)": _percentil(resultado["leituras"], 0.50) * 1000,
+        "leitura p95 (ms)": _percentil(resultado["leituras"], 0.95) * 1000,
+        "bloqueios": resultado["bloqueios"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--historico", type=int, default=100_000)
+    parser.add_argument("--leitores", type=int, default=4)
+    parser.add_argument("--segundos", type=float, default=10)
+    args = parser.parse_args()
+
+    random.seed(42)
+    resultados = {}
+    with tempfile.TemporaryDirectory() as pasta:
+        for perfil in ("padrao", "wal"):
+            caminho = os.path.join(pasta, f"{perfil}.db")
+            _criar_banco(caminho, perfil, args.historico)
+            resultados[perfil] = _rodar(caminho, perfil, args.historico, args.leitores, args.segundos)
+
+    print(f"{args.historico} leituras de histórico, 1 escritor + {args.leitores} leitores, {args.segundos:.0f}s\n")
+    print(f"{'':24}{'padrao':>12}{'wal':>12}")
+    for metrica in resultados["padrao"]:
+        print(f"{metrica:24}{resultados['padrao'][metrica]:>12,.1f}{resultados['wal'][metrica]:>12,.1f}")
+
+
+if __name__ == "__main__":
+    main()
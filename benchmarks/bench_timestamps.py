@@ -0,0 +1,124 @@
+"""
+Benchmark: timestamp ISO (TEXT) x epoch ms (INTEGER) em leituras_sensores.
+
+Cria dois bancos SQLite temporários com o mesmo volume de leituras, um em
+cada formato (ver app.tempo), e compara tamanho de tabela/índices e o tempo
+de consultas por intervalo, incluindo a conversão para datetime na saída.
+
+    python -m benchmarks.bench_timestamps --leituras 200000 --consultas 500
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from app import tempo
+from app.migracoes import aplicar_migracoes
+
+INICIO = datetime(2025, 1, 1)
+
+SQL_INTERVALO = """
+    SELECT timestamp, umidade FROM leituras_sensores
+    WHERE campo_id = ? AND timestamp >= ? AND timestamp < ?
+    ORDER BY timestamp
+"""
+
+
+def _gerar(leituras: int, campos: int):
+    passo = timedelta(seconds=30)
+    for i in range(leituras):
+        yield (
+            i % campos + 1, random.uniform(10, 80), random.uniform(5.5, 7.5),
+            random.uniform(0.5, 3.0), random.uniform(15, 35), INICIO + passo * i,
+        )
+
+
+def _criar_banco(caminho: str, fmt: str, leituras: int, campos: int) -> sqlite3.Connection:
+    conn = sqlite3.connect(caminho)
+    opcionais = ["epoch_ms"] if fmt == tempo.EPOCH_MS else None
+    aplicar_migracoes(conn, verbose=False, opcionais=opcionais)
+
+    converter = tempo.conversor(fmt)
+    conn.executemany(
+        "INSERT INTO leituras_sensores (campo_id, umidade, ph, nutrientes, temperatura, timestamp) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (linha[:-1] + (converter(linha[-1]),) for linha in _gerar(leituras, campos)),
+    )
+    conn.commit()
+    conn.execute("VACUUM")
+    return conn
+
+
+def _tamanhos(conn: sqlite3.Connection) -> dict:
+    """Bytes por tabela/índice via dbstat (quando compilado no SQLite)."""
+    try:
+        rows = conn.execute(
+            "SELECT name, SUM(pgsize) FROM dbstat "
+            "WHERE name LIKE '%leituras%' GROUP BY name"
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return {}
+    return dict(rows)
+
+
+def _janelas(consultas: int, leituras: int, campos: int):
+    duracao = timedelta(seconds=30 * leituras)
+    janela = timedelta(days=1)
+    for _ in range(consultas):
+        inicio = INICIO + (duracao - janela) * random.random()
+        yield random.randint(1, campos), inicio, inicio + janela
+
+
+def _medir_consultas(conn: sqlite3.Connection, fmt: str, janelas) -> tuple:
+    converter = tempo.conversor(fmt)
+    linhas = 0
+    inicio = time.perf_counter()
+    for campo_id, de, ate in janelas:
+        rows = conn.execute(SQL_INTERVALO, (campo_id, converter(de), converter(ate))).fetchall()
+        linhas += len([tempo.do_banco(ts) for ts, _ in rows])
+    return time.perf_counter() - inicio, linhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--leituras", type=int, default=200_000)
+    parser.add_argument("--campos", type=int, default=20)
+    parser.add_argument("--consultas", type=int, default=500)
+    args = parser.parse_args()
+
+    random.seed(42)
+    janelas = list(_janelas(args.consultas, args.leituras, args.campos))
+
+    with tempfile.TemporaryDirectory() as pasta:
+        resultados = {}
+        for fmt in (tempo.ISO, tempo.EPOCH_MS):
+            caminho = os.path.join(pasta, f"{fmt}.db")
+            conn = _criar_banco(caminho, fmt, args.leituras, args.campos)
+            segundos, linhas = _medir_consultas(conn, fmt, janelas)
+            resultados[fmt] = {
+                "arquivo": os.path.getsize(caminho),
+                "objetos": _tamanhos(conn),
+                "segundos": segundos,
+                "linhas": linhas,
+            }
+            conn.close()
+
+    print(f"{args.leituras} leituras, {args.campos} campos, {args.consultas} consultas de 1 dia\n")
+    iso, epoch = resultados[tempo.ISO], resultados[tempo.EPOCH_MS]
+    print(f"{'':36}{'ISO':>12}{'epoch ms':>12}{'ganho':>8}")
+
+    def linha(rotulo, a, b, unidade=""):
+        print(f"{rotulo:36}{a:>11,.0f}{unidade}{b:>11,.0f}{unidade}{a / b if b else 0:>7.2f}x")
+
+    linha("arquivo (KiB)", iso["arquivo"] / 1024, epoch["arquivo"] / 1024, " ")
+    for nome in sorted(iso["objetos"]):
+        linha(f"{nome} (KiB)", iso["objetos"][nome] / 1024, epoch["objetos"].get(nome, 0) / 1024, " ")
+    linha("consultas por intervalo (ms)", iso["segundos"] * 1000, epoch["segundos"] * 1000, " ")
+    print(f"\nlinhas retornadas: ISO={iso['linhas']} epoch={epoch['linhas']}")
+
+
+if __name__ == "__main__":
+    main()
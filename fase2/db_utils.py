@@ -1,112 +1,78 @@
 # fase2/db_utils.py
 
-import os
-import sqlite3
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from dotenv import load_dotenv
+# Conexões vêm do pool compartilhado com a API (Postgres via DATABASE_URL,
+# fallback SQLite farm.db); get_connection continua exportado por compatibilidade.
+from datetime import timedelta
 
-# Carrega o .env na inicialização do módulo
-load_dotenv()
+from app import tempo
+from app.consultas import Consulta
+from app.database import conexao, get_connection
+from app.migracoes import aplicar_migracoes
+from app.services import sensor_service
 
-def get_connection():
+def create_db():
     """
-    Retorna uma conexão com o banco de dados.
-    Prioridade: DATABASE_URL (.env) -> Postgres
-    Fallback: SQLite (farm.db)
+    Cria/atualiza as tabelas e índices pelas migrações versionadas
+    (compatível com SQLite e Postgres).
     """
-    database_url = os.getenv("DATABASE_URL")
-    
-    if database_url:
-        try:
-            conn = psycopg2.connect(
-                database_url,
-                cursor_factory=RealDictCursor,
-                sslmode=os.getenv("SUPABASE_DB_SSLMODE", "require")
-            )
-            return conn
-        except Exception as e:
-            print(f"Erro ao conectar no Postgres: {e}")
-            print("Usando SQLite como fallback...")
-    
-    # Fallback para SQLite
-    conn = sqlite3.connect("farm.db")
-    conn.row_factory = sqlite3.Row
-    return conn
+    aplicar_migracoes()
 
-def create_db():
+# Cada consulta existe uma vez; app.consultas adapta o placeholder ao backend efetivo
+# (o fallback SQLite pode estar ativo mesmo com DATABASE_URL).
+# {tabela}: leituras_sensores ou uma partição do SQLite, percorridas por
+# sensor_service._consultar_recentes (ver app.particoes)
+ULTIMAS_LEITURAS = Consulta("db_utils_ultimas_leituras", """
+    SELECT id, campo_id, umidade, ph, nutrientes, temperatura, timestamp
+    FROM {tabela}
+    ORDER BY timestamp DESC, id
+    LIMIT ?
+""", sensor_service.LinhaLeitura)
+
+# Página seguinte a partir da chave (timestamp, id) do cursor: busca no índice por
+# timestamp, com o mesmo custo em qualquer profundidade (ver sensor_service)
+ULTIMAS_LEITURAS_PAGINA = Consulta("db_utils_ultimas_leituras_pagina", """
+    SELECT id, campo_id, umidade, ph, nutrientes, temperatura, timestamp
+    FROM {tabela}
+    WHERE timestamp <= ? AND (timestamp < ? OR id > ?)
+    ORDER BY timestamp DESC, id
+    LIMIT ?
+""", sensor_service.LinhaLeitura)
+
+def get_latest_readings_page(limit=20, cursor=None):
     """
-    Cria a tabela de leituras se não existir (compatibilidade com SQLite).
+    Página de leituras (todos os campos, mais recente primeiro) e o cursor da
+    seguinte, ou None no fim. Cursor inválido levanta CursorInvalidoError.
     """
-    conn = get_connection()
-    cur = conn.cursor()
-    
-    # Verifica se é SQLite ou Postgres para ajustar a sintaxe se necessário
-    # Mas para este caso simples, a sintaxe é compatível
-    try:
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS leituras_sensores (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, -- SQLite
-                campo_id INTEGER,
-                umidade REAL,
-                ph REAL,
-                nutrientes REAL,
-                temperatura REAL,
-                timestamp TEXT
+    with conexao() as conn:
+        if cursor is None:
+            rows = sensor_service._consultar_recentes(conn, ULTIMAS_LEITURAS, (), limit)
+        else:
+            ts, leitura_id = sensor_service._chave_leitura(cursor, tempo.formato(conn))
+            # Partições a partir do mês do cursor para trás
+            fim = tempo.do_banco(ts) + timedelta(milliseconds=1)
+            rows = sensor_service._consultar_recentes(
+                conn, ULTIMAS_LEITURAS_PAGINA, (ts, ts, leitura_id), limit, None, fim
             )
-        """)
-        # Se for Postgres, o AUTOINCREMENT falharia, então precisaríamos de SERIAL
-        # Mas como o foco agora é o fallback local, isso resolve o erro imediato.
-        conn.commit()
-    except Exception as e:
-        print(f"Aviso ao criar tabela (pode já existir ou ser Postgres): {e}")
-    finally:
-        conn.close()
+    # timestamp como datetime, seja o banco ISO ou epoch ms (ver app.tempo)
+    return [
+        (tempo.do_banco(r.timestamp), r.campo_id, r.umidade, r.ph, r.nutrientes) for r in rows
+    ], sensor_service._proximo_cursor(rows, limit)
 
 def get_latest_readings(limit=20):
-    conn = get_connection()
-    cur = conn.cursor()
     try:
-        cur.execute("""
-            SELECT timestamp, campo_id, umidade, ph, nutrientes 
-            FROM leituras_sensores 
-            ORDER BY timestamp DESC 
-            LIMIT %s
-        """ if os.getenv("DATABASE_URL") else """
-            SELECT timestamp, campo_id, umidade, ph, nutrientes 
-            FROM leituras_sensores 
-            ORDER BY timestamp DESC 
-            LIMIT ?
-        """, (limit,))
-        rows = cur.fetchall()
-        return rows
+        return get_latest_readings_page(limit)[0]
     except Exception as e:
         print(f"Erro ao ler dados: {e}")
         return []
-    finally:
-        conn.close()
 
 def get_last_reading(sensor_id):
-    conn = get_connection()
-    cur = conn.cursor()
+    # Cache de últimas leituras da API (app.services.sensor_service), com SQL na falta
     try:
-        cur.execute("""
-            SELECT timestamp, umidade, ph, nutrientes 
-            FROM leituras_sensores 
-            WHERE campo_id = %s 
-            ORDER BY timestamp DESC 
-            LIMIT 1
-        """ if os.getenv("DATABASE_URL") else """
-            SELECT timestamp, umidade, ph, nutrientes 
-            FROM leituras_sensores 
-            WHERE campo_id = ? 
-            ORDER BY timestamp DESC 
-            LIMIT 1
-        """, (sensor_id,))
-        row = cur.fetchone()
-        return row
+        rows = sensor_service.ultimas_linhas(sensor_id, 1)
     except Exception as e:
         print(f"Erro ao ler última leitura: {e}")
         return None
-    finally:
-        conn.close()
+    if not rows:
+        return None
+    r = rows[0]
+    return (tempo.do_banco(r.timestamp), r.umidade, r.ph, r.nutrientes)
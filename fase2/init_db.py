@@ -1,8 +1,9 @@
 # fase2/init_db.py
 # Script de criação das tabelas principais no Supabase Postgres
 # Alinhado ao projeto GS: monitoramento de ambiente de trabalho e bem-estar
+# Execute a partir da raiz do projeto: python -m fase2.init_db
 
-from db_utils import get_connection
+from fase2.db_utils import get_connection
 
 DDL_SQL = """
 -- Habilita extensão para gerar UUID (normalmente já existe no Supabase)
@@ -1,140 +1,215 @@
-import sqlite3
+"""
+Gera o histórico simulado da Fazenda Nova Piratininga (setores, sensores e
+leituras) com numpy: cada sensor é um array inteiro por vez, com RNG semeável,
+e as leituras vão pela carga em massa (COPY / executemany) com os rollups
+agregados de forma vetorizada.
+
+    python -m fase2.populate_agro_data                        (90 dias, 1 leitura/dia)
+    python -m fase2.populate_agro_data --dias 365 --intervalo 60 --setores 200 --seed 42
+"""
+import argparse
+import time
 import uuid
-import random
 from datetime import datetime, timedelta
+from itertools import repeat
 
-DB_FILE = "farm.db"
-
-def populate_agro():
-    conn = sqlite3.connect(DB_FILE)
-    cur = conn.cursor()
-    
-    print("Gerando dados da Fazenda Nova Piratininga...")
-    
-    # --- 1. Setores (Baseado na Fazenda Nova Piratininga - 135k ha) ---
-    sectors = [
-        {"id": str(uuid.uuid4()), "name": "Talhão Soja Norte (Piratininga)", "crop": "Soja", "area": 25000.0, "status": "Crescimento Vegetativo"},
-        {"id": str(uuid.uuid4()), "name": "Talhão Milho Safrinha", "crop": "Milho", "area": 15000.0, "status": "Maturação"},
-        {"id": str(uuid.uuid4()), "name": "Pasto Rotacionado (Gado)", "crop": "Pecuária", "area": 60000.0, "status": "Engorda Intensiva"},
-        {"id": str(uuid.uuid4()), "name": "Reserva Legal Araguaia", "crop": "Floresta", "area": 30000.0, "status": "Preservação Permanente"},
-        {"id": str(uuid.uuid4()), "name": "Represa Principal", "crop": "Recursos Hídricos", "area": 5000.0, "status": "Monitoramento Nível"},
-    ]
-    
-    for s in sectors:
-        cur.execute("INSERT INTO sectors (id, name, crop_type, area_hectares, status) VALUES (?, ?, ?, ?, ?)",
-                   (s["id"], s["name"], s["crop"], s["area"], s["status"]))
-        
-    # --- 2. Sensores e Leituras ---
-    now = datetime.now()
-    
-    for s in sectors:
-        # Configuração base
+import numpy as np
+
+from app import rollups, tempo
+from app.database import LOTE_CARGA, carregar, conexao
+
+# --- Setores (Baseado na Fazenda Nova Piratininga - 135k ha) ---
+# Com --setores acima de 5, os modelos se repetem com numeração no nome
+SETORES = [
+    {"name": "Talhão Soja Norte (Piratininga)", "crop": "Soja", "area": 25000.0, "status": "Crescimento Vegetativo"},
+    {"name": "Talhão Milho Safrinha", "crop": "Milho", "area": 15000.0, "status": "Maturação"},
+    {"name": "Pasto Rotacionado (Gado)", "crop": "Pecuária", "area": 60000.0, "status": "Engorda Intensiva"},
+    {"name": "Reserva Legal Araguaia", "crop": "Floresta", "area": 30000.0, "status": "Preservação Permanente"},
+    {"name": "Represa Principal", "crop": "Recursos Hídricos", "area": 5000.0, "status": "Monitoramento Nível"},
+]
+
+
+def _sensores(crop):
+    """Sensores (tipo, nome, unidade, valor base) de um setor conforme a cultura."""
+    # Configuração base
+    base_co2 = 0
+    base_dens = 0
+    base_lux = 50000
+    base_moisture = 60
+    base_milk = 0
+    base_ndvi = 0.0 # Índice de Vegetação (0-1)
+    base_height = 0 # Altura planta (cm)
+
+    if crop == "Soja":
+        base_co2 = 120
+        base_dens = 35
+        base_moisture = 50
+        base_ndvi = 0.75 # Soja vigorosa
+        base_height = 45 # cm
+    elif crop == "Milho":
+        base_co2 = 350
+        base_dens = 7
+        base_moisture = 55
+        base_ndvi = 0.80
+        base_height = 120
+    elif crop == "Pecuária":
+        base_co2 = 1500 # Alta emissão
+        base_dens = 1.5
+        base_milk = 25000 # Alta produção (escala industrial)
+        base_ndvi = 0.40 # Pasto
+    elif crop == "Floresta":
+        base_co2 = -800 # Alto sequestro
+        base_dens = 150
+        base_lux = 10000
+        base_moisture = 85
+        base_ndvi = 0.90
+    elif crop == "Recursos Hídricos":
         base_co2 = 0
         base_dens = 0
-        base_lux = 50000
-        base_moisture = 60
-        base_milk = 0
-        base_ndvi = 0.0 # Índice de Vegetação (0-1)
-        base_height = 0 # Altura planta (cm)
-        
-        if s["crop"] == "Soja":
-            base_co2 = 120
-            base_dens = 35
-            base_moisture = 50
-            base_ndvi = 0.75 # Soja vigorosa
-            base_height = 45 # cm
-        elif s["crop"] == "Milho":
-            base_co2 = 350
-            base_dens = 7
-            base_moisture = 55
-            base_ndvi = 0.80
-            base_height = 120
-        elif s["crop"] == "Pecuária":
-            base_co2 = 1500 # Alta emissão
-            base_dens = 1.5
-            base_milk = 25000 # Alta produção (escala industrial)
-            base_ndvi = 0.40 # Pasto
-        elif s["crop"] == "Floresta":
-            base_co2 = -800 # Alto sequestro
-            base_dens = 150
-            base_lux = 10000
-            base_moisture = 85
-            base_ndvi = 0.90
-        elif s["crop"] == "Recursos Hídricos":
-            base_co2 = 0
-            base_dens = 0
-            base_lux = 60000
-            base_moisture = 100
-            
-        # Criar Sensores
-        sensors = [
-            {"type": "co2_emission", "name": "Sensor CO2", "unit": "kg/ha/ano", "base": base_co2},
-            {"type": "luminosity", "name": "Luminosidade", "unit": "lux", "base": base_lux},
-            {"type": "temperature", "name": "Temperatura", "unit": "°C", "base": 30},
-        ]
-        
-        # Sensores Específicos
-        if s["crop"] in ["Soja", "Milho"]:
-            sensors.append({"type": "soil_moisture", "name": "Umidade Solo", "unit": "%", "base": base_moisture})
-            sensors.append({"type": "crop_density", "name": "Densidade", "unit": "pl/m2", "base": base_dens})
-            sensors.append({"type": "ndvi", "name": "NDVI (Satélite)", "unit": "idx", "base": base_ndvi})
-            sensors.append({"type": "plant_height", "name": "Altura Planta", "unit": "cm", "base": base_height})
-            
-        if s["crop"] == "Pecuária":
-            sensors.append({"type": "milk_production", "name": "Tanque Expansão", "unit": "L/dia", "base": base_milk})
-            sensors.append({"type": "crop_density", "name": "Cabeças/ha", "unit": "cab/ha", "base": base_dens})
-            
-        if s["crop"] == "Floresta":
-            sensors.append({"type": "crop_density", "name": "Densidade Arbórea", "unit": "arv/ha", "base": base_dens})
-            sensors.append({"type": "ndvi", "name": "NDVI (Floresta)", "unit": "idx", "base": base_ndvi})
-
-        for sens in sensors:
-            s_id = str(uuid.uuid4())
-            cur.execute("INSERT INTO sensors (id, sector_id, name, type, unit) VALUES (?, ?, ?, ?, ?)",
-                       (s_id, s["id"], sens["name"], sens["type"], sens["unit"]))
-            
-            # Gerar histórico (últimos 90 dias - Ciclo Vegetativo Completo)
-            days_history = 90
-            for day in range(days_history):
-                t = now - timedelta(days=days_history-day)
-                
-                # Variação aleatória base
-                noise = random.uniform(0.95, 1.05)
-                val = sens["base"] * noise
-                
-                # Lógica de Crescimento (Curva Sigmoide/Linear)
-                progress = day / days_history # 0 a 1
-                
-                if sens["type"] == "plant_height":
-                    # Crescimento de 5cm até a altura base (ex: 80cm)
-                    # Fórmula simplificada de crescimento logístico
-                    start_h = 5
-                    target_h = sens["base"]
-                    val = start_h + (target_h - start_h) * (progress ** 1.2) # Crescimento levemente exponencial
-                    
-                elif sens["type"] == "ndvi":
-                    # NDVI começa em 0.2 (solo exposto) e vai até base (0.8)
-                    # Cresce rápido no início (V1-V4) e estabiliza
-                    start_ndvi = 0.25
-                    target_ndvi = sens["base"]
-                    if progress < 0.6:
-                        val = start_ndvi + (target_ndvi - start_ndvi) * (progress / 0.6)
-                    else:
-                        val = target_ndvi # Estabiliza no fechamento do dossel
-                        
-                elif sens["type"] == "crop_density":
-                    # Densidade cai levemente (perda natural de plantas)
-                    val = sens["base"] * (1 - (0.05 * progress))
-                
-                # Adicionar ruído final
-                val = val * random.uniform(0.98, 1.02)
-                
-                cur.execute("INSERT INTO sensor_readings (sensor_id, value, recorded_at) VALUES (?, ?, ?)",
-                           (s_id, val, t.isoformat()))
-
-    conn.commit()
-    conn.close()
-    print("Dados Piratininga gerados com sucesso!")
+        base_lux = 60000
+        base_moisture = 100
+
+    # Criar Sensores
+    sensors = [
+        {"type": "co2_emission", "name": "Sensor CO2", "unit": "kg/ha/ano", "base": base_co2},
+        {"type": "luminosity", "name": "Luminosidade", "unit": "lux", "base": base_lux},
+        {"type": "temperature", "name": "Temperatura", "unit": "°C", "base": 30},
+    ]
+
+    # Sensores Específicos
+    if crop in ["Soja", "Milho"]:
+        sensors.append({"type": "soil_moisture", "name": "Umidade Solo", "unit": "%", "base": base_moisture})
+        sensors.append({"type": "crop_density", "name": "Densidade", "unit": "pl/m2", "base": base_dens})
+        sensors.append({"type": "ndvi", "name": "NDVI (Satélite)", "unit": "idx", "base": base_ndvi})
+        sensors.append({"type": "plant_height", "name": "Altura Planta", "unit": "cm", "base": base_height})
+
+    if crop == "Pecuária":
+        sensors.append({"type": "milk_production", "name": "Tanque Expansão", "unit": "L/dia", "base": base_milk})
+        sensors.append({"type": "crop_density", "name": "Cabeças/ha", "unit": "cab/ha", "base": base_dens})
+
+    if crop == "Floresta":
+        sensors.append({"type": "crop_density", "name": "Densidade Arbórea", "unit": "arv/ha", "base": base_dens})
+        sensors.append({"type": "ndvi", "name": "NDVI (Floresta)", "unit": "idx", "base": base_ndvi})
+    return sensors
+
+
+def _uuid(rng) -> str:
+    """UUID4 a partir do RNG, para a mesma semente gerar os mesmos ids."""
+    return str(uuid.UUID(bytes=rng.bytes(16), version=4))
+
+
+def curva(tipo: str, base: float, progresso: np.ndarray, rng) -> np.ndarray:
+    """Valores de um sensor ao longo do ciclo (`progresso` de 0 a 1), com ruído."""
+    n = len(progresso)
+    if tipo == "plant_height":
+        # Crescimento de 5cm até a altura base, levemente exponencial
+        val = 5 + (base - 5) * progresso ** 1.2
+    elif tipo == "ndvi":
+        # NDVI começa em 0.25 (solo exposto), cresce rápido (V1-V4) e estabiliza no fechamento do dossel
+        val = np.where(progresso < 0.6, 0.25 + (base - 0.25) * (progresso / 0.6), base)
+    elif tipo == "crop_density":
+        # Densidade cai levemente (perda natural de plantas)
+        val = base * (1 - 0.05 * progresso)
+    else:
+        val = base * rng.uniform(0.95, 1.05, n)
+    # Ruído final
+    return val * rng.uniform(0.98, 1.02, n)
+
+
+def _linhas(s_id: str, ts: np.ndarray, valores: np.ndarray, lote: int, epoch_ms: bool = False):
+    """Tuplas (sensor_id, valor, recorded_at ISO ou epoch ms) convertidas do numpy aos blocos."""
+    for i in range(0, len(valores), lote):
+        if epoch_ms:
+            instantes = ts[i:i + lote].astype("datetime64[ms]").astype(np.int64).tolist()
+        else:
+            instantes = np.datetime_as_string(ts[i:i + lote]).tolist()
+        yield from zip(repeat(s_id), valores[i:i + lote].tolist(), instantes)
+
+
+def agregar_rollups(s_id: str, ts: np.ndarray, valores: np.ndarray) -> list:
+    """
+    Versão vetorizada de rollups.agregar para um sensor: `ts` em datetime64[s]
+    crescente, então cada bucket é uma fatia contígua (reduceat).
+    """
+    parametros = []
+    for resolucao, unidade in zip(rollups.RESOLUCOES, ("m", "h", "D")):
+        buckets = ts.astype(f"datetime64[{unidade}]")
+        inicios = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        fins = np.r_[inicios[1:], len(ts)] - 1
+        parametros.extend(zip(
+            repeat(resolucao), repeat(s_id),
+            np.datetime_as_string(buckets[inicios].astype("datetime64[s]")).tolist(),
+            (fins - inicios + 1).tolist(),
+            np.datetime_as_string(ts[fins]).tolist(),
+            np.minimum.reduceat(valores, inicios).tolist(),
+            np.maximum.reduceat(valores, inicios).tolist(),
+            np.add.reduceat(valores, inicios).tolist(),
+            valores[fins].tolist(),
+        ))
+    return parametros
+
+
+def populate_agro(dias: int = 90, intervalo: int = 86400, setores: int = len(SETORES),
+                  sensores_por_tipo: int = 1, seed=None, lote: int = LOTE_CARGA):
+    """
+    Gera `dias` de histórico com uma leitura a cada `intervalo` segundos por
+    sensor, em `setores` setores com `sensores_por_tipo` sensores de cada tipo.
+    """
+    rng = np.random.default_rng(seed)
+    amostras = dias * 86400 // intervalo
+    # Mesmo relógio para todos os sensores: de agora - dias até a última amostra antes de agora
+    agora = datetime.now().replace(microsecond=0)
+    ts = np.datetime64(agora - timedelta(days=dias), "s") + np.arange(amostras) * np.timedelta64(intervalo, "s")
+    progresso = np.arange(amostras) / amostras  # 0 a 1 (ciclo vegetativo completo)
+
+    print(f"Gerando dados da Fazenda Nova Piratininga ({setores} setores, {amostras} leituras por sensor)...")
+    sector_rows, sensor_rows, sensores = [], [], []
+    for i in range(setores):
+        modelo = SETORES[i % len(SETORES)]
+        nome = modelo["name"] if i < len(SETORES) else f"{modelo['name']} {i // len(SETORES) + 1}"
+        sec_id = _uuid(rng)
+        sector_rows.append((sec_id, nome, modelo["crop"], modelo["area"], modelo["status"]))
+        for sens in _sensores(modelo["crop"]):
+            for k in range(sensores_por_tipo):
+                s_id = _uuid(rng)
+                nome_sensor = sens["name"] if k == 0 else f"{sens['name']} #{k + 1}"
+                sensor_rows.append((s_id, sec_id, nome_sensor, sens["type"], sens["unit"]))
+                sensores.append((s_id, sens))
+
+    inicio = time.perf_counter()
+    total = 0
+    # COPY no Postgres, executemany no SQLite; um único commit no fim
+    with conexao() as conn:
+        epoch_ms = tempo.formato(conn) == tempo.EPOCH_MS
+        carregar(conn, "sectors", ("id", "name", "crop_type", "area_hectares", "status"), sector_rows)
+        carregar(conn, "sensors", ("id", "sector_id", "name", "type", "unit"), sensor_rows)
+        for n, (s_id, sens) in enumerate(sensores, 1):
+            valores = curva(sens["type"], sens["base"], progresso, rng)
+            total += carregar(conn, "sensor_readings", ("sensor_id", "value", "recorded_at"),
+                              _linhas(s_id, ts, valores, lote, epoch_ms), lote)
+            # Rollups minuto/hora/dia na mesma transação das leituras
+            if rollups.ATIVOS:
+                rollups.mesclar(conn, rollups.SENSORES, agregar_rollups(s_id, ts, valores))
+            if n % 50 == 0:
+                print(f"  {n}/{len(sensores)} sensores, {total:,} leituras")
+        conn.commit()
+    duracao = time.perf_counter() - inicio
+    print(f"Dados Piratininga gerados com sucesso! {total:,} leituras em {duracao:.1f}s "
+          f"({total / max(duracao, 1e-9):,.0f}/s)")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera o histórico simulado da Fazenda Nova Piratininga.")
+    parser.add_argument("--dias", type=int, default=90)
+    parser.add_argument("--intervalo", type=int, default=86400, help="segundos entre leituras de um sensor")
+    parser.add_argument("--setores", type=int, default=len(SETORES))
+    parser.add_argument("--sensores-por-tipo", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--lote", type=int, default=LOTE_CARGA)
+    args = parser.parse_args()
+    populate_agro(args.dias, args.intervalo, args.setores, args.sensores_por_tipo, args.seed, args.lote)
+
 
 if __name__ == "__main__":
-    populate_agro()
+    main()
@@ -3,11 +3,19 @@ import uuid
 import random
 from datetime import datetime, timedelta
 
+from app import rollups, tempo
+from app.database import carregar
+
 DB_FILE = "farm.db"
 
 def get_conn():
     return sqlite3.connect(DB_FILE)
 
+def tem_rollups(cur):
+    # Bancos criados antes dos rollups não têm a tabela: as leituras entram sem eles
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (rollups.SENSORES.tabela,))
+    return cur.fetchone() is not None
+
 def populate():
     conn = get_conn()
     cur = conn.cursor()
@@ -59,7 +67,7 @@ def populate():
 
     # --- 4. Historical Readings (Last 24h) ---
     now = datetime.now()
-    readings_count = 0
+    readings = []
     
     for hour in range(24):
         time_base = now - timedelta(hours=24-hour)
@@ -79,9 +87,14 @@ def populate():
                 co2_add = random.uniform(100, 400) if is_work_hour else random.uniform(0, 50)
                 val = s["base"] + co2_add
             
-            cur.execute("INSERT INTO sensor_readings (sensor_id, value, recorded_at) VALUES (?, ?, ?)",
-                       (s["id"], val, time_base.isoformat()))
-            readings_count += 1
+            readings.append((s["id"], val, time_base))
+
+    converter = tempo.conversor(tempo.formato(conn))
+    readings_count = carregar(conn, "sensor_readings", ("sensor_id", "value", "recorded_at"),
+                              [(s_id, val, converter(t)) for s_id, val, t in readings])
+    # Dashboard e export_r_data leem os rollups: mesma transação das leituras
+    if tem_rollups(cur):
+        rollups.atualizar_sensores(conn, readings)
 
     # --- 5. Wellbeing Events ---
     events = ["estresse", "foco_total", "fadiga", "satisfeito"]
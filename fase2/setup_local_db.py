@@ -1,11 +1,14 @@
 import sqlite3
 import os
 
+from app import rollups
+
 DB_FILE = "farm.db"
 
 def init_local_db():
-    if os.path.exists(DB_FILE):
-        os.remove(DB_FILE) # Reset db for clean simulation
+    for caminho in (DB_FILE, DB_FILE + "-wal", DB_FILE + "-shm"):
+        if os.path.exists(caminho):
+            os.remove(caminho) # Reset db for clean simulation (inclui os arquivos do WAL)
     
     conn = sqlite3.connect(DB_FILE)
     cur = conn.cursor()
@@ -58,6 +61,9 @@ def init_local_db():
         )
     """)
     
+    # Rollups minuto/hora/dia das leituras (lidos pelo dashboard e pelo export_r_data)
+    cur.execute(rollups.ddl(rollups.SENSORES, "sqlite"))
+
     # 5. Eventos de Bem-estar
     cur.execute("""
         CREATE TABLE IF NOT EXISTS wellbeing_events (
@@ -4,11 +4,20 @@ Simulador de sensores IoT (Fase 3).
 Este script gera leituras de sensores de umidade, pH e nutrientes de forma
 aleatória e grava os valores no banco de dados.  Útil para testes da
 automação e visualização em tempo real.
+
+Também codifica leituras no formato binário compacto dos nós ESP32
+(app/protocolo_binario.py) e compara a ingestão JSON x binária na API:
+
+    python -m fase3.simulador benchmark --url http://localhost:8000
 """
+import argparse
+import json
 import random
 import time
+import urllib.request
 
-from ..fase2 import db_utils
+from fase2 import db_utils
+from app.protocolo_binario import codificar_frame
 
 
 def gerar_leitura() -> tuple[float, float, float]:
@@ -19,6 +28,53 @@ def gerar_leitura() -> tuple[float, float, float]:
     return umidade, ph, nutrientes
 
 
+def gerar_registros(quantidade: int, campo_id: int = 1) -> list[tuple]:
+    """Registros (campo_id, timestamp_ms, umidade, ph, nutrientes, temperatura)."""
+    agora_ms = int(time.time() * 1000)
+    registros = []
+    for i in range(quantidade):
+        umidade, ph, nutrientes = gerar_leitura()
+        temperatura = random.uniform(15, 35)
+        registros.append((campo_id, agora_ms - (quantidade - i) * 1000, umidade, ph, nutrientes, temperatura))
+    return registros
+
+
+def _post(url: str, corpo: bytes, content_type: str) -> None:
+    req = urllib.request.Request(url, data=corpo, headers={"Content-Type": content_type}, method="POST")
+    with urllib.request.urlopen(req) as resp:
+        resp.read()
+
+
+def benchmark_ingestao(api_url: str, total: int = 10000, por_requisicao: int = 500) -> None:
+    """Envia as mesmas leituras como JSON (/lote) e como frames binários (/binario)."""
+    registros = gerar_registros(total)
+    lotes = [registros[i:i + por_requisicao] for i in range(0, total, por_requisicao)]
+
+    corpos_json = [
+        json.dumps([
+            {
+                "campo_id": c, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(ms / 1000)),
+                "umidade": u, "ph": p, "nutrientes": n, "temperatura": t,
+            } for c, ms, u, p, n, t in lote
+        ]).encode() for lote in lotes
+    ]
+    corpos_binarios = [codificar_frame(lote) for lote in lotes]
+
+    for nome, rota, corpos, content_type in (
+        ("JSON", "/api/sensores/lote", corpos_json, "application/json"),
+        ("Binário", "/api/sensores/binario", corpos_binarios, "application/octet-stream"),
+    ):
+        inicio = time.perf_counter()
+        for corpo in corpos:
+            _post(api_url + rota, corpo, content_type)
+        duracao = time.perf_counter() - inicio
+        enviados = sum(len(corpo) for corpo in corpos)
+        print(
+            f"{nome:8} {total} leituras | {enviados / total:6.1f} bytes/leitura "
+            f"| {total / duracao:10.0f} leituras/s"
+        )
+
+
 def main() -> None:
     # Garante que banco existe
     db_utils.create_db()
@@ -39,4 +95,14 @@ def main() -> None:
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Simulador de sensores FarmTech")
+    parser.add_argument("modo", nargs="?", default="simular", choices=["simular", "benchmark"])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--total", type=int, default=10000)
+    parser.add_argument("--por-requisicao", type=int, default=500)
+    args = parser.parse_args()
+
+    if args.modo == "benchmark":
+        benchmark_ingestao(args.url, args.total, args.por_requisicao)
+    else:
+        main()
\ No newline at end of file
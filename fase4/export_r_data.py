@@ -1,31 +1,29 @@
-import sqlite3
 import pandas as pd
-import os
+
+from app import arquivo, rollups
+from app.database import conexao
 
 def export_data():
     print("Conectando ao banco de dados...")
-    # Caminho absoluto ou relativo da raiz
-    db_path = "farm.db"
-    conn = sqlite3.connect(db_path)
-    
-    # Query simplificada para garantir que o R tenha dados legíveis
-    # Pegamos todas as leituras e deixamos o R filtrar/agrupar se quiser, 
-    # ou fazemos um pivot simples aqui.
+    # Metadados dos sensores; as leituras vêm do banco + arquivo Parquet (app/arquivo.py)
     query = """
         SELECT 
+            s.id as sensor_id,
             sec.name as sector, 
             sec.crop_type,
-            s.type as sensor_type,
-            r.value,
-            r.recorded_at
-        FROM sensor_readings r
-        JOIN sensors s ON r.sensor_id = s.id
+            s.type as sensor_type
+        FROM sensors s
         JOIN sectors sec ON s.sector_id = sec.id
     """
     
     print("Extraindo dados...")
     try:
-        df = pd.read_sql_query(query, conn)
+        with conexao() as conn:
+            cur = conn.cursor()
+            cur.execute(query)
+            sensores = pd.DataFrame([dict(r) for r in cur.fetchall()])
+            leituras = arquivo.ler(rollups.SENSORES, ["sensor_id", "value", "recorded_at"], conn=conn)
+        df = leituras.merge(sensores, on="sensor_id").drop(columns="sensor_id")
         
         # Pivot para ter colunas: sector, crop_type, co2, luminosity, density
         # Isso facilita a correlação no R
@@ -41,8 +39,8 @@ def export_data():
         }, inplace=True)
         
         # Preencher NaNs (timestamps podem variar milissegundos) com forward fill
-        df_pivot.fillna(method='ffill', inplace=True)
-        df_pivot.fillna(method='bfill', inplace=True) # Para os primeiros
+        df_pivot = df_pivot.ffill()
+        df_pivot = df_pivot.bfill() # Para os primeiros
         
         output_path = "fase4/sensor_data.csv"
         df_pivot.to_csv(output_path, index=False)
@@ -51,8 +49,6 @@ def export_data():
         
     except Exception as e:
         print(f"Erro: {e}")
-    finally:
-        conn.close()
 
 if __name__ == "__main__":
     export_data()
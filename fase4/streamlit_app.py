@@ -1,10 +1,11 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
 import plotly.express as px
 import plotly.graph_objects as go
 import time
 
+from app.database import conectar_sqlite
+
 # Configuração da Página
 st.set_page_config(page_title="CAPATAZ - Inteligência de Campo", page_icon="🤠", layout="wide")
 
@@ -40,20 +41,27 @@ if not check_password():
 
 # --- Fim da Segurança ---
 
+# Séries longas vêm dos rollups diários (app/rollups.py), não das leituras brutas
+ROLLUP_DIARIO = "(SELECT * FROM rollup_sensores WHERE resolucao = 'dia') r"
+MEDIA_ROLLUP = "SUM(r.valor_soma) / SUM(r.n)"
+
 def get_data(query):
-    conn = sqlite3.connect("farm.db")
+    conn = conectar_sqlite("farm.db")
     df = pd.read_sql_query(query, conn)
     conn.close()
     return df
 
 # Função para exportar dados para o R
 def export_for_r():
-    df = get_data("""
-        SELECT s.name as sector, sens.type, r.value 
-        FROM sensor_readings r
-        JOIN sensors sens ON r.sensor_id = sens.id
+    # Leituras brutas do banco + arquivo Parquet (app/arquivo.py)
+    from app import arquivo, rollups
+    sensores = get_data("""
+        SELECT sens.id as sensor_id, s.name as sector, sens.type
+        FROM sensors sens
         JOIN sectors s ON sens.sector_id = s.id
     """)
+    leituras = arquivo.ler(rollups.SENSORES, ["sensor_id", "value"])
+    df = leituras.merge(sensores, on="sensor_id")[["sector", "type", "value"]]
     df.to_csv("fase4/sensor_data.csv", index=False)
     return "Dados exportados para 'fase4/sensor_data.csv'"
 
@@ -71,12 +79,12 @@ def run_agent_analysis():
     insights = []
     
     # Checar CO2
-    df_co2 = get_data("SELECT AVG(value) as v FROM sensor_readings r JOIN sensors s ON r.sensor_id=s.id WHERE s.type='co2_emission'")
+    df_co2 = get_data(f"SELECT {MEDIA_ROLLUP} as v FROM {ROLLUP_DIARIO} JOIN sensors s ON r.sensor_id=s.id WHERE s.type='co2_emission'")
     avg_co2 = df_co2['v'].iloc[0] if not df_co2.empty else 0
     if avg_co2 > 1000: insights.append("⚠️ Emissões altas detectadas no Pasto.")
     
     # Checar Soja
-    df_soy = get_data("SELECT AVG(value) as v FROM sensor_readings r JOIN sensors s ON r.sensor_id=s.id WHERE s.type='ndvi'")
+    df_soy = get_data(f"SELECT {MEDIA_ROLLUP} as v FROM {ROLLUP_DIARIO} JOIN sensors s ON r.sensor_id=s.id WHERE s.type='ndvi'")
     avg_ndvi = df_soy['v'].iloc[0] if not df_soy.empty else 0
     if avg_ndvi > 0.7: insights.append("✅ Soja com vigor vegetativo excelente (NDVI > 0.7).")
     elif avg_ndvi < 0.4: insights.append("⚠️ Alerta: Baixo vigor na Soja. Verificar pragas.")
@@ -108,12 +116,12 @@ if page == "Visão Geral (Piratininga)":
     col1, col2, col3 = st.columns(3)
     
     # Total CO2
-    df_co2 = get_data("""
-        SELECT SUM(r.value) as total 
-        FROM sensor_readings r 
+    df_co2 = get_data(f"""
+        SELECT SUM(r.valor_soma) as total 
+        FROM {ROLLUP_DIARIO} 
         JOIN sensors s ON r.sensor_id = s.id 
         WHERE s.type='co2_emission' 
-        AND r.recorded_at > date('now', '-1 day')
+        AND r.bucket >= date('now', '-1 day')
     """)
     total_co2 = df_co2['total'].iloc[0] if not df_co2.empty and df_co2['total'].iloc[0] else 0
     
@@ -131,9 +139,9 @@ if page == "Visão Geral (Piratininga)":
     with col_graph:
         # Mapa de Calor
         st.subheader("🔥 Emissões por Setor (kg CO2/ha)")
-        df_sector_co2 = get_data("""
-            SELECT sec.name, sec.crop_type, AVG(r.value) as avg_co2
-            FROM sensor_readings r
+        df_sector_co2 = get_data(f"""
+            SELECT sec.name, sec.crop_type, {MEDIA_ROLLUP} as avg_co2
+            FROM {ROLLUP_DIARIO}
             JOIN sensors s ON r.sensor_id = s.id
             JOIN sectors sec ON s.sector_id = sec.id
             WHERE s.type = 'co2_emission'
@@ -188,13 +196,13 @@ elif page == "🌱 Análise Soja (NDVI)":
     total_area_soy = df_area_soy['total'].iloc[0] if not df_area_soy.empty else 0
     
     # 2. Dados de Sensores
-    df_soy = get_data("""
-        SELECT s.type, r.value, r.recorded_at
-        FROM sensor_readings r
+    df_soy = get_data(f"""
+        SELECT s.type, r.valor_soma / r.n as value, r.bucket as recorded_at
+        FROM {ROLLUP_DIARIO}
         JOIN sensors s ON r.sensor_id = s.id
         JOIN sectors sec ON s.sector_id = sec.id
         WHERE sec.crop_type = 'Soja'
-        ORDER BY r.recorded_at
+        ORDER BY r.bucket
     """)
     
     if not df_soy.empty:
@@ -262,12 +270,12 @@ elif page == "🐄 Gestão Leiteira":
     st.markdown("Monitoramento diário do tanque de expansão e produtividade do rebanho.")
     
     # Dados de Leite
-    df_milk = get_data("""
-        SELECT r.value, r.recorded_at
-        FROM sensor_readings r
+    df_milk = get_data(f"""
+        SELECT r.valor_soma / r.n as value, r.bucket as recorded_at
+        FROM {ROLLUP_DIARIO}
         JOIN sensors s ON r.sensor_id = s.id
         WHERE s.type = 'milk_production'
-        ORDER BY r.recorded_at
+        ORDER BY r.bucket
     """)
     
     if not df_milk.empty:
@@ -307,9 +315,9 @@ elif page == "🌍 Gestão de Carbono (ESG)":
     st.markdown("Balanço de Emissões (GEE) e Potencial de Créditos de Carbono.")
     
     # Dados de CO2 Agrupados por Cultura
-    df_carbon = get_data("""
-        SELECT sec.crop_type, SUM(r.value) as total_co2, AVG(r.value) as avg_co2_ha, COUNT(DISTINCT sec.id) as num_sectors
-        FROM sensor_readings r
+    df_carbon = get_data(f"""
+        SELECT sec.crop_type, SUM(r.valor_soma) as total_co2, {MEDIA_ROLLUP} as avg_co2_ha, COUNT(DISTINCT sec.id) as num_sectors
+        FROM {ROLLUP_DIARIO}
         JOIN sensors s ON r.sensor_id = s.id
         JOIN sectors sec ON s.sector_id = sec.id
         WHERE s.type = 'co2_emission'
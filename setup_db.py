@@ -1,23 +1,10 @@
-import sqlite3
+from app.migracoes import aplicar_migracoes
 
 def init_db():
-    conn = sqlite3.connect("farm.db")
-    cur = conn.cursor()
-    
-    print("Criando tabela leituras_sensores...")
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS leituras_sensores (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            campo_id INTEGER,
-            umidade REAL,
-            ph REAL,
-            nutrientes REAL,
-            temperatura REAL,
-            timestamp TEXT
-        )
-    """)
-    conn.commit()
-    conn.close()
+    # O schema é versionado em app/migracoes.py (tabelas + índices);
+    # rodar de novo aplica apenas as migrações pendentes
+    print("Aplicando migrações do banco...")
+    aplicar_migracoes()
     print("Banco de dados inicializado com sucesso!")
 
 if __name__ == "__main__":
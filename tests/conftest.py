@@ -0,0 +1,47 @@
+# tests/conftest.py
+"""
+Cada teste roda num farm.db novo (SQLite) dentro de um diretório temporário,
+com os caches em memória dos módulos zerados antes e depois.
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+from app import cache_http, particoes, tempo
+from app.database import fechar_pools
+from app.migracoes import aplicar_migracoes
+from app.services import sensor_service
+
+
+def _zerar():
+    fechar_pools()
+    tempo.limpar_cache()
+    particoes.limpar_cache()
+    sensor_service.parar_buffer_ingestao()
+    sensor_service._cache = None
+    cache_http.versoes.invalidar()
+    if cache_http._respostas is not None:
+        cache_http._respostas = cache_http.CacheRespostas(cache_http._respostas.capacidade)
+
+
+@pytest.fixture
+def banco(tmp_path, monkeypatch):
+    """Diretório de trabalho com um farm.db vazio (sem migrações)."""
+    monkeypatch.chdir(tmp_path)
+    _zerar()
+    yield tmp_path
+    _zerar()
+
+
+@pytest.fixture
+def migrado(banco):
+    """farm.db com as migrações padrão aplicadas."""
+    aplicar_migracoes(verbose=False)
+    return banco
+
+
+@pytest.fixture
+def cliente(migrado):
+    """API com startup/shutdown sobre o banco migrado."""
+    from app.main import app  # carrega o modelo de irrigação relativo ao diretório de trabalho
+    with TestClient(app) as c:
+        yield c
@@ -0,0 +1,80 @@
+# tests/test_arquivo.py
+from datetime import datetime
+
+import pytest
+
+from app import arquivo, retencao, rollups
+from app.database import conexao
+from app.models import LeituraCreate
+from app.services import sensor_service
+from tests.test_serie import _gravar_meses
+
+pytest.importorskip("pyarrow")
+
+
+def _ids_lidos(**filtros) -> set:
+    return set(arquivo.ler(rollups.LEITURAS, ["id"], **filtros)["id"])
+
+
+def test_fronteira_nao_recua(migrado):
+    _gravar_meses()
+    with conexao() as conn:
+        arquivo.arquivar(conn, rollups.LEITURAS, datetime(2024, 3, 1))
+        assert arquivo.arquivar(conn, rollups.LEITURAS, datetime(2024, 2, 1)) == 0
+
+    assert arquivo.fronteira(rollups.LEITURAS) == datetime(2024, 3, 1)
+
+
+def test_arquivar_inclui_leituras_retroativas(migrado):
+    _gravar_meses()
+    with conexao() as conn:
+        assert arquivo.arquivar(conn, rollups.LEITURAS, datetime(2024, 3, 1)) == 120
+        retroativa = sensor_service.registrar_leitura(LeituraCreate(
+            campo_id=1, umidade=55, ph=6.5, nutrientes=1, temperatura=20, timestamp=datetime(2024, 1, 15, 6)
+        ))
+
+        assert arquivo.arquivar(conn, rollups.LEITURAS, datetime(2024, 3, 1)) == 1
+        # Reexecutar não duplica
+        assert arquivo.arquivar(conn, rollups.LEITURAS, datetime(2024, 3, 1)) == 0
+
+    assert retroativa.id in _ids_lidos(ate=datetime(2024, 3, 1))
+
+
+def test_retencao_nao_perde_leituras_retroativas(migrado, monkeypatch):
+    monkeypatch.setattr(arquivo, "ATIVO", True)
+    _gravar_meses()
+    with conexao() as conn:
+        arquivo.arquivar(conn, rollups.LEITURAS, datetime(2024, 3, 1))
+    retroativa = sensor_service.registrar_leitura(LeituraCreate(
+        campo_id=1, umidade=55, ph=6.5, nutrientes=1, temperatura=20, timestamp=datetime(2024, 1, 15, 6)
+    ))
+
+    relatorio = retencao.executar(dias=30, agora=datetime(2024, 3, 31), vacuum="nao")
+
+    item = relatorio["series"]["leituras_sensores"]
+    assert item["arquivadas"] == 1
+    assert item["linhas_apagadas"] == 121
+    ids = _ids_lidos()
+    assert retroativa.id in ids
+    assert len(ids) == 181
+
+
+@pytest.mark.parametrize("formato", ["parquet", "arrow"])
+def test_restaurar_devolve_as_leituras_com_os_ids_originais(migrado, formato):
+    _gravar_meses()
+    consulta = ("SELECT id, campo_id, umidade, timestamp FROM leituras_sensores "
+                "WHERE timestamp >= '2024-02-01' AND timestamp < '2024-02-11' ORDER BY id")
+    with conexao() as conn:
+        originais = [tuple(r) for r in conn.execute(consulta)]
+        arquivo.arquivar(conn, rollups.LEITURAS, datetime(2024, 3, 1), formato)
+        conn.execute("DELETE FROM leituras_sensores WHERE timestamp < '2024-03-01'")
+        conn.commit()
+
+        assert arquivo.restaurar(conn, rollups.LEITURAS, datetime(2024, 2, 1), datetime(2024, 2, 11)) == 20
+        # Já presentes no banco não são duplicadas
+        assert arquivo.restaurar(conn, rollups.LEITURAS, datetime(2024, 2, 1), datetime(2024, 2, 11)) == 0
+        conn.commit()
+        assert [tuple(r) for r in conn.execute(consulta)] == originais
+
+    # Arquivo e banco juntos, sem repetir as restauradas
+    assert len(_ids_lidos()) == 180
@@ -0,0 +1,81 @@
+# tests/test_buffer_ingestao.py
+import sqlite3
+from datetime import datetime, timedelta
+
+from app.database import conexao
+from app.models import LeituraCreate
+from app.services import sensor_service
+
+
+def _leituras(n: int):
+    return [LeituraCreate(campo_id=1, umidade=40 + i, ph=6.5, nutrientes=1, temperatura=20,
+                          timestamp=datetime(2024, 1, 1) + timedelta(minutes=i))
+            for i in range(n)]
+
+
+def _contar() -> int:
+    with conexao() as conn:
+        return conn.execute("SELECT COUNT(*) FROM leituras_sensores").fetchone()[0]
+
+
+def test_group_commit_grava_a_fila_num_lote(migrado):
+    buffer = sensor_service.BufferIngestao(intervalo_ms=300)
+    pendentes = [buffer.registrar(p) for p in _leituras(10)]
+    buffer.parar()
+
+    assert all(l.pendente and l.id is None for l in pendentes)
+    assert _contar() == 10
+    metricas = buffer.metricas()
+    assert (metricas["linhas_gravadas"], metricas["lotes_gravados"]) == (10, 1)
+
+
+def test_aguardar_commit_devolve_id_definitivo(migrado):
+    buffer = sensor_service.BufferIngestao(intervalo_ms=10, aguardar_commit=True)
+    leitura = buffer.registrar(_leituras(1)[0])
+    buffer.parar()
+
+    assert not leitura.pendente
+    with conexao() as conn:
+        assert conn.execute("SELECT umidade FROM leituras_sensores WHERE id = ?", (leitura.id,)).fetchone()[0] == 40
+
+
+def test_falha_transitoria_e_regravada(migrado, monkeypatch):
+    original = sensor_service._inserir_linhas
+    falhas = []
+
+    def inserir(conn, linhas):
+        if not falhas:
+            falhas.append(1)
+            raise sqlite3.OperationalError("database is locked")
+        return original(conn, linhas)
+
+    monkeypatch.setattr(sensor_service, "_inserir_linhas", inserir)
+    buffer = sensor_service.BufferIngestao(intervalo_ms=10, tentativas=3)
+    for p in _leituras(3):
+        buffer.registrar(p)
+    buffer.parar()
+
+    assert _contar() == 3
+    metricas = buffer.metricas()
+    assert (metricas["falhas"], metricas["retentativas"], metricas["linhas_descartadas"]) == (1, 1, 0)
+
+
+def test_lote_que_nao_grava_vai_para_o_descarte_e_reimporta(cliente, monkeypatch, tmp_path):
+    def inserir(conn, linhas):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    descarte = tmp_path / "descarte.ndjson"
+    with monkeypatch.context() as m:
+        m.setattr(sensor_service, "_inserir_linhas", inserir)
+        buffer = sensor_service.BufferIngestao(intervalo_ms=10, tentativas=2, arquivo_descarte=str(descarte))
+        for p in _leituras(4):
+            buffer.registrar(p)
+        buffer.parar()
+
+    assert _contar() == 0
+    assert buffer.metricas()["linhas_descartadas"] == 4
+
+    r = cliente.post("/api/sensores/importar?formato=ndjson", content=descarte.read_bytes())
+    assert r.json()["aceitas"] == 4
+    with conexao() as conn:
+        assert [row[0] for row in conn.execute("SELECT umidade FROM leituras_sensores ORDER BY timestamp")] == [40, 41, 42, 43]
@@ -0,0 +1,109 @@
+# tests/test_cache_http.py
+import time
+from datetime import datetime, timedelta
+
+from app import cache_http
+from app.models import LeituraCreate
+from app.services import sensor_service
+
+SERIE = {"campo_id": 1, "limit": 100}
+
+
+def _gravar(n: int = 1, inicio: datetime = datetime(2024, 1, 1)):
+    sensor_service.gravar_leituras([
+        LeituraCreate(campo_id=1, umidade=40, ph=6.5, nutrientes=1, temperatura=20,
+                      timestamp=inicio + timedelta(minutes=i))
+        for i in range(n)
+    ])
+
+
+def test_etag_igual_recebe_304_e_gravacao_invalida(cliente):
+    _gravar(3)
+    r = cliente.get("/api/sensores/serie", params=SERIE)
+    assert r.status_code == 200
+    etag = r.headers["etag"]
+
+    r = cliente.get("/api/sensores/serie", params=SERIE, headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.content == b""
+
+    _gravar(1, datetime(2024, 2, 1))
+    r = cliente.get("/api/sensores/serie", params=SERIE, headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["etag"] != etag
+    assert len(r.json()["pontos"]) == 4
+
+
+def test_if_modified_since_ve_duas_gravacoes_no_mesmo_segundo(cliente, monkeypatch):
+    instante = cache_http._agora()
+    monkeypatch.setattr(cache_http, "_agora", lambda: instante)
+
+    _gravar(1)
+    r = cliente.get("/api/sensores/serie", params=SERIE)
+    modificado = r.headers["last-modified"]
+
+    _gravar(1, datetime(2024, 2, 1))
+    r = cliente.get("/api/sensores/serie", params=SERIE, headers={"If-Modified-Since": modificado})
+    assert r.status_code == 200
+    assert len(r.json()["pontos"]) == 2
+    assert r.headers["last-modified"] != modificado
+
+    r = cliente.get("/api/sensores/serie", params=SERIE, headers={"If-Modified-Since": r.headers["last-modified"]})
+    assert r.status_code == 304
+
+
+def test_renovacao_nao_volta_last_modified():
+    versoes = cache_http.Versoes()
+    for _ in range(3):
+        versoes.incrementar("x")
+    _, antes = versoes.estado("x")
+    versoes.invalidar()
+    _, depois = versoes.estado("x")
+    assert depois > antes
+
+
+def test_lista_de_campos_muda_de_etag_ao_criar_campo(cliente):
+    r = cliente.get("/api/campos/")
+    etag = r.headers["etag"]
+    assert r.headers["cache-control"] == "no-cache"
+
+    assert cliente.get("/api/campos/", headers={"If-None-Match": etag}).status_code == 304
+    # Comparação fraca, lista de ETags e "*"
+    assert cliente.get("/api/campos/", headers={"If-None-Match": f'"x", {etag.removeprefix("W/")}'}).status_code == 304
+    assert cliente.get("/api/campos/", headers={"If-None-Match": "*"}).status_code == 304
+
+    cliente.post("/api/campos/", json={"nome": "A", "cultura": "milho", "largura": 1, "comprimento": 2})
+    r = cliente.get("/api/campos/", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert [c["nome"] for c in r.json()] == ["A"]
+
+
+def test_corpo_repetido_sai_do_cache_de_respostas(cliente, monkeypatch):
+    _gravar(3)
+    chamadas = []
+    original = sensor_service.get_serie_temporal_async
+
+    async def contar(*args, **kwargs):
+        chamadas.append(args)
+        return await original(*args, **kwargs)
+
+    monkeypatch.setattr(sensor_service, "get_serie_temporal_async", contar)
+    primeira = cliente.get("/api/sensores/serie", params=SERIE)
+    segunda = cliente.get("/api/sensores/serie", params=SERIE)
+    assert primeira.content == segunda.content
+    assert len(chamadas) == 1
+
+    # Outros parâmetros são outra entrada
+    cliente.get("/api/sensores/serie", params={**SERIE, "limit": 2})
+    assert len(chamadas) == 2
+    assert cliente.get("/api/sensores/respostas/metricas").json()["respostas"]["acertos"] >= 1
+
+
+def test_versoes_se_renovam_apos_a_validade(monkeypatch):
+    versoes = cache_http.Versoes(validade_s=60)
+    etag, _ = versoes.estado("x")
+    assert versoes.estado("x")[0] == etag
+
+    relogio = time.monotonic() + 61
+    monkeypatch.setattr(cache_http.time, "monotonic", lambda: relogio)
+    assert versoes.estado("x")[0] != etag
@@ -0,0 +1,79 @@
+# tests/test_cache_ultimas.py
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import cache_http
+from app.database import SQLITE_DB
+from app.models import LeituraCreate
+from app.services import sensor_service
+
+INICIO = datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def cache(migrado, monkeypatch):
+    cache = sensor_service.CacheUltimas(capacidade=5, sincronia_s=0)
+    monkeypatch.setattr(sensor_service, "_cache", cache)
+    cache.aquecer()
+    return cache
+
+
+def _gravar(*horas, campo_id: int = 1):
+    return sensor_service.gravar_leituras([
+        LeituraCreate(campo_id=campo_id, umidade=h, ph=6.5, nutrientes=1, temperatura=20,
+                      timestamp=INICIO + timedelta(hours=h))
+        for h in horas
+    ])
+
+
+def _do_banco(campo_id: int, limit: int):
+    return sensor_service._ultimas_do_banco(None, campo_id, limit)
+
+
+def _gravar_por_fora(*horas, campo_id: int = 1):
+    # Outro processo gravando direto no farm.db
+    conn = sqlite3.connect(SQLITE_DB)
+    conn.executemany(
+        "INSERT INTO leituras_sensores (campo_id, umidade, ph, nutrientes, temperatura, timestamp) "
+        "VALUES (?, ?, 6.5, 1, 20, ?)",
+        [(campo_id, h, (INICIO + timedelta(hours=h)).isoformat()) for h in horas],
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_cache_responde_igual_ao_banco(cache):
+    _gravar(5, 1, 9)
+    sensor_service.ultimas_linhas(1, 3)  # campo entra no cache
+    _gravar(7, 3, 9)   # empate de timestamp: desempata por id
+    _gravar(0)         # mais antiga que tudo no cache cheio
+
+    for limit in range(1, 9):
+        assert sensor_service.ultimas_linhas(1, limit) == _do_banco(1, limit)
+    metricas = cache.metricas()
+    assert metricas["acertos"] >= 5 and metricas["faltas"] >= 1
+
+
+def test_sincroniza_gravacoes_de_outro_processo(cache):
+    _gravar(1, 2)
+    assert [r.umidade for r in sensor_service.ultimas_linhas(1, 2)] == [2, 1]
+    etag, _ = cache_http.versoes.estado(cache_http.chave_campo(1))
+
+    _gravar_por_fora(3)
+
+    assert [r.umidade for r in sensor_service.ultimas_linhas(1, 2)] == [3, 2]
+    assert cache.metricas()["sincronizacoes"] >= 1
+    assert cache_http.versoes.estado(cache_http.chave_campo(1))[0] != etag
+
+
+def test_carga_grande_por_fora_recomeca_o_cache(cache, monkeypatch):
+    monkeypatch.setattr(sensor_service, "SINCRONIA_MAX_LINHAS", 3)
+    _gravar(1)
+    sensor_service.ultimas_linhas(1, 1)
+
+    _gravar_por_fora(*range(10, 20))
+
+    assert sensor_service.ultimas_linhas(1, 5) == _do_banco(1, 5)
+    assert [r.umidade for r in sensor_service.ultimas_linhas(1, 2)] == [19, 18]
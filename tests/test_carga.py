@@ -0,0 +1,32 @@
+# tests/test_carga.py
+from datetime import datetime
+
+from app import database
+from app.database import carregar, conexao
+
+
+def test_carregar_consome_o_gerador_em_blocos(migrado):
+    produzidas = []
+
+    def linhas():
+        for i in range(25):
+            produzidas.append(i)
+            yield (f"S{i % 3}", float(i), f"2024-01-01T00:{i:02d}:00")
+
+    blocos = []
+    with conexao() as conn:
+        total = carregar(conn, "sensor_readings", ("sensor_id", "value", "recorded_at"), linhas(), lote=10,
+                         ao_gravar=lambda bloco: blocos.append((len(bloco), len(produzidas))))
+        conn.commit()
+        assert conn.execute("SELECT COUNT(*), SUM(value) FROM sensor_readings").fetchone()[:] == (25, 300.0)
+
+    assert total == 25
+    # Cada bloco é gravado antes de o gerador produzir o seguinte
+    assert blocos == [(10, 10), (10, 20), (5, 25)]
+
+
+def test_texto_do_copy_escapa_separadores_e_nulos():
+    assert database._campo_copy(None) == "\\N"
+    assert database._campo_copy("a\tb\nc\\d\r") == "a\\tb\\nc\\\\d\\r"
+    assert database._campo_copy(datetime(2024, 1, 2, 3, 4, 5)) == "2024-01-02T03:04:05"
+    assert database._campo_copy(1.5) == "1.5"
@@ -0,0 +1,48 @@
+# tests/test_consultas.py
+from typing import NamedTuple
+
+from app import consultas
+from app.consultas import Consulta
+from app.database import conexao
+
+
+class Linha(NamedTuple):
+    id: int
+    nome: str
+
+
+POR_CULTURA = Consulta("por_cultura", "SELECT id, nome FROM {tabela} WHERE cultura = ? AND area_m2 > ? ORDER BY id", Linha)
+
+
+def test_renderizacao_postgres():
+    consulta = POR_CULTURA.para(tabela="campos")
+    preparar, executar, direto = consultas._postgres(consulta)
+
+    assert consulta.nome == "por_cultura_campos"
+    assert preparar == "PREPARE por_cultura_campos AS SELECT id, nome FROM campos WHERE cultura = $1 AND area_m2 > $2 ORDER BY id"
+    assert executar == "EXECUTE por_cultura_campos (%s, %s)"
+    assert direto == "SELECT id, nome FROM campos WHERE cultura = %s AND area_m2 > %s ORDER BY id"
+    # Mesma consulta formatada é o mesmo objeto (cache)
+    assert POR_CULTURA.para(tabela="campos") is consulta
+
+
+def test_sem_parametros_executa_sem_lista():
+    assert consultas._postgres(Consulta("tudo", "SELECT 1"))[1] == "EXECUTE tudo"
+
+
+def test_linhas_no_tipo_da_consulta(migrado):
+    consulta = POR_CULTURA.para(tabela="campos")
+    with conexao() as conn:
+        for i in range(5):
+            conn.execute("INSERT INTO campos (nome, cultura, largura, comprimento, area_m2) VALUES (?, 'milho', 1, 1, ?)",
+                         (f"c{i}", i))
+        conn.commit()
+
+        assert consultas.todas(conn, consulta, ("milho", 1)) == [Linha(3, "c2"), Linha(4, "c3"), Linha(5, "c4")]
+        assert consultas.uma(conn, consulta, ("milho", 3)) == Linha(5, "c4")
+        assert consultas.uma(conn, consulta, ("soja", 0)) is None
+        assert list(consultas.em_blocos(conn, consulta, ("milho", -1), tamanho=2)) == [
+            [Linha(1, "c0"), Linha(2, "c1")], [Linha(3, "c2"), Linha(4, "c3")], [Linha(5, "c4")],
+        ]
+        # Sem tipo de linha: tuplas, mesmo com row_factory sqlite3.Row na conexão
+        assert consultas.todas(conn, Consulta("ids", "SELECT id FROM campos WHERE id < ?"), (3,)) == [(1,), (2,)]
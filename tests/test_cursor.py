@@ -0,0 +1,62 @@
+# tests/test_cursor.py
+import pytest
+
+from fase2 import db_utils
+from tests.test_serie import _gravar_meses, _particionar
+
+
+def _paginas(buscar, limite: int) -> list:
+    linhas, cursor = buscar(limite, None)
+    while cursor is not None:
+        pagina, cursor = buscar(limite, cursor)
+        linhas += pagina
+    return linhas
+
+
+def test_cursor_da_api_atravessa_particoes(migrado, cliente):
+    _gravar_meses()
+    _particionar()
+
+    def buscar(limite, cursor):
+        params = {"campo_id": 1, "limit": limite, **({"cursor": cursor} if cursor else {})}
+        r = cliente.get("/api/sensores/ultimas", params=params)
+        return r.json(), r.headers.get("x-proximo-cursor")
+
+    linhas = _paginas(buscar, 7)
+
+    assert len(linhas) == 180
+    assert len({l["id"] for l in linhas}) == 180
+    assert [l["timestamp"] for l in linhas] == sorted((l["timestamp"] for l in linhas), reverse=True)
+
+
+def test_cursor_do_db_utils_atravessa_particoes(migrado):
+    _gravar_meses(campo_id=1)
+    _gravar_meses(campo_id=2)
+    _particionar()
+
+    linhas = _paginas(lambda limite, cursor: db_utils.get_latest_readings_page(limite, cursor), 25)
+
+    assert len(linhas) == 360
+    assert [l[0] for l in linhas] == sorted((l[0] for l in linhas), reverse=True)
+
+
+@pytest.mark.parametrize("resolucao, total", [(None, 180), ("hora", 180), ("dia", 90)])
+def test_cursor_da_serie_cobre_o_historico_sem_repetir(migrado, cliente, resolucao, total):
+    _gravar_meses()
+    _particionar()
+
+    def buscar(limite, cursor):
+        params = {"campo_id": 1, "limit": limite, **({"resolucao": resolucao} if resolucao else {}),
+                  **({"cursor": cursor} if cursor else {})}
+        corpo = cliente.get("/api/sensores/serie", params=params).json()
+        return corpo["pontos"], corpo.get("proximo_cursor")
+
+    pontos = _paginas(buscar, 11)
+
+    instantes = [p["timestamp"] for p in pontos]
+    assert len(instantes) == len(set(instantes)) == total
+
+
+def test_cursor_invalido(migrado, cliente):
+    r = cliente.get("/api/sensores/ultimas", params={"campo_id": 1, "cursor": "xx"})
+    assert r.status_code == 400
@@ -0,0 +1,51 @@
+# tests/test_database.py
+import threading
+
+from app import database
+from app.database import conexao, fechar_pools
+
+
+def _conexao_real():
+    with conexao() as conn:
+        return conn._conn
+
+
+def test_sqlite_reaproveita_a_conexao_da_thread(banco):
+    primeira = _conexao_real()
+    assert _conexao_real() is primeira
+
+    outra = []
+    t = threading.Thread(target=lambda: outra.append(_conexao_real()))
+    t.start()
+    t.join()
+    assert outra[0] is not primeira
+
+
+def test_devolucao_descarta_transacao_pendente(banco):
+    with conexao() as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.commit()
+    with conexao() as conn:
+        conn.execute("INSERT INTO t VALUES (1)")
+    with conexao() as conn:
+        assert not conn.in_transaction
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+
+
+def test_emprestimo_aninhado_compartilha_a_transacao(banco):
+    with conexao() as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.execute("INSERT INTO t VALUES (1)")
+        with conexao() as interna:
+            assert interna.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 1
+        assert conn.in_transaction
+        conn.commit()
+
+
+def test_conexao_fechada_e_substituida(banco):
+    primeira = _conexao_real()
+    fechar_pools()
+    segunda = _conexao_real()
+    assert segunda is not primeira
+    with conexao() as conn:
+        assert conn.execute("SELECT 1").fetchone()[0] == 1
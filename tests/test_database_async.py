@@ -0,0 +1,48 @@
+# tests/test_database_async.py
+import pytest
+from fastapi.testclient import TestClient
+
+from app import database_async
+from app.database import conexao
+
+LEITURA = {"campo_id": 1, "umidade": 40, "ph": 6.5, "nutrientes": 1, "temperatura": 20,
+           "timestamp": "2024-01-01T00:00:00"}
+
+
+def _ciclo(app, umidade: float):
+    with TestClient(app) as c:
+        r = c.post("/api/sensores/registrar", json={**LEITURA, "umidade": umidade})
+        assert r.status_code == 200
+        r = c.get("/api/campos/")
+        assert r.status_code == 200
+
+
+def test_api_reinicia_no_mesmo_processo(migrado):
+    from app.main import app
+    _ciclo(app, 40)
+    assert database_async._executor is None
+    _ciclo(app, 41)
+
+    with conexao() as conn:
+        assert [r[0] for r in conn.execute("SELECT umidade FROM leituras_sensores ORDER BY id")] == [40, 41]
+
+
+def test_caminho_nativo_sqlite(cliente, monkeypatch):
+    pytest.importorskip("aiosqlite")
+    monkeypatch.setattr(database_async, "MODO", "nativo")
+    assert database_async.nativo_disponivel()
+
+    r = cliente.post("/api/sensores/registrar", json=LEITURA)
+    assert r.status_code == 200
+    criada = r.json()
+    assert criada["id"] is not None
+
+    r = cliente.get("/api/sensores/ultimas", params={"campo_id": 1})
+    assert [l["id"] for l in r.json()] == [criada["id"]]
+    with conexao() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM rollup_leituras").fetchone()[0] > 0
+
+
+def test_placeholders_asyncpg():
+    assert database_async._para_postgres("SELECT * FROM t WHERE a = ? AND b > ?") == \
+        "SELECT * FROM t WHERE a = $1 AND b > $2"
@@ -0,0 +1,54 @@
+# tests/test_epoch_ms.py
+import sqlite3
+from datetime import datetime, timedelta
+
+from app import retencao, rollups, tempo
+from app.database import carregar, conexao
+from app.migracoes import aplicar_migracoes
+from fase2 import populate_agro_data
+
+
+def _tipos(tabela: str) -> dict:
+    conn = sqlite3.connect("farm.db")
+    return {r[1]: r[2] for r in conn.execute(f"PRAGMA table_info({tabela})")}
+
+
+def test_migracao_converte_as_duas_tabelas(migrado):
+    with conexao() as conn:
+        carregar(conn, "sensor_readings", ("sensor_id", "value", "recorded_at"),
+                 [("S1", 1.5, "2024-01-02T03:04:05"), ("S1", 2.5, "2024-01-02 03:05:00")])
+        conn.execute("INSERT INTO sensor_readings (sensor_id, value) VALUES ('S2', 3.0)")
+        conn.commit()
+
+    aplicar_migracoes(verbose=False, opcionais=["epoch_ms"])
+
+    assert _tipos("leituras_sensores")["timestamp"] == "INTEGER"
+    assert _tipos("sensor_readings")["recorded_at"] == "INTEGER"
+    conn = sqlite3.connect("farm.db")
+    valores = [r[0] for r in conn.execute("SELECT recorded_at FROM sensor_readings ORDER BY id")]
+    assert valores[:2] == [tempo.datetime_para_ms(datetime(2024, 1, 2, 3, 4, 5)),
+                           tempo.datetime_para_ms(datetime(2024, 1, 2, 3, 5))]
+    assert abs(tempo.ms_para_datetime(valores[2]) - datetime.utcnow()).total_seconds() < 60
+    # DEFAULT também em epoch ms
+    conn.execute("INSERT INTO sensor_readings (sensor_id, value) VALUES ('S3', 4.0)")
+    assert isinstance(conn.execute("SELECT recorded_at FROM sensor_readings WHERE sensor_id = 'S3'").fetchone()[0], int)
+
+
+def test_carga_agro_e_retencao_em_epoch_ms(migrado):
+    aplicar_migracoes(verbose=False, opcionais=["epoch_ms"])
+    total = populate_agro_data.populate_agro(dias=30, intervalo=3600, setores=1, seed=1)
+
+    with conexao() as conn:
+        brutas = conn.execute("SELECT COUNT(*), typeof(MIN(recorded_at)) FROM sensor_readings").fetchone()
+        no_rollup = conn.execute(
+            "SELECT SUM(n) FROM rollup_sensores WHERE resolucao = 'dia'").fetchone()[0]
+        assert tuple(brutas) == (total, "integer")
+        assert no_rollup == total
+
+        relatorio = retencao.executar(conn, dias=10, vacuum="nao")
+        item = relatorio["series"]["sensor_readings"]
+        assert item["leituras_antigas"] > 0
+        assert item["linhas_apagadas"] == item["leituras_antigas"]
+        corte = datetime.fromisoformat(relatorio["corte"])
+        assert rollups.mais_antiga(conn, rollups.SENSORES, corte) is None
+        assert retencao.executar(conn, dias=10, dry_run=True)["series"]["sensor_readings"]["leituras_antigas"] == 0
@@ -0,0 +1,89 @@
+# tests/test_exportacao.py
+import asyncio
+import csv
+import io
+import json
+
+from app import database_async
+from tests.test_serie import _gravar_meses, _particionar
+
+
+def test_exportar_serie_com_fuso_em_banco_particionado(migrado, cliente):
+    _gravar_meses()
+    _particionar()
+
+    r = cliente.get("/api/sensores/serie/exportar", params={
+        "campo_id": 1, "start": "2024-01-01T00:00:00Z", "end": "2024-02-01T03:00:00+03:00",
+    })
+
+    assert r.status_code == 200
+    linhas = [json.loads(l) for l in r.text.splitlines()]
+    assert len(linhas) == 62
+    assert linhas[0]["timestamp"] == "2024-01-01T00:00:00"
+    assert linhas[-1]["timestamp"] == "2024-01-31T12:00:00"
+
+
+def test_exportar_serie_csv_em_ordem_entre_particoes(migrado, cliente):
+    _gravar_meses()
+    _particionar()
+
+    r = cliente.get("/api/sensores/serie/exportar", params={"campo_id": 1, "formato": "csv"})
+
+    linhas = list(csv.reader(io.StringIO(r.text)))
+    assert linhas[0][0] == "id"
+    timestamps = [l[-1] for l in linhas[1:]]
+    assert len(timestamps) == 180
+    assert timestamps == sorted(timestamps)
+
+
+def test_exportar_ultimas_em_ndjson(migrado, cliente):
+    _gravar_meses(dias=10)
+
+    r = cliente.get("/api/sensores/ultimas/exportar", params={"campo_id": 1, "limit": 5})
+
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    assert r.headers["content-disposition"] == 'attachment; filename="ultimas_campo_1.ndjson"'
+    linhas = [json.loads(l) for l in r.text.splitlines()]
+    assert [l["timestamp"] for l in linhas] == [f"2024-01-10T{h}:00:00" for h in ("12", "00")] + \
+        [f"2024-01-09T{h}:00:00" for h in ("12", "00")] + ["2024-01-08T12:00:00"]
+
+
+def test_exportar_serie_por_resolucao_em_csv(migrado, cliente):
+    _gravar_meses(dias=10)
+
+    r = cliente.get("/api/sensores/serie/exportar", params={"campo_id": 1, "formato": "csv", "resolucao": "dia"})
+
+    linhas = list(csv.reader(io.StringIO(r.text)))
+    assert len(linhas) == 11
+    assert all(linha[linhas[0].index("n")] == "2" for linha in linhas[1:])
+
+
+def test_parametros_invalidos_da_exportacao(migrado, cliente):
+    assert cliente.get("/api/sensores/serie/exportar", params={"campo_id": 1, "formato": "xml"}).status_code == 400
+    assert cliente.get("/api/sensores/serie/exportar", params={"campo_id": 1, "resolucao": "ano"}).status_code == 400
+    assert cliente.get("/api/sensores/ultimas/exportar", params={"campo_id": 1, "limit": 0}).status_code == 400
+
+
+def test_consumidor_que_para_fecha_o_gerador():
+    produzidos, fechado = [], []
+
+    def gerar():
+        try:
+            for i in range(1000):
+                produzidos.append(i)
+                yield i
+        finally:
+            fechado.append(True)
+
+    async def consumir():
+        recebidos = []
+        async for item in database_async.transmitir(gerar, pendentes=2):
+            recebidos.append(item)
+            if len(recebidos) == 3:
+                break
+        return recebidos
+
+    assert asyncio.run(consumir()) == [0, 1, 2]
+    assert fechado == [True]
+    # O produtor fica no máximo `pendentes` itens à frente
+    assert len(produzidos) <= 3 + 2 + 1
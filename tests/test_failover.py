@@ -0,0 +1,53 @@
+# tests/test_failover.py
+import time
+
+import pytest
+
+from app import database
+from app.database import SeletorBackend, conexao
+
+# Porta sem servidor: a conexão é recusada na hora
+URL_FORA = "postgresql://u:s@127.0.0.1:1/farm"
+
+
+@pytest.fixture
+def primario_fora(banco, monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", URL_FORA)
+    monkeypatch.setenv("SUPABASE_DB_SSLMODE", "disable")
+    seletor = SeletorBackend(cooldown_s=3600)
+    monkeypatch.setattr(database, "_seletor", seletor)
+    return seletor
+
+
+def test_falha_abre_o_circuito_e_usa_sqlite(primario_fora, monkeypatch):
+    with conexao() as conn:
+        assert conn.backend == "sqlite"
+    estado = database.estado_backend()
+    assert (estado["circuito"], estado["backend_atual"], estado["failovers"]) == ("aberto", "sqlite", 1)
+
+    # Com o circuito aberto nem tenta o primário
+    def proibido(url):
+        raise AssertionError("tentou o Postgres com o circuito aberto")
+    monkeypatch.setattr(database, "_get_pool_postgres", proibido)
+    for _ in range(3):
+        with conexao() as conn:
+            assert conn.backend == "sqlite"
+    assert database.estado_backend()["falhas_primario"] == 1
+
+
+def test_sonda_fecha_o_circuito_quando_o_primario_volta(primario_fora, monkeypatch):
+    primario_fora.cooldown_s = 0.01
+    with conexao() as conn:
+        assert conn.backend == "sqlite"
+
+    class Conexao:
+        def close(self):
+            pass
+
+    monkeypatch.setattr(database.psycopg2, "connect", lambda *a, **k: Conexao())
+    prazo = time.monotonic() + 5
+    while not primario_fora.usar_primario() and time.monotonic() < prazo:
+        time.sleep(0.01)
+
+    estado = database.estado_backend()
+    assert (estado["circuito"], estado["recuperacoes"]) == ("fechado", 1)
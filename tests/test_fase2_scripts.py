@@ -0,0 +1,36 @@
+# tests/test_fase2_scripts.py
+import os
+import sqlite3
+import subprocess
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+
+def _rodar(modulo: str, cwd: Path):
+    ambiente = {**os.environ, "PYTHONPATH": str(RAIZ)}
+    r = subprocess.run([sys.executable, "-m", modulo], cwd=cwd, env=ambiente, capture_output=True, text=True)
+    assert r.returncode == 0, r.stderr
+
+
+def test_setup_local_db_e_populate_data_em_sequencia(banco):
+    _rodar("fase2.setup_local_db", banco)
+    _rodar("fase2.populate_data", banco)
+
+    conn = sqlite3.connect(banco / "farm.db")
+    leituras = conn.execute("SELECT COUNT(*) FROM sensor_readings").fetchone()[0]
+    por_resolucao = dict(conn.execute("SELECT resolucao, SUM(n) FROM rollup_sensores GROUP BY resolucao"))
+    assert leituras == 216
+    assert por_resolucao == {"minuto": 216, "hora": 216, "dia": 216}
+
+
+def test_populate_data_sem_tabela_de_rollups(banco):
+    _rodar("fase2.setup_local_db", banco)
+    conn = sqlite3.connect(banco / "farm.db")
+    conn.execute("DROP TABLE rollup_sensores")
+    conn.commit()
+
+    _rodar("fase2.populate_data", banco)
+
+    assert conn.execute("SELECT COUNT(*) FROM sensor_readings").fetchone()[0] == 216
@@ -0,0 +1,64 @@
+# tests/test_importacao.py
+import asyncio
+import json
+
+from app.database import conexao
+from app.services import ingestao_service
+
+
+def _ndjson(umidade: float, **campos) -> bytes:
+    return json.dumps({"campo_id": 1, "umidade": umidade, "ph": 6.5, "nutrientes": 1, "temperatura": 20,
+                       "timestamp": "2024-01-01T00:00:00", **campos}).encode() + b"\n"
+
+
+def _em_pedacos(dados: bytes, tamanho: int):
+    async def gerar():
+        for i in range(0, len(dados), tamanho):
+            yield dados[i:i + tamanho]
+    return gerar()
+
+
+async def _coletar(chunks):
+    return [linha async for linha in ingestao_service._linhas(chunks)]
+
+
+def test_linhas_atravessam_os_pedacos(monkeypatch):
+    monkeypatch.setattr(ingestao_service, "IMPORTACAO_MAX_LINHA", 10)
+    dados = "ação\r\n\nx".encode() + b"y" * 20 + b"\nfim"
+
+    linhas = asyncio.run(_coletar(_em_pedacos(dados, 3)))
+
+    assert linhas == ["ação", "", None, "fim"]
+
+
+def test_importar_ndjson_rejeita_linhas_ruins_sem_parar(cliente, monkeypatch):
+    monkeypatch.setattr(ingestao_service, "IMPORTACAO_LOTE_LINHAS", 2)
+    corpo = (_ndjson(40) + b'{"campo_id": 1, "umidade": "\xff"}\n' + b"\n"
+             + b"x" * (ingestao_service.IMPORTACAO_MAX_LINHA + 1) + b"\n"
+             + _ndjson(41) + _ndjson(50, ph=20) + b"{quebrado\n" + _ndjson(42))
+
+    r = cliente.post("/api/sensores/importar", content=corpo, headers={"Content-Type": "application/x-ndjson"})
+
+    resposta = r.json()
+    assert (resposta["linhas"], resposta["aceitas"], resposta["rejeitadas"], resposta["lotes"]) == (7, 3, 4, 2)
+    assert [e["linha"] for e in resposta["erros"]] == [2, 4, 6, 7]
+    with conexao() as conn:
+        assert [r[0] for r in conn.execute("SELECT umidade FROM leituras_sensores ORDER BY id")] == [40, 41, 42]
+
+
+def test_importar_csv(cliente):
+    corpo = (b"campo_id,umidade,ph,nutrientes,temperatura,timestamp\r\n"
+             b"1,40,6.5,1,20,2024-01-01T00:00:00\r\n"
+             b"1,41,6.5,1,20\r\n"
+             b"2,42,6.5,1,20,\r\n")
+
+    r = cliente.post("/api/sensores/importar?formato=csv", content=corpo)
+
+    resposta = r.json()
+    assert (resposta["aceitas"], resposta["rejeitadas"]) == (2, 1)
+    assert resposta["erros"][0]["linha"] == 3
+
+
+def test_formato_desconhecido_recebe_415(cliente):
+    r = cliente.post("/api/sensores/importar", content=b"x", headers={"Content-Type": "text/plain"})
+    assert r.status_code == 415
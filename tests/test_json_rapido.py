@@ -0,0 +1,55 @@
+# tests/test_json_rapido.py
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+
+from app import json_rapido
+from app.migracoes import aplicar_migracoes
+from app.models import LeituraCreate
+from app.services import campo_service, sensor_service
+
+AMOSTRA = [{"id": 1, "nome": "Talhão ção", "valor": 0.1, "timestamp": datetime(2024, 1, 2, 3, 4, 5, 678000)},
+           {"id": 2, "nome": None, "valor": 6.25, "timestamp": datetime(2024, 1, 2)}]
+
+
+def _serializadores(monkeypatch):
+    yield "padrao"
+    if json_rapido.orjson is not None:
+        monkeypatch.setattr(json_rapido, "orjson", None)
+        yield "pydantic-core"
+    if json_rapido.to_json is not None:
+        monkeypatch.setattr(json_rapido, "to_json", None)
+        yield "json"
+
+
+def test_serializadores_produzem_o_mesmo_json(monkeypatch):
+    saidas = {nome: json_rapido.dumps(AMOSTRA) for nome in _serializadores(monkeypatch)}
+    assert len(set(saidas.values())) == 1, saidas
+
+
+def test_floats_em_notacao_cientifica_mantem_o_valor(monkeypatch):
+    valores = [1e-7, 1e16, 1e-5, -2.5e-300]
+    assert {tuple(json.loads(json_rapido.dumps(valores))) for _ in _serializadores(monkeypatch)} == {tuple(valores)}
+
+
+@pytest.mark.parametrize("opcionais", [None, ["epoch_ms"]])
+def test_listagens_iguais_as_dos_modelos(banco, opcionais):
+    aplicar_migracoes(verbose=False, opcionais=opcionais)
+    from app.main import app  # carrega o modelo de irrigação relativo ao diretório de trabalho
+
+    sensor_service.gravar_leituras([
+        LeituraCreate(campo_id=1, umidade=40.5, ph=6.5, nutrientes=1, temperatura=20,
+                      timestamp=datetime(2024, 1, 1, 0, 0, 0, 250000) + timedelta(minutes=i))
+        for i in range(5)
+    ])
+    with TestClient(app) as cliente:
+        cliente.post("/api/campos/", json={"nome": "Talhão", "cultura": "milho", "largura": 1.5, "comprimento": 2})
+
+        ultimas = cliente.get("/api/sensores/ultimas", params={"campo_id": 1, "limit": 3}).json()
+        campos = cliente.get("/api/campos/").json()
+
+    assert ultimas == jsonable_encoder(sensor_service.get_ultimas_leituras(1, 3))
+    assert campos == jsonable_encoder(campo_service.get_all_campos())
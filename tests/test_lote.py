@@ -0,0 +1,34 @@
+# tests/test_lote.py
+from app.database import conexao
+from app.services import sensor_service
+
+
+def _leitura(**campos):
+    return {"campo_id": 1, "umidade": 40, "ph": 6.5, "nutrientes": 1, "temperatura": 20,
+            "timestamp": "2024-01-01T00:00:00", **campos}
+
+
+def test_lote_grava_validas_e_rejeita_por_item(cliente):
+    lote = [_leitura(), _leitura(ph=15), _leitura(umidade=55), _leitura(nutrientes=-1)]
+
+    r = cliente.post("/api/sensores/lote", json=lote)
+
+    assert r.status_code == 200
+    corpo = r.json()
+    assert (corpo["total"], corpo["inseridas"], corpo["rejeitadas"]) == (4, 2, 2)
+    assert [i["indice"] for i in corpo["itens"]] == [0, 1, 2, 3]
+    assert [i["status"] for i in corpo["itens"]] == ["inserida", "rejeitada", "inserida", "rejeitada"]
+    ids = [i["id"] for i in corpo["itens"] if i["id"] is not None]
+    with conexao() as conn:
+        gravadas = conn.execute("SELECT id, umidade FROM leituras_sensores ORDER BY id").fetchall()
+    assert [tuple(g) for g in gravadas] == [(ids[0], 40.0), (ids[1], 55.0)]
+
+
+def test_lote_acima_do_limite_recebe_413(cliente, monkeypatch):
+    monkeypatch.setattr(sensor_service, "LOTE_MAX_ITENS", 3)
+
+    r = cliente.post("/api/sensores/lote", json=[_leitura()] * 4)
+
+    assert r.status_code == 413
+    with conexao() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM leituras_sensores").fetchone()[0] == 0
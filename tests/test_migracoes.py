@@ -0,0 +1,38 @@
+# tests/test_migracoes.py
+import sqlite3
+
+import pytest
+
+from app import migracoes
+from app.database import conexao
+from app.migracoes import Migracao, aplicar_migracoes, status, versoes_aplicadas
+
+
+def test_reaplicar_nao_faz_nada(migrado):
+    assert aplicar_migracoes(verbose=False) == []
+    assert all(item["aplicada"] for item in status())
+
+
+def test_ultimas_leituras_usam_o_indice_composto(migrado):
+    with conexao() as conn:
+        plano = " ".join(r[-1] for r in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM leituras_sensores WHERE campo_id = ? ORDER BY timestamp DESC LIMIT 20",
+            (1,),
+        ))
+    assert "idx_leituras_campo_timestamp" in plano
+    assert "TEMP B-TREE" not in plano
+
+
+def test_migracao_que_falha_nao_fica_registrada(migrado, monkeypatch):
+    ruim = Migracao(9000, "teste", sqlite=["CREATE TABLE extra (x INTEGER)", "SELECT * FROM nao_existe"])
+    monkeypatch.setattr(migracoes, "MIGRACOES", migracoes.MIGRACOES + [ruim])
+
+    with pytest.raises(sqlite3.OperationalError):
+        aplicar_migracoes(verbose=False)
+
+    with conexao() as conn:
+        assert 9000 not in versoes_aplicadas(conn)
+        assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'extra'").fetchone()[0] == 0
+
+    ruim.sqlite = ["CREATE TABLE extra (x INTEGER)"]
+    assert aplicar_migracoes(verbose=False) == [9000]
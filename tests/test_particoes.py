@@ -0,0 +1,60 @@
+# tests/test_particoes.py
+from datetime import datetime, timedelta
+
+from app import particoes
+from app.database import conexao
+from app.migracoes import aplicar_migracoes
+from app.models import LeituraCreate
+from app.services import sensor_service
+
+
+def _gravar(inicio: datetime, n: int, passo=timedelta(hours=12)):
+    return sensor_service.gravar_leituras([
+        LeituraCreate(campo_id=1, umidade=40, ph=6.5, nutrientes=1, temperatura=20, timestamp=inicio + passo * i)
+        for i in range(n)
+    ])
+
+
+def _contagens(conn) -> dict:
+    return {
+        p.nome: conn.execute(f"SELECT COUNT(*) FROM {p.nome}").fetchone()[0]
+        for p in particoes.tabelas(conn)
+    }
+
+
+def test_migracao_move_meses_fechados_sem_perder_linhas(migrado):
+    ids = _gravar(datetime(2024, 1, 1), 180)
+    aplicar_migracoes(verbose=False, opcionais=["particoes"])
+
+    with conexao() as conn:
+        assert _contagens(conn) == {
+            "leituras_sensores": 0,
+            "leituras_sensores_p2024_03": 60,
+            "leituras_sensores_p2024_02": 58,
+            "leituras_sensores_p2024_01": 62,
+        }
+        todos = sorted(r[0] for p in particoes.tabelas(conn) for r in conn.execute(f"SELECT id FROM {p.nome}"))
+    assert todos == sorted(ids)
+
+
+def test_intervalo_so_percorre_as_particoes_que_cruza(migrado):
+    _gravar(datetime(2024, 1, 1), 180)
+    aplicar_migracoes(verbose=False, opcionais=["particoes"])
+
+    with conexao() as conn:
+        nomes = [p.nome for p in particoes.tabelas(conn, datetime(2024, 2, 10), datetime(2024, 3, 1))]
+    assert nomes == ["leituras_sensores", "leituras_sensores_p2024_02"]
+
+
+def test_manutencao_move_leituras_retroativas_e_descarte_remove_o_mes(migrado):
+    _gravar(datetime(2024, 1, 1), 10)
+    aplicar_migracoes(verbose=False, opcionais=["particoes"])
+    _gravar(datetime(2024, 1, 20), 2)
+    _gravar(datetime(2024, 2, 1), 1)
+
+    assert particoes.manter() == {"movidas": {"leituras_sensores_p2024_01": 2, "leituras_sensores_p2024_02": 1}}
+    with conexao() as conn:
+        assert _contagens(conn)["leituras_sensores_p2024_01"] == 12
+
+        assert particoes.descartar_anteriores(conn, datetime(2024, 2, 1)) == ["leituras_sensores_p2024_01"]
+        assert list(_contagens(conn)) == ["leituras_sensores", "leituras_sensores_p2024_02"]
@@ -0,0 +1,68 @@
+# tests/test_protocolo_binario.py
+from datetime import datetime
+
+import pytest
+
+from app import protocolo_binario, tempo
+from app.database import conexao
+from app.protocolo_binario import CABECALHO, codificar_frame
+from app.services import ingestao_service, sensor_service
+
+MS = tempo.datetime_para_ms(datetime(2024, 1, 1))
+REGISTROS = [
+    (1, MS, 40.0, 6.5, 1.0, 20.0),
+    (1, MS + 1000, 41.0, 20.0, 1.0, 20.0),   # ph fora da faixa
+    (2, 1, 42.0, 6.5, 1.0, 20.0),            # relógio em 1970
+    (2, 0, 43.0, 6.5, 1.0, 20.0),            # sem relógio: horário do servidor
+]
+
+
+def _enviar(cliente, corpo: bytes):
+    return cliente.post("/api/sensores/binario", content=corpo,
+                        headers={"Content-Type": "application/octet-stream"})
+
+
+def test_frame_grava_validos_e_aponta_rejeitados(cliente):
+    r = _enviar(cliente, codificar_frame(REGISTROS))
+
+    resposta = r.json()
+    assert (resposta["linhas"], resposta["aceitas"], resposta["rejeitadas"]) == (4, 2, 2)
+    assert [(e["linha"], e["erro"]) for e in resposta["erros"]] == [
+        (2, "ph fora da faixa (0-14)"), (3, "timestamp fora da faixa"),
+    ]
+    with conexao() as conn:
+        rows = conn.execute("SELECT campo_id, umidade, timestamp FROM leituras_sensores ORDER BY id").fetchall()
+    assert [(r[0], r[1]) for r in rows] == [(1, 40.0), (2, 43.0)]
+    assert tempo.do_banco(rows[0][2]) == datetime(2024, 1, 1)
+    assert tempo.do_banco(rows[1][2]) > datetime(2024, 1, 2)
+
+
+@pytest.mark.parametrize("corpo", [
+    b"FT",                                                          # menor que o cabeçalho
+    b"XX" + codificar_frame(REGISTROS[:1])[2:],                     # magic
+    CABECALHO.pack(b"FT", 9, 0, 1) + codificar_frame(REGISTROS[:1])[CABECALHO.size:],  # versão
+    codificar_frame(REGISTROS[:2])[:-1],                            # truncado
+    codificar_frame(REGISTROS[:1]) + b"\0",                         # sobra
+])
+def test_frame_malformado_recebe_400(cliente, corpo):
+    r = _enviar(cliente, corpo)
+    assert r.status_code == 400
+    with conexao() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM leituras_sensores").fetchone()[0] == 0
+
+
+def test_frame_acima_do_limite_recebe_413(cliente, monkeypatch):
+    monkeypatch.setattr(sensor_service, "LOTE_MAX_ITENS", 2)
+    assert _enviar(cliente, codificar_frame(REGISTROS[:3])).status_code == 413
+    assert _enviar(cliente, codificar_frame(REGISTROS[:2])).status_code == 200
+
+
+def test_validacao_numpy_igual_a_struct():
+    if protocolo_binario.np is None:
+        pytest.skip("numpy não instalado")
+    frame = codificar_frame(REGISTROS[:3] + [(3, MS, float("nan"), 6.5, 1.0, 20.0), (3, MS, 50.0, 6.5, -1.0, 20.0)])
+
+    numpy = ingestao_service._linhas_frame_numpy(protocolo_binario.decodificar_frame(frame))
+    struct = ingestao_service._linhas_frame_struct(protocolo_binario.decodificar_frame_struct(frame))
+
+    assert numpy == struct
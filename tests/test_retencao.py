@@ -0,0 +1,94 @@
+# tests/test_retencao.py
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import particoes, retencao, rollups
+from app.database import conexao
+from app.migracoes import aplicar_migracoes
+from app.models import LeituraCreate
+from app.services import sensor_service
+
+AGORA = datetime(2024, 4, 1)
+CORTE = datetime(2024, 3, 2)  # AGORA - 30 dias
+
+
+def _gravar(n: int = 180):
+    sensor_service.gravar_leituras([
+        LeituraCreate(campo_id=1 + i % 2, umidade=40, ph=6.5, nutrientes=1, temperatura=20,
+                      timestamp=datetime(2024, 1, 1) + timedelta(hours=12 * i))
+        for i in range(n)
+    ])
+
+
+def _total(conn) -> int:
+    return sum(conn.execute(f"SELECT COUNT(*) FROM {p.nome}").fetchone()[0] for p in particoes.tabelas(conn))
+
+
+def _soma_dia(conn) -> int:
+    return conn.execute("SELECT SUM(n) FROM rollup_leituras WHERE resolucao = 'dia'").fetchone()[0]
+
+
+@pytest.mark.parametrize("opcionais", [None, ["particoes"], ["epoch_ms"]])
+def test_dry_run_conta_o_que_a_execucao_apaga(banco, opcionais):
+    aplicar_migracoes(verbose=False, opcionais=opcionais)
+    _gravar()
+
+    with conexao() as conn:
+        total = _total(conn)
+        simulado = retencao.executar(conn, dias=30, dry_run=True, vacuum="nao", agora=AGORA)
+        assert _total(conn) == total
+        antigas = simulado["series"]["leituras_sensores"]["leituras_antigas"]
+        assert antigas == 122  # 2024-01-01 .. 2024-03-01 12:00
+
+        retencao.executar(conn, dias=30, vacuum="nao", agora=AGORA)
+        assert _total(conn) == total - antigas
+        assert retencao.executar(conn, dias=30, dry_run=True, agora=AGORA)["series"]["leituras_sensores"][
+            "leituras_antigas"] == 0
+        # O histórico continua nos rollups diários
+        assert _soma_dia(conn) == total
+
+
+def test_dias_sem_rollup_sao_reconstruidos_antes_de_apagar(migrado, monkeypatch):
+    with monkeypatch.context() as m:
+        m.setattr(rollups, "ATIVOS", False)
+        _gravar(20)
+    _gravar(1)
+
+    with conexao() as conn:
+        simulado = retencao.executar(conn, dias=30, dry_run=True, agora=datetime(2024, 3, 1))
+        assert len(simulado["series"]["leituras_sensores"]["dias_sem_rollup"]) == 10
+
+        retencao.executar(conn, dias=30, vacuum="nao", agora=datetime(2024, 3, 1))
+        assert _total(conn) == 0
+        assert _soma_dia(conn) == 21
+
+
+def test_poda_rollups_de_minuto_e_hora_antigos(migrado):
+    _gravar()
+    with conexao() as conn:
+        minuto_antes = conn.execute("SELECT COUNT(*) FROM rollup_leituras WHERE resolucao = 'minuto'").fetchone()[0]
+        simulado = retencao.executar(conn, dias=365, dry_run=True, agora=AGORA)["rollups_podados"]
+        real = retencao.executar(conn, dias=365, vacuum="nao", agora=AGORA)["rollups_podados"]
+        minuto_depois = conn.execute("SELECT COUNT(*) FROM rollup_leituras WHERE resolucao = 'minuto'").fetchone()[0]
+
+    assert simulado == real
+    # Minutos só dos últimos 7 dias: de 2024-03-25 a 2024-03-30, duas leituras por dia
+    assert minuto_antes - minuto_depois == real["rollup_leituras.minuto"] == 180 - 12
+
+
+def test_compactacao_incremental_converte_e_depois_devolve_paginas(migrado):
+    with conexao() as conn:
+        primeira = retencao.compactar(conn, "incremental")
+        assert primeira["modo"].startswith("completo")
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+        _gravar(2000)
+        conn.execute("DELETE FROM leituras_sensores")
+        conn.commit()
+        assert conn.execute("PRAGMA freelist_count").fetchone()[0] > 0
+
+        segunda = retencao.compactar(conn, "incremental")
+    assert segunda["modo"] == "incremental"
+    assert segunda["bytes_devolvidos"] > 0
+    assert segunda["livre_no_arquivo"] == 0
@@ -0,0 +1,36 @@
+# tests/test_returning.py
+from app.database import conexao, inserir_varios
+
+LEITURA = {"campo_id": 1, "umidade": 40, "ph": 6.5, "nutrientes": 1, "temperatura": 20,
+           "timestamp": "2024-01-01T00:00:00"}
+
+
+def test_registrar_devolve_a_linha_gravada(cliente):
+    criada = cliente.post("/api/sensores/registrar", json=LEITURA).json()
+
+    with conexao() as conn:
+        row = conn.execute("SELECT id, umidade, ph FROM leituras_sensores").fetchone()
+    assert (criada["id"], criada["umidade"], criada["ph"]) == tuple(row)
+    assert criada["timestamp"] == "2024-01-01T00:00:00"
+
+
+def test_criar_campo_devolve_area_calculada(cliente):
+    r = cliente.post("/api/campos/", json={"nome": "Talhão", "cultura": "milho", "largura": 10, "comprimento": 20})
+
+    campo = r.json()
+    assert campo["area_m2"] == 200
+    with conexao() as conn:
+        assert conn.execute("SELECT nome FROM campos WHERE id = ?", (campo["id"],)).fetchone()[0] == "Talhão"
+
+
+def test_inserir_varios_devolve_os_ids_na_ordem(migrado):
+    with conexao() as conn:
+        conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY AUTOINCREMENT, x INTEGER)")
+        inserir_varios(conn, "t", ("x",), [(1,), (2,)])
+        conn.execute("DELETE FROM t")
+        ids = inserir_varios(conn, "t", ("x",), [(10,), (20,), (30,)])
+        conn.commit()
+        gravadas = [tuple(r) for r in conn.execute("SELECT id, x FROM t ORDER BY id")]
+
+    assert gravadas == list(zip(ids, (10, 20, 30)))
+    assert ids == [3, 4, 5]
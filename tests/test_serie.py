@@ -0,0 +1,92 @@
+# tests/test_serie.py
+from datetime import datetime, timedelta
+
+from app import particoes
+from app.database import conexao
+from app.migracoes import aplicar_migracoes
+from app.models import LeituraCreate
+from app.services import sensor_service
+
+INICIO = datetime(2024, 1, 1)
+
+
+def _gravar_meses(campo_id: int = 1, dias: int = 90):
+    sensor_service.gravar_leituras([
+        LeituraCreate(campo_id=campo_id, umidade=40, ph=6.5, nutrientes=1, temperatura=20,
+                      timestamp=INICIO + timedelta(hours=12 * i))
+        for i in range(dias * 2)
+    ])
+
+
+def _particionar():
+    aplicar_migracoes(verbose=False, opcionais=["particoes"])
+    with conexao() as conn:
+        assert particoes.listar(conn)
+
+
+def test_serie_com_fuso_em_banco_particionado(migrado, cliente):
+    _gravar_meses()
+    _particionar()
+
+    r = cliente.get("/api/sensores/serie", params={
+        "campo_id": 1, "limit": 1000, "start": "2024-01-01T00:00:00Z", "end": "2024-02-01T03:00:00+03:00",
+    })
+
+    assert r.status_code == 200
+    pontos = r.json()["pontos"]
+    assert len(pontos) == 62
+    assert pontos[0]["timestamp"] == "2024-01-01T00:00:00"
+    assert pontos[-1]["timestamp"] == "2024-01-31T12:00:00"
+
+
+def test_serie_amostrada_com_fuso_em_banco_particionado(migrado, cliente):
+    _gravar_meses()
+    _particionar()
+
+    r = cliente.get("/api/sensores/serie", params={
+        "campo_id": 1, "max_points": 10, "start": "2024-01-01T00:00:00Z", "end": "2024-03-01T00:00:00Z",
+    })
+
+    assert r.status_code == 200
+    assert 0 < len(r.json()["pontos"]) <= 10
+
+
+def _gravar_horas(valores, campo_id: int = 1):
+    sensor_service.gravar_leituras([
+        LeituraCreate(campo_id=campo_id, umidade=v, ph=6.5, nutrientes=1, temperatura=20,
+                      timestamp=INICIO + timedelta(hours=3 * i))
+        for i, v in enumerate(valores)
+    ])
+
+
+def test_resolucao_dia_le_os_rollups_com_as_medias_das_brutas(cliente):
+    valores = [i % 7 for i in range(40)]
+    _gravar_horas(valores)
+
+    pontos = cliente.get("/api/sensores/serie", params={"campo_id": 1, "resolucao": "dia"}).json()["pontos"]
+
+    dias = [valores[i:i + 8] for i in range(0, 40, 8)]
+    assert [p["timestamp"] for p in pontos] == [f"2024-01-0{d}T00:00:00" for d in range(1, 6)]
+    assert [(p["n"], p["umidade"]) for p in pontos] == [(len(d), sum(d) / len(d)) for d in dias]
+
+
+def test_lttb_preserva_extremos_e_respeita_max_points(cliente):
+    valores = [50.0] * 200
+    valores[77] = 99.0
+    valores[150] = 1.0
+    _gravar_horas(valores)
+
+    r = cliente.get("/api/sensores/serie", params={"campo_id": 1, "max_points": 20, "amostragem": "lttb"})
+
+    pontos = r.json()["pontos"]
+    assert len(pontos) <= 20
+    umidades = [p["umidade"] for p in pontos]
+    assert 99.0 in umidades and 1.0 in umidades
+    assert pontos[0]["timestamp"] == "2024-01-01T00:00:00"
+    assert pontos[-1]["timestamp"] == (INICIO + timedelta(hours=3 * 199)).isoformat()
+
+
+def test_parametros_invalidos_da_serie(cliente):
+    for params in ({"resolucao": "semana"}, {"max_points": 1}, {"max_points": 10, "resolucao": "dia"},
+                   {"start": "2024-02-01T00:00:00", "end": "2024-01-01T00:00:00"}):
+        assert cliente.get("/api/sensores/serie", params={"campo_id": 1, **params}).status_code == 400
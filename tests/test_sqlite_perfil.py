@@ -0,0 +1,41 @@
+# tests/test_sqlite_perfil.py
+from app import database
+from app.database import conectar_sqlite, conexao
+
+
+def _pragma(conn, nome: str):
+    return conn.execute(f"PRAGMA {nome}").fetchone()[0]
+
+
+def test_conexoes_do_pool_usam_o_perfil_wal(banco):
+    with conexao() as conn:
+        assert _pragma(conn, "journal_mode") == "wal"
+        assert _pragma(conn, "synchronous") == 1  # NORMAL
+        assert _pragma(conn, "cache_size") == -database.SQLITE_CACHE_MB * 1024
+        assert _pragma(conn, "temp_store") == 2   # MEMORY
+        assert _pragma(conn, "busy_timeout") == database.SQLITE_BUSY_TIMEOUT_MS
+
+
+def test_perfil_padrao_mantem_a_configuracao_de_fabrica(banco):
+    conn = conectar_sqlite("outro.db", perfil="padrao")
+    assert _pragma(conn, "journal_mode") == "delete"
+    assert _pragma(conn, "synchronous") == 2  # FULL
+    conn.close()
+
+
+def test_escritor_commita_com_leitura_aberta(migrado):
+    # Transação de leitura aberta noutra conexão (ex.: exportação em andamento)
+    leitor = conectar_sqlite(database.SQLITE_DB)
+    leitor.execute("BEGIN")
+    assert leitor.execute("SELECT COUNT(*) FROM campos").fetchone()[0] == 0
+
+    with conexao() as conn:
+        conn.execute("INSERT INTO campos (nome, cultura, largura, comprimento, area_m2) VALUES ('a', 'b', 1, 1, 1)")
+        conn.commit()
+        assert conn.execute("SELECT COUNT(*) FROM campos").fetchone()[0] == 1
+
+    # O leitor continua vendo o snapshot do início da sua transação
+    assert leitor.execute("SELECT COUNT(*) FROM campos").fetchone()[0] == 0
+    leitor.rollback()
+    assert leitor.execute("SELECT COUNT(*) FROM campos").fetchone()[0] == 1
+    leitor.close()
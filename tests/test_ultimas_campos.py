@@ -0,0 +1,40 @@
+# tests/test_ultimas_campos.py
+from datetime import datetime, timedelta
+
+from app.models import LeituraCreate
+from app.services import sensor_service
+
+URL = "/api/sensores/ultimas/campos"
+
+
+def _gravar(campo_id: int, n: int):
+    sensor_service.gravar_leituras([
+        LeituraCreate(campo_id=campo_id, umidade=i, ph=6.5, nutrientes=1, temperatura=20,
+                      timestamp=datetime(2024, 1, 1) + timedelta(minutes=i % 7))  # timestamps repetidos
+        for i in range(n)
+    ])
+
+
+def test_resposta_igual_a_ultimas_por_campo(cliente):
+    _gravar(1, 12)
+    _gravar(2, 3)
+
+    r = cliente.get(URL, params={"campo_ids": "2,1,3,1", "limit": 5})
+    assert r.status_code == 200
+    corpo = r.json()
+    assert list(corpo) == ["2", "1", "3"]
+    assert corpo["3"] == []
+    for campo_id in (1, 2):
+        ultimas = cliente.get("/api/sensores/ultimas", params={"campo_id": campo_id, "limit": 5}).json()
+        assert corpo[str(campo_id)] == ultimas
+
+
+def test_parametros_invalidos(cliente, monkeypatch):
+    assert cliente.get(URL, params={"campo_ids": "1,x"}).status_code == 400
+    assert cliente.get(URL, params={"campo_ids": " , "}).status_code == 400
+    assert cliente.get(URL, params={"campo_ids": "1", "limit": 0}).status_code == 400
+    limite = sensor_service.ULTIMAS_CAMPOS_MAX_LIMIT + 1
+    assert cliente.get(URL, params={"campo_ids": "1", "limit": limite}).status_code == 400
+
+    monkeypatch.setattr(sensor_service, "ULTIMAS_CAMPOS_MAX", 2)
+    assert cliente.get(URL, params={"campo_ids": "1,2,3"}).status_code == 413